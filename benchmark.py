@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Benchmark suite based on the synthetic databases.
+
+For each of a series of scales (i.e., numbers of products, with the number
+of docents growing proportionally) a synthetic department is generated in a
+temporary folder (see the synthetic module), and the basic operations are
+timed on it. Usage:
+
+>>> python benchmark.py [--scales 1000 2000 4000 8000] [--json out.json]
+
+For each operation, the scaling of the execution time with the size of the
+database is summarized by the slope of a straight-line fit in log-log
+space, and operations with a slope significantly larger than one (i.e.,
+growing worse than linearly) are flagged.
+"""
+
+
+import contextlib
+import io
+import json
+import math
+import os
+import shutil
+import tempfile
+import time
+
+from rating import Product, ProductDatabase, DocentDatabase, ExcelTableDump
+from dedup import find_duplicates, cluster_duplicates
+import dbcache
+import synthetic
+
+
+"""Number of products per docent in the synthetic departments.
+"""
+PRODUCTS_PER_DOCENT = 40
+
+"""Maximum log-log slope for an operation to be considered linear.
+"""
+MAX_SLOPE = 1.25
+
+"""Minimum execution time (in s) at the largest scale for the slope to be
+meaningful.
+"""
+MIN_TIME = 0.005
+
+
+def _remove_cache(file_path):
+    """Remove the cache for a given file, if it exists.
+    """
+    try:
+        os.remove(dbcache.cache_file_path(file_path))
+    except OSError:
+        pass
+
+
+def load_cold(context):
+    """Load the product database, with no cache available.
+    """
+    _remove_cache(context['prod_file_path'])
+    return ProductDatabase(context['prod_file_path'])
+
+
+def load_cached(context):
+    """Load the product database from the cache.
+    """
+    return ProductDatabase(context['prod_file_path'])
+
+
+def select(context):
+    """Select the products of each docent.
+    """
+    db_prod = context['db_prod']
+    db_prod.invalidate_indexes()
+    for pers in context['db_pers']:
+        db_prod.select(quiet=True, author_full_name=pers.full_name)
+
+
+def rating_points(context):
+    """Calculate the rating points for all the products.
+    """
+    sub_area_dict = context['sub_area_dict']
+    lookup_table = context['lookup_table']
+    for prod in context['db_prod']:
+        prod.rating_points(sub_area_dict[prod.author_full_name], lookup_table)
+
+
+def duplicates(context):
+    """Search for duplicates docent by docent.
+    """
+    for prods in context['db_prod'].group_by('author_full_name').values():
+        find_duplicates(prods)
+
+
+def duplicate_clusters(context):
+    """Cluster the duplicates over the whole department.
+    """
+    cluster_duplicates(context['db_prod'])
+
+
+def table_dump(context):
+    """Write the product database to a xlsx table dump.
+    """
+    col_names = list(Product.FIELD_DICT.keys())
+    rows = ([prod.__getattribute__(key) for key in col_names] for\
+            prod in context['db_prod'])
+    table = ExcelTableDump()
+    table.add_worksheet('Prodotti', col_names, rows)
+    table.write(os.path.join(context['folder_path'], 'dump.xlsx'))
+
+
+"""List of the benchmarks, in order of execution.
+"""
+BENCHMARKS = [
+    load_cold,
+    load_cached,
+    select,
+    rating_points,
+    duplicates,
+    duplicate_clusters,
+    table_dump
+]
+
+
+def time_call(function, context, num_repeats=3):
+    """Return the best execution time of a function over num_repeats runs,
+    with the standard output suppressed.
+    """
+    best = None
+    for i in range(num_repeats):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            function(context)
+            elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def run_scale(num_products, folder_path, num_repeats=3, seed=1):
+    """Run all the benchmarks at a given scale.
+
+    Return a dictionary benchmark name -> execution time.
+    """
+    num_docents = max(10, num_products // PRODUCTS_PER_DOCENT)
+    prod_file_path = os.path.join(folder_path, 'db_prodotti_%d.xlsx' %\
+                                  num_products)
+    pers_file_path = os.path.join(folder_path, 'db_docenti_%d.xlsx' %\
+                                  num_products)
+    with contextlib.redirect_stdout(io.StringIO()):
+        department = synthetic.generate(prod_file_path, pers_file_path,
+                                        num_products=num_products,
+                                        num_docents=num_docents,
+                                        num_duplicates=num_products // 100,
+                                        seed=seed)
+        db_prod = ProductDatabase(prod_file_path)
+        db_pers = DocentDatabase(pers_file_path)
+    context = {
+        'folder_path'   : folder_path,
+        'prod_file_path': prod_file_path,
+        'db_prod'       : db_prod,
+        'db_pers'       : db_pers,
+        'sub_area_dict' : dict((pers.full_name, pers.sub_area) for\
+                               pers in db_pers),
+        'lookup_table'  : department.lookup_table()
+    }
+    results = {}
+    for benchmark in BENCHMARKS:
+        results[benchmark.__name__] = time_call(benchmark, context,
+                                                num_repeats)
+    return results
+
+
+def loglog_slope(scales, times):
+    """Return the slope of the least-squares straight-line fit to a series
+    of execution times vs. scale, in log-log space.
+    """
+    x = [math.log(scale) for scale in scales]
+    y = [math.log(max(t, 1.e-9)) for t in times]
+    x0 = sum(x) / len(x)
+    y0 = sum(y) / len(y)
+    sxx = sum((xi - x0)**2 for xi in x)
+    sxy = sum((xi - x0) * (yi - y0) for (xi, yi) in zip(x, y))
+    return sxy / sxx
+
+
+def run_benchmarks(scales=(1000, 2000, 4000, 8000), num_repeats=3,
+                   json_file_path=None):
+    """Run the benchmark suite and print a summary.
+
+    Return a dictionary benchmark name -> (list of times, slope, flagged).
+    """
+    folder_path = tempfile.mkdtemp(prefix='rating_benchmark_')
+    try:
+        timings = []
+        for num_products in scales:
+            print('Running benchmarks with %d products...' % num_products)
+            timings.append(run_scale(num_products, folder_path, num_repeats))
+    finally:
+        shutil.rmtree(folder_path)
+    summary = {}
+    header = '%-20s' % 'Benchmark' +\
+             ''.join('%12d' % scale for scale in scales) + '   slope'
+    print(header)
+    print('-' * len(header))
+    for benchmark in BENCHMARKS:
+        name = benchmark.__name__
+        times = [timing[name] for timing in timings]
+        flagged = False
+        slope = None
+        if len(scales) > 1:
+            slope = loglog_slope(scales, times)
+            flagged = slope > MAX_SLOPE and max(times) > MIN_TIME
+        line = '%-20s' % name + ''.join('%10.1fms' % (1000. * t) for\
+                                        t in times)
+        if slope is not None:
+            line += '%8.2f' % slope
+        if flagged:
+            line += '  <-- SUPERLINEAR'
+        print(line)
+        summary[name] = {'times': times, 'slope': slope, 'flagged': flagged}
+    if json_file_path is not None:
+        print('Writing benchmark results to %s...' % json_file_path)
+        with open(json_file_path, 'w') as output_file:
+            json.dump({'scales': list(scales), 'benchmarks': summary},
+                      output_file, indent=2)
+    return summary
+
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--scales', type=int, nargs='+',
+                        default=[1000, 2000, 4000, 8000])
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--json', default=None)
+    args = parser.parse_args()
+    run_benchmarks(args.scales, args.repeats, args.json)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Measure the startup time of the scripts.
+
+Each script is imported (but not run) in a fresh interpreter with the
+-X importtime option, and the import cost is broken down by module. Usage:
+
+>>> python check_startup.py [script.py ...]
+
+with all the dump_*.py scripts being checked by default.
+"""
+
+
+import glob
+import os
+import subprocess
+import sys
+import time
+
+
+"""Folder of the scripts.
+"""
+BASE_FOLDER_PATH = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_python(code, num_runs=3):
+    """Run a snippet of code in a fresh interpreter with the -X importtime
+    option.
+
+    Return the best wall-clock time over num_runs runs (in s), and the
+    stderr of the last run.
+    """
+    cmd = [sys.executable, '-X', 'importtime', '-c', code]
+    best = None
+    for i in range(num_runs):
+        start = time.perf_counter()
+        proc = subprocess.run(cmd, cwd=BASE_FOLDER_PATH, stdout=subprocess.PIPE,
+                              stderr=subprocess.PIPE, universal_newlines=True)
+        elapsed = time.perf_counter() - start
+        if proc.returncode != 0:
+            raise RuntimeError('Cannot run "%s":\n%s' % (code, proc.stderr))
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, proc.stderr
+
+
+def parse_import_times(output):
+    """Parse the output of -X importtime.
+
+    Return a list of (module, depth, self time, cumulative time) tuples, with
+    the times in s.
+    """
+    import_times = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        try:
+            self_time, cumulative, name = line[12:].split('|')
+            self_time = int(self_time) * 1.e-6
+            cumulative = int(cumulative) * 1.e-6
+        except ValueError:
+            continue
+        depth = (len(name) - len(name.lstrip())) // 2
+        import_times.append((name.strip(), depth, self_time, cumulative))
+    return import_times
+
+
+def script_imports(import_times, module_name):
+    """Extract the information relative to a given script from the output of
+    parse_import_times().
+
+    Since -X importtime reports each module after all the modules it imports,
+    the modules directly imported by the script are the ones at depth one
+    right before the script itself. Return the cumulative import time of the
+    script and the list of the (module, cumulative time) tuples for its direct
+    imports.
+    """
+    for (pos, (name, depth, self_time, cumulative)) in\
+        enumerate(import_times):
+        if depth == 0 and name == module_name:
+            break
+    else:
+        return 0., []
+    direct = []
+    for (name, depth, _, cum) in reversed(import_times[:pos]):
+        if depth == 0:
+            break
+        if depth == 1:
+            direct.append((name, cum))
+    return cumulative, direct
+
+
+def check_startup(script_paths, num_top=5, num_runs=3):
+    """Report the startup time of a list of scripts.
+
+    For each script we print the wall-clock time to import it (both in
+    absolute terms and net of the bare interpreter startup) and the total
+    time spent in imports, along with the num_top most expensive modules
+    among those directly imported by the script.
+    """
+    baseline, _ = run_python('pass', num_runs)
+    print('Bare interpreter startup: %.1f ms' % (1000. * baseline))
+    summary = []
+    for script_path in script_paths:
+        module_name = os.path.splitext(os.path.basename(script_path))[0]
+        wall_time, output = run_python('import %s' % module_name, num_runs)
+        total, direct = script_imports(parse_import_times(output),
+                                       module_name)
+        print('%s: %.1f ms wall-clock (+%.1f ms), %.1f ms in imports' %\
+              (module_name, 1000. * wall_time, 1000. * (wall_time - baseline),
+               1000. * total))
+        direct.sort(key=lambda item: item[1], reverse=True)
+        for (name, cumulative) in direct[:num_top]:
+            print('    %-30s %8.1f ms' % (name, 1000. * cumulative))
+        summary.append((module_name, wall_time - baseline))
+    return summary
+
+
+
+if __name__ == '__main__':
+    script_paths = sys.argv[1:]
+    if len(script_paths) == 0:
+        script_paths = sorted(glob.glob(os.path.join(BASE_FOLDER_PATH,
+                                                     'dump_*.py')))
+    check_startup(script_paths)
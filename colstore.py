@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Memory-mapped, on-disk columnar store.
+
+The store is a folder next to the original excel file, with one or more
+files per column:
+
+* numeric and boolean columns are plain .npy files, that are opened in
+  memory-mapped mode;
+* string columns are encoded as a single utf-8 blob (<attr>.data), that is
+  memory-mapped as well, plus an array of offsets (<attr>.offsets.npy) and a
+  mask of null values (<attr>.null.npy);
+* the (rare) columns mixing different types are simply pickled.
+
+A meta.json file holds the layout of the columns, along with the same header
+used by the dbcache module to validate the store against the source file.
+
+Columns are only read from disk (and, for strings, decoded) the first time
+they are accessed, so that scripts only pay for the columns they actually
+use. Since the data are memory-mapped read-only, different processes opening
+the same store share the same page cache.
+"""
+
+
+import json
+import os
+import pickle
+import shutil
+
+import numpy
+
+import dbcache
+
+
+"""Version of the store layout---bump this whenever the layout changes.
+"""
+STORE_VERSION = 2
+
+
+def store_folder_path(file_path):
+    """Return the path to the columnar store for a given source file.
+    """
+    return '%s.columns' % file_path
+
+
+def _encode_strings(values):
+    """Encode a list of strings (or None) into a (blob, offsets, null)
+    tuple.
+    """
+    chunks = [(val or '').encode('utf-8') for val in values]
+    offsets = numpy.zeros(len(chunks) + 1, dtype=numpy.int64)
+    numpy.cumsum([len(chunk) for chunk in chunks], out=offsets[1:])
+    null = numpy.array([val is None for val in values], dtype=bool)
+    return b''.join(chunks), offsets, null
+
+
+def _decode_strings(blob, offsets, null):
+    """Decode the content of a string column into a numpy object array.
+    """
+    blob = blob.tobytes()
+    column = numpy.empty(len(null), dtype=object)
+    starts = offsets[:-1].tolist()
+    stops = offsets[1:].tolist()
+    column[:] = [None if isnull else blob[start:stop].decode('utf-8') for\
+                 (start, stop, isnull) in zip(starts, stops, null.tolist())]
+    return column
+
+
+def write_store(file_path, fingerprint, columns, kinds):
+    """Write a columnar store for a given source file.
+
+    columns is a dictionary attr -> numpy array and kinds the corresponding
+    dictionary attr -> kind, in the format used by the columnar module.
+    """
+    folder_path = store_folder_path(file_path)
+    print('Writing columnar store to %s...' % folder_path)
+    tmp_folder_path = '%s.tmp' % folder_path
+    if os.path.exists(tmp_folder_path):
+        shutil.rmtree(tmp_folder_path)
+    os.makedirs(tmp_folder_path)
+    layout = {}
+    num_rows = None
+    for attr, column in columns.items():
+        kind = kinds[attr]
+        num_rows = len(column)
+        path = os.path.join(tmp_folder_path, attr)
+        if kind != 'object':
+            numpy.save('%s.npy' % path, column)
+            encoding = 'npy'
+        elif all(val is None or isinstance(val, str) for val in column):
+            blob, offsets, null = _encode_strings(column)
+            with open('%s.data' % path, 'wb') as output_file:
+                output_file.write(blob)
+            numpy.save('%s.offsets.npy' % path, offsets)
+            numpy.save('%s.null.npy' % path, null)
+            encoding = 'str'
+        else:
+            with open('%s.pickle' % path, 'wb') as output_file:
+                pickle.dump(list(column), output_file, pickle.HIGHEST_PROTOCOL)
+            encoding = 'pickle'
+        layout[attr] = {'kind': kind, 'encoding': encoding}
+    size, mtime = os.stat(file_path).st_size, os.stat(file_path).st_mtime_ns
+    meta = {
+        'store_version': STORE_VERSION,
+        'header': {
+            'version': dbcache.CACHE_VERSION,
+            'fingerprint': fingerprint,
+            'size': size,
+            'mtime': mtime,
+            'sha1': dbcache.file_hash(file_path)
+        },
+        'num_rows': num_rows,
+        'layout': layout
+    }
+    with open(os.path.join(tmp_folder_path, 'meta.json'), 'w') as meta_file:
+        json.dump(meta, meta_file, indent=2)
+    if os.path.exists(folder_path):
+        shutil.rmtree(folder_path)
+    os.rename(tmp_folder_path, folder_path)
+
+
+
+class LazyColumns(dict):
+
+    """Dictionary-like container of columns, reading each column from the
+    store the first time it is accessed.
+
+    Columns explicitly set via __setitem__ (e.g., when a column is modified)
+    live in memory and shadow the ones on disk.
+    """
+
+    def __init__(self, folder_path, layout):
+        """Constructor.
+        """
+        dict.__init__(self)
+        self.folder_path = folder_path
+        self.layout = layout
+
+    def kinds(self):
+        """Return the dictionary attr -> kind for the columns in the store.
+        """
+        return dict((attr, info['kind']) for (attr, info) in\
+                    self.layout.items())
+
+    def __missing__(self, attr):
+        """Load a column from disk.
+        """
+        encoding = self.layout[attr]['encoding']
+        path = os.path.join(self.folder_path, attr)
+        if encoding == 'npy':
+            column = numpy.load('%s.npy' % path, mmap_mode='r')
+        elif encoding == 'str':
+            offsets = numpy.load('%s.offsets.npy' % path, mmap_mode='r')
+            null = numpy.load('%s.null.npy' % path)
+            if offsets[-1] > 0:
+                blob = numpy.memmap('%s.data' % path, dtype=numpy.uint8,
+                                    mode='r')
+            else:
+                blob = numpy.zeros(0, dtype=numpy.uint8)
+            column = _decode_strings(blob, offsets, null)
+        else:
+            with open('%s.pickle' % path, 'rb') as input_file:
+                values = pickle.load(input_file)
+            column = numpy.empty(len(values), dtype=object)
+            column[:] = values
+        self[attr] = column
+        return column
+
+    def __contains__(self, attr):
+        """Overloaded method.
+        """
+        return attr in self.layout
+
+    def loaded(self):
+        """Return the list of the columns actually loaded so far.
+        """
+        return list(dict.keys(self))
+
+
+
+def open_store(file_path, fingerprint):
+    """Open the columnar store for a given source file.
+
+    Return None if the store does not exist or is stale.
+    """
+    folder_path = store_folder_path(file_path)
+    try:
+        with open(os.path.join(folder_path, 'meta.json')) as meta_file:
+            meta = json.load(meta_file)
+    except (IOError, ValueError):
+        return None
+    if meta.get('store_version') != STORE_VERSION:
+        print('Columnar store version changed, store is stale.')
+        return None
+    if not dbcache.check_header(meta['header'], file_path, fingerprint):
+        return None
+    print('Opening columnar store %s...' % folder_path)
+    return LazyColumns(folder_path, meta['layout'])
@@ -0,0 +1,511 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Columnar, numpy-backed storage engine for the product database.
+
+Rather than keeping a list of Product objects (each one with its own
+__dict__), we keep one numpy array per field, and only materialize Product
+objects when the user explicitly asks for them (e.g., when iterating).
+
+A few notes about the internal representation:
+
+* integer fields (i.e., those mapped to int in Product.FORMAT_DICT) are
+  stored as int64 arrays, with None mapped onto the INT_NULL sentinel;
+* floating-point fields are stored as float64 arrays, with None mapped onto
+  NaN;
+* if any of the values of a numeric field cannot be casted (in which case
+  the Product parsing falls back to a string) the entire column is stored
+  as an object array;
+* all the other fields are stored as object arrays.
+
+Selections are views, i.e., they share the underlying columns with the
+parent database and only keep track of the positions of the selected rows.
+"""
+
+
+import numpy
+
+import colstore
+import dbcache
+import delta
+import query
+import readers
+from rating import Product, ProductDatabase, _split_rows, _parse_rows
+
+
+"""Sentinel value for the null elements of the integer columns.
+"""
+INT_NULL = numpy.iinfo(numpy.int64).min
+
+
+def _column_kinds():
+    """Return a dictionary attr -> kind for all the columns of the engine.
+    """
+    kinds = {'row_index': 'int', 'valid': 'bool', 'author_full_name': 'object'}
+    for attr in Product.FIELD_DICT:
+        fmt = Product.FORMAT_DICT.get(attr)
+        if fmt is int:
+            kinds[attr] = 'int'
+        elif fmt is float:
+            kinds[attr] = 'float'
+        else:
+            kinds[attr] = 'object'
+    return kinds
+
+
+def _is_number(val):
+    """Return True if a value can be stored in a numeric column.
+    """
+    return isinstance(val, (int, float)) and not isinstance(val, bool)
+
+
+def _is_integer(val):
+    """Return True if a value can be stored in an integer column.
+    """
+    return isinstance(val, int) and not isinstance(val, bool) and\
+        INT_NULL < val <= numpy.iinfo(numpy.int64).max
+
+
+def pack_column(values, kind):
+    """Pack a list of native Python values into a numpy array.
+
+    Return a (array, kind) tuple, where kind might be downgraded to 'float'
+    or 'object' if the values do not fit in the requested numeric
+    representation.
+    """
+    if kind == 'bool':
+        return numpy.array(values, dtype=bool), kind
+    if kind == 'int':
+        if all(val is None or _is_integer(val) for val in values):
+            data = [INT_NULL if val is None else val for val in values]
+            return numpy.array(data, dtype=numpy.int64), kind
+        kind = 'float'
+    if kind == 'float':
+        if all(val is None or _is_number(val) for val in values):
+            data = [numpy.nan if val is None else val for val in values]
+            return numpy.array(data, dtype=float), kind
+        kind = 'object'
+    column = numpy.empty(len(values), dtype=object)
+    column[:] = values
+    return column, kind
+
+
+def unpack_value(val, kind):
+    """Convert a single element of a column back into a native Python value.
+    """
+    if kind == 'object':
+        return val
+    if kind == 'bool':
+        return bool(val)
+    if kind == 'int':
+        if val == INT_NULL:
+            return None
+        return int(val)
+    if numpy.isnan(val):
+        return None
+    return float(val)
+
+
+_COMPARISON_DICT = {
+    'lt': numpy.less,
+    'le': numpy.less_equal,
+    'gt': numpy.greater,
+    'ge': numpy.greater_equal
+}
+
+
+def predicate_mask(pred, column, kind):
+    """Return the boolean mask of the column elements satisfying a given
+    query.Predicate object.
+    """
+    if pred.op == 'eq':
+        return equal_mask(column, kind, pred.value)
+    if pred.op == 'ne':
+        return ~equal_mask(column, kind, pred.value)
+    if pred.op == 'isnull':
+        return equal_mask(column, kind, None) == pred.value
+    if kind in ('int', 'float') and pred.op in ('lt', 'le', 'gt', 'ge') and\
+       _is_number(pred.value):
+        # Note that comparisons with NaN are always False, which is what we
+        # want for the null values.
+        with numpy.errstate(invalid='ignore'):
+            mask = _COMPARISON_DICT[pred.op](column, pred.value)
+        if kind == 'int':
+            mask &= column != INT_NULL
+        return mask
+    return numpy.array([pred.test(unpack_value(val, kind)) for val in column],
+                       dtype=bool)
+
+
+def equal_mask(column, kind, val):
+    """Return the boolean mask of the column elements equal to a given value.
+    """
+    if kind in ('int', 'float'):
+        if val is None:
+            if kind == 'int':
+                return column == INT_NULL
+            return numpy.isnan(column)
+        if not _is_number(val):
+            return numpy.zeros(len(column), dtype=bool)
+    return numpy.asarray(numpy.equal(column, val), dtype=bool)
+
+
+
+class ColumnarProductDatabase(object):
+
+    """Columnar alternative to the ProductDatabase class.
+
+    The class implements the same basic interface (select(), unique_values(),
+    iteration, len()), but the information is stored in one typed numpy
+    array per field. Product objects are created on demand, and are
+    independent copies of the underlying rows: use set_values() to modify
+    the database.
+    """
+
+    def __init__(self, columns=None, kinds=None, positions=None):
+        """Constructor.
+
+        columns is a mapping attr -> numpy array, and positions (if not None)
+        is an array of integer positions identifying the rows of the view.
+        """
+        if columns is None:
+            columns = {}
+        if kinds is None:
+            kinds = _column_kinds()
+        self._columns = columns
+        self.kinds = kinds
+        self._positions = positions
+
+    @classmethod
+    def from_columns(cls, values):
+        """Build a columnar database from a dictionary attr -> list of native
+        Python values (e.g., the payload of the database cache).
+        """
+        columns = {}
+        kinds = _column_kinds()
+        for attr, kind in kinds.items():
+            columns[attr], kinds[attr] = pack_column(values[attr], kind)
+        return cls(columns, kinds)
+
+    @classmethod
+    def from_products(cls, prods):
+        """Build a columnar database from an iterable of Product objects.
+        """
+        prods = list(prods)
+        values = {}
+        for attr in _column_kinds():
+            values[attr] = [prod.__getattribute__(attr) for prod in prods]
+        return cls.from_columns(values)
+
+    @staticmethod
+    def read_columns(file_path, num_processes=None, chunk_size=5000):
+        """Parse the input excel file into a dictionary attr -> list of native
+        Python values, in the same format used by the database cache.
+
+        The rows are parsed with the very same logic used by the Product
+        class, but no Product object is created in the process. If
+        num_processes is larger than one, the rows are parsed in chunks of
+        chunk_size in a pool of worker processes.
+        """
+        print('Opening excel file %s...' % file_path)
+        reader = readers.open_reader(file_path)
+        print('Parsing file information with the %s...' % reader)
+        rows = reader.rows(Product.columns())
+        values = {}
+        if num_processes is None or num_processes <= 1:
+            for (i, row) in enumerate(rows, 2):
+                entry_values = Product.parse_row(row, i)
+                entry_values[delta.DIGEST_ATTR] = delta.row_digest(row)
+                for (attr, val) in entry_values.items():
+                    values.setdefault(attr, []).append(val)
+            return values
+        import multiprocessing
+        print('Parsing in parallel with %d processes...' % num_processes)
+        chunks = _split_rows(Product, rows, chunk_size)
+        with multiprocessing.Pool(num_processes) as pool:
+            for (attrs, chunk_values) in pool.imap(_parse_rows, chunks):
+                for (attr, column) in zip(attrs, zip(*chunk_values)):
+                    values.setdefault(attr, []).extend(column)
+        return values
+
+    @classmethod
+    def from_file(cls, file_path, num_processes=None):
+        """Build a columnar database from the input excel file.
+
+        The columns are filled directly from the cache, if a valid one
+        exists, or from the rows of the excel file otherwise (in which case
+        the cache is written for the next time). Either way, no intermediate
+        Product object is created.
+        """
+        fingerprint = ProductDatabase.cache_fingerprint()
+        values = dbcache.load(file_path, fingerprint)
+        if values is None:
+            values = cls.read_columns(file_path, num_processes)
+            dbcache.save(file_path, fingerprint, values)
+        db = cls.from_columns(values)
+        print('Done, %d product(s) stored in %d column(s).' %\
+              (len(db), len(db.kinds)))
+        return db
+
+    @classmethod
+    def from_store(cls, file_path, num_processes=None):
+        """Open the memory-mapped columnar store for the input excel file
+        (see the colstore module), creating it if necessary.
+
+        Columns are lazily read from disk the first time they are accessed.
+        """
+        fingerprint = ProductDatabase.cache_fingerprint()
+        columns = colstore.open_store(file_path, fingerprint)
+        if columns is None:
+            db = cls.from_file(file_path, num_processes)
+            colstore.write_store(file_path, fingerprint, db._columns, db.kinds)
+            columns = colstore.open_store(file_path, fingerprint)
+        return cls(columns, columns.kinds())
+
+    def field_names(self):
+        """Return the list of the fields available in the database.
+        """
+        return list(self.kinds.keys())
+
+    def positions(self):
+        """Return the positions of the rows of the view in the underlying
+        columns.
+        """
+        if self._positions is None:
+            return numpy.arange(len(self._columns['row_index']))
+        return self._positions
+
+    def column(self, attr):
+        """Return the (raw) numpy array for a given field.
+        """
+        column = self._columns[attr]
+        if self._positions is None:
+            return column
+        return column[self._positions]
+
+    def values(self, attr):
+        """Return the list of native Python values for a given field.
+        """
+        kind = self.kinds[attr]
+        return [unpack_value(val, kind) for val in self.column(attr)]
+
+    def __len__(self):
+        """Return the number of rows in the view.
+        """
+        if self._positions is None:
+            return len(self._columns['row_index'])
+        return len(self._positions)
+
+    def __getitem__(self, index):
+        """Materialize the Product object at a given index.
+        """
+        if self._positions is not None:
+            index = self._positions[index]
+        values = {}
+        for attr, kind in self.kinds.items():
+            values[attr] = unpack_value(self._columns[attr][index], kind)
+        row_index = values.pop('row_index')
+        return Product.from_values(row_index, **values)
+
+    def __iter__(self):
+        """Iterate over the Product objects in the view.
+        """
+        for i in range(len(self)):
+            yield self[i]
+
+    def iter_products(self, fields):
+        """Iterate over the Product objects in the view, materialized from a
+        subset of the fields only.
+
+        Only the columns for the given fields are touched, which, for the
+        memory-mapped store, means that only those are read from disk.
+        """
+        fields = [attr for attr in fields if attr != 'row_index']
+        columns = [self.values(attr) for attr in ['row_index'] + fields]
+        for values in zip(*columns):
+            yield Product.from_values(values[0], **dict(zip(fields,
+                                                            values[1:])))
+
+    def to_products(self):
+        """Materialize the whole view as a plain ProductDatabase.
+        """
+        db = ProductDatabase()
+        db.extend(self)
+        return db
+
+    def view(self, mask):
+        """Return a view on the rows corresponding to a boolean mask.
+        """
+        return self.__class__(self._columns, self.kinds,
+                              self.positions()[mask])
+
+    def mask(self, **kwargs):
+        """Return the boolean mask of the rows matching all the (equality)
+        criteria passed as keyword arguments.
+        """
+        mask = numpy.ones(len(self), dtype=bool)
+        for (attr, val) in kwargs.items():
+            mask &= equal_mask(self.column(attr), self.kinds[attr], val)
+        return mask
+
+    def select(self, quiet=False, **kwargs):
+        """Select a subsample of publications based on a given set of
+        criteria.
+        """
+        if kwargs == {}:
+            return self
+        if not quiet:
+            print('Selecting entries with %s...' % kwargs)
+        selection = self.view(self.mask(**kwargs))
+        if not quiet:
+            print('Done, %d entries selected.' % len(selection))
+        return selection
+
+    def query(self, quiet=False, **kwargs):
+        """Select a subsample of products based on a set of generic
+        predicates in the form attr__op=value (see the query module).
+
+        The predicates are evaluated in order of increasing estimated
+        selectivity, each one only on the rows surviving the previous ones.
+        """
+        if kwargs == {}:
+            return self
+        if not quiet:
+            print('Querying entries with %s...' % kwargs)
+        predicates = query.parse_predicates(**kwargs)
+        predicates.sort(key=lambda pred: pred.selectivity)
+        positions = self.positions()
+        for pred in predicates:
+            column = self._columns[pred.attr][positions]
+            positions = positions[predicate_mask(pred, column,
+                                                 self.kinds[pred.attr])]
+            if len(positions) == 0:
+                break
+        selection = self.__class__(self._columns, self.kinds, positions)
+        if not quiet:
+            print('Done, %d entries selected.' % len(selection))
+        return selection
+
+    def group_by(self, attr, **kwargs):
+        """Partition the rows by the value of a given field, in a single pass
+        over the corresponding column.
+
+        The optional keyword arguments are passed to query() to restrict the
+        rows to be grouped beforehand. Return a dictionary mapping each value
+        of the field into a view on the corresponding rows.
+        """
+        selection = self.query(True, **kwargs)
+        positions = selection.positions()
+        groups = {}
+        for (pos, val) in zip(positions.tolist(), selection.values(attr)):
+            try:
+                groups[val].append(pos)
+            except KeyError:
+                groups[val] = [pos]
+        for (val, group) in groups.items():
+            groups[val] = self.__class__(self._columns, self.kinds,
+                                         numpy.array(group, dtype=int))
+        return groups
+
+    def select_journal_pubs(self, quiet=False, **kwargs):
+        """Select all the publications on a journal (i.e., where the journal
+        field is not None).
+        """
+        selection = self.query(True, journal__isnull=False)
+        if kwargs != {}:
+            selection = selection.select(quiet, **kwargs)
+        return selection
+
+    def match_title(self, pattern, **kwargs):
+        """Select the products whose title contains a given pattern.
+        """
+        print('Selecting titles matching "%s" with %s...' % (pattern, kwargs))
+        selection = self.query(True, title__icontains=pattern, **kwargs)
+        print('Done, %d item(s) selected.' % len(selection))
+        return selection
+
+    def match_author_string(self, pattern, **kwargs):
+        """Select the products whose author string contains a given pattern.
+        """
+        print('Selecting author strings matching "%s" with %s...' %\
+              (pattern, kwargs))
+        selection = self.query(True, author_string__icontains=pattern,
+                               **kwargs)
+        print('Done, %d item(s) selected.' % len(selection))
+        return selection
+
+    def set_values(self, attr, value, mask=None):
+        """Set the value of a given field for all the rows in the view (or
+        for the subset of rows identified by the optional boolean mask).
+
+        This is the columnar equivalent of setting attributes on the Product
+        objects, e.g., db.set_values('valid', False, mask).
+        """
+        positions = self.positions()
+        if mask is not None:
+            positions = positions[mask]
+        kind = self.kinds[attr]
+        if kind == 'int' and _is_number(value) and not _is_integer(value):
+            values = [unpack_value(val, kind) for val in self._columns[attr]]
+            column, kind = pack_column(values, 'float')
+            self._columns[attr] = column
+            self.kinds[attr] = kind
+        if kind in ('int', 'float') and not (value is None or\
+                                             _is_number(value)):
+            values = [unpack_value(val, kind) for val in self._columns[attr]]
+            column, kind = pack_column(values, 'object')
+            self._columns[attr] = column
+            self.kinds[attr] = kind
+        if kind == 'int' and value is None:
+            value = INT_NULL
+        if kind == 'float' and value is None:
+            value = numpy.nan
+        # Memory-mapped columns are read-only, so we need to copy them in
+        # memory before writing.
+        if not self._columns[attr].flags.writeable:
+            self._columns[attr] = numpy.array(self._columns[attr])
+        self._columns[attr][positions] = value
+
+    def set_impact_factor(self, value, mask=None):
+        """Set the impact factor for the rows in the view.
+        """
+        self.set_values(Product.IF_FIELD, value, mask)
+
+    def unique_values(self, field, **kwargs):
+        """Basic stat of the unique values for a given field.
+        """
+        print('Listing unique values for field %s with %s...' %\
+              (field, kwargs))
+        selection = self.select(True, **kwargs)
+        val_dict = {}
+        for val in selection.values(field):
+            if val in val_dict:
+                val_dict[val] += 1
+            else:
+                val_dict[val] = 1
+        keys = list(val_dict.keys())
+        keys.sort()
+        num_prods = sum(val_dict.values())
+        num_keys = len(keys)
+        for key in keys:
+            val = val_dict[key]
+            frac = float(val) / num_prods
+            print('%s: %s (%.3f%%)' % (key, val, 100. * frac))
+        print('Grand-total: %d entries in %d value(s)' % (num_prods, num_keys))
+        return val_dict
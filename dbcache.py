@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Validated, schema-versioned cache for the databases.
+
+The cache file lives next to the original excel file and contains two
+pickled objects, one after the other:
+
+* a small header, with the cache format version, a fingerprint of the
+  database schema (i.e., the FIELD_DICT and FORMAT_DICT of the entry class,
+  plus any additional information the database class deems relevant) and
+  the size, modification time and SHA-1 hash of the source file;
+* the payload, which is a dictionary attr -> list of values, i.e., the
+  content of the database stored by columns of native Python types (which is
+  much faster to load than a list of pickled objects).
+
+The header is read first, and the payload is only loaded if the cache is
+valid. If the size and modification time of the source file match those in
+the header the cache is used right away, while if only the modification time
+differs (e.g., the file has been copied around) we fall back to comparing the
+content hash.
+"""
+
+
+import hashlib
+import os
+import pickle
+
+
+"""Version of the cache format---bump this whenever the layout changes.
+"""
+CACHE_VERSION = 3
+
+
+def cache_file_path(file_path):
+    """Return the path to the cache file for a given source file.
+    """
+    return '%s.cache' % file_path
+
+
+def file_hash(file_path, chunk_size=1 << 20):
+    """Return the SHA-1 hash of the content of a file.
+    """
+    sha1 = hashlib.sha1()
+    with open(file_path, 'rb') as input_file:
+        chunk = input_file.read(chunk_size)
+        while chunk:
+            sha1.update(chunk)
+            chunk = input_file.read(chunk_size)
+    return sha1.hexdigest()
+
+
+def schema_fingerprint(entry_class, extra=()):
+    """Return a fingerprint of the schema of a given DatabaseEntry class.
+
+    The fingerprint changes whenever the field or format maps of the class
+    change, or whenever any of the items in the (optional) extra argument
+    changes.
+    """
+    fields = sorted(entry_class.FIELD_DICT.items())
+    formats = sorted((attr, fmt.__name__) for (attr, fmt) in\
+                     entry_class.FORMAT_DICT.items())
+    text = repr((entry_class.__name__, fields, formats, list(extra)))
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _source_info(file_path):
+    """Return the size and modification time of the source file.
+    """
+    stat = os.stat(file_path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def read_header(file_path):
+    """Read the header of the cache for a given source file.
+
+    Return None if the cache does not exist or is unreadable.
+    """
+    try:
+        with open(cache_file_path(file_path), 'rb') as cache_file:
+            header = pickle.load(cache_file)
+    except Exception:
+        return None
+    if not isinstance(header, dict):
+        return None
+    return header
+
+
+def check_header(header, file_path, fingerprint):
+    """Return True if a cache header is valid for the given source file and
+    schema fingerprint.
+    """
+    if header is None:
+        return False
+    if header.get('version') != CACHE_VERSION:
+        print('Cache format version changed, cache is stale.')
+        return False
+    if header.get('fingerprint') != fingerprint:
+        print('Database schema changed, cache is stale.')
+        return False
+    size, mtime = _source_info(file_path)
+    if header.get('size') != size:
+        print('Source file size changed, cache is stale.')
+        return False
+    if header.get('mtime') == mtime:
+        return True
+    if header.get('sha1') != file_hash(file_path):
+        print('Source file content changed, cache is stale.')
+        return False
+    return True
+
+
+def load(file_path, fingerprint, check=True):
+    """Load the cached payload for a given source file.
+
+    Return None if the cache does not exist or is stale. (If check is False
+    the header is not validated against the source file, which is useful to
+    retrieve the last snapshot of a file that has been changed.)
+    """
+    header = read_header(file_path)
+    if header is None:
+        return None
+    if check and not check_header(header, file_path, fingerprint):
+        return None
+    print('Loading cached db from %s...' % cache_file_path(file_path))
+    with open(cache_file_path(file_path), 'rb') as cache_file:
+        pickle.load(cache_file)
+        payload = pickle.load(cache_file)
+    return payload
+
+
+def load_snapshot(file_path, fingerprint):
+    """Load the last cached snapshot for a given source file, irrespective of
+    whether the source file has changed since.
+
+    Return None if the cache does not exist or has been written with a
+    different format version or database schema (in which case the snapshot
+    cannot be reused).
+    """
+    header = read_header(file_path)
+    if header is None:
+        return None
+    if header.get('version') != CACHE_VERSION or\
+       header.get('fingerprint') != fingerprint:
+        print('Cached snapshot not compatible, ignored.')
+        return None
+    return load(file_path, fingerprint, check=False)
+
+
+def save(file_path, fingerprint, payload):
+    """Write the cache for a given source file.
+    """
+    size, mtime = _source_info(file_path)
+    header = {
+        'version': CACHE_VERSION,
+        'fingerprint': fingerprint,
+        'size': size,
+        'mtime': mtime,
+        'sha1': file_hash(file_path)
+    }
+    print('Writing cached db to %s...' % cache_file_path(file_path))
+    # Write to a temporary file and rename, so that an interrupted run never
+    # leaves a truncated cache behind.
+    tmp_file_path = '%s.tmp' % cache_file_path(file_path)
+    with open(tmp_file_path, 'wb') as cache_file:
+        pickle.dump(header, cache_file, pickle.HIGHEST_PROTOCOL)
+        pickle.dump(payload, cache_file, pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file_path, cache_file_path(file_path))
+
+
+def entries_to_columns(entries):
+    """Convert a list of DatabaseEntry objects into a dictionary of columns.
+    """
+    if len(entries) == 0:
+        return {}
+    attrs = list(entries[0].__dict__.keys())
+    return dict((attr, [entry.__dict__[attr] for entry in entries]) for\
+                attr in attrs)
+
+
+def columns_to_entries(entry_class, columns):
+    """Convert a dictionary of columns back into a list of DatabaseEntry
+    objects.
+    """
+    if len(columns) == 0:
+        return []
+    attrs = list(columns.keys())
+    entries = []
+    for values in zip(*[columns[attr] for attr in attrs]):
+        entry = entry_class.__new__(entry_class)
+        entry.__dict__.update(zip(attrs, values))
+        entries.append(entry)
+    return entries
@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Duplicate detection based on blocking keys.
+
+Product.__eq__() declares two products equal if any of the following is
+true:
+
+* they have the same (non-null) DOI;
+* the first one is a monograph and they have the same (non-null) ISBN;
+* the first 75 characters of the title, the year and the journal match.
+
+Each of these rules can be turned into a blocking key, i.e., a hashable
+tuple such that two products match under the rule if and only if they share
+the key. Finding a match for a product among a set of others is then a
+matter of a few dictionary lookups, rather than a pairwise comparison with
+all of them.
+
+Note the ISBN rule is not symmetric (only the left-hand side of the
+comparison needs to be a monograph), which is why we distinguish between
+the keys a product is registered with (as the left-hand side) and the keys
+used to look it up (as the right-hand side).
+"""
+
+
+"""Publication type for which the ISBN rule applies.
+"""
+MONOGRAPH_TYPE = '3.1 Monografia o trattato scientifico'
+
+
+def title_key(prod):
+    """Return the blocking key for the title-year-journal rule.
+    """
+    return ('title', prod.title[:75], prod.year, prod.journal)
+
+
+def registration_keys(prod):
+    """Return the blocking keys for a product acting as the left-hand side
+    of Product.__eq__().
+    """
+    keys = []
+    if prod.doi is not None:
+        keys.append(('doi', prod.doi))
+    if prod.pub_type == MONOGRAPH_TYPE and prod.isbn is not None:
+        keys.append(('isbn', prod.isbn))
+    keys.append(title_key(prod))
+    return keys
+
+
+def lookup_keys(prod):
+    """Return the blocking keys for a product acting as the right-hand side
+    of Product.__eq__().
+    """
+    keys = []
+    if prod.doi is not None:
+        keys.append(('doi', prod.doi))
+    if prod.isbn is not None:
+        keys.append(('isbn', prod.isbn))
+    keys.append(title_key(prod))
+    return keys
+
+
+
+class DuplicateFinder(object):
+
+    """Incremental duplicate finder.
+
+    This is the hash-based equivalent of keeping a list of unique products
+    and checking each new product with unique.index(prod): products are fed
+    one at a time to check(), which returns the first unique product the new
+    one is a duplicate of (or None, in which case the new product is added to
+    the list of the unique ones).
+    """
+
+    def __init__(self):
+        """Constructor.
+        """
+        self.unique = []
+        self._key_dict = {}
+
+    def find(self, prod):
+        """Return the first unique product matching a given product, or None.
+        """
+        pos = None
+        for key in lookup_keys(prod):
+            hit = self._key_dict.get(key)
+            if hit is not None and (pos is None or hit < pos):
+                pos = hit
+        if pos is None:
+            return None
+        return self.unique[pos]
+
+    def add(self, prod):
+        """Add a product to the list of the unique ones.
+
+        Since the list is only growing, the first product registered with a
+        given key is always the one with the lowest position.
+        """
+        pos = len(self.unique)
+        self.unique.append(prod)
+        for key in registration_keys(prod):
+            self._key_dict.setdefault(key, pos)
+
+    def check(self, prod):
+        """Check a product against the list of the unique ones.
+        """
+        duplicate = self.find(prod)
+        if duplicate is None:
+            self.add(prod)
+        return duplicate
+
+
+
+def find_duplicates(prods):
+    """Return the list of (product, duplicate) pairs for a list of products,
+    where duplicate is the first product preceding product in the list
+    that product is a duplicate of.
+    """
+    finder = DuplicateFinder()
+    pairs = []
+    for prod in prods:
+        duplicate = finder.check(prod)
+        if duplicate is not None:
+            pairs.append((prod, duplicate))
+    return pairs
+
+
+
+class DisjointSet(object):
+
+    """Minimal disjoint-set (union-find) data structure over the integers
+    0...size - 1, with union by rank and path halving.
+    """
+
+    def __init__(self, size):
+        """Constructor.
+        """
+        self.parent = list(range(size))
+        self.rank = [0] * size
+
+    def find(self, i):
+        """Return the representative of the set containing i.
+        """
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, i, j):
+        """Merge the sets containing i and j.
+        """
+        i = self.find(i)
+        j = self.find(j)
+        if i == j:
+            return
+        if self.rank[i] < self.rank[j]:
+            i, j = j, i
+        self.parent[j] = i
+        if self.rank[i] == self.rank[j]:
+            self.rank[i] += 1
+
+    def sets(self):
+        """Return the list of all the sets, each one as a sorted list of
+        integers, in order of their smallest element.
+        """
+        set_dict = {}
+        for i in range(len(self.parent)):
+            root = self.find(i)
+            try:
+                set_dict[root].append(i)
+            except KeyError:
+                set_dict[root] = [i]
+        return list(set_dict.values())
+
+
+
+def cluster_duplicates(prods, min_handles=2):
+    """Cluster a list of products into the connected components of the
+    "is a duplicate of" relation, i.e., two products end up in the same
+    cluster if they are linked by a chain of products matching under any of
+    the Product.__eq__() rules (in either direction).
+
+    Since the same product appears once for each of its authors in the
+    database, the clusters with less than min_handles distinct handles
+    (i.e., the same product for different docents) are not returned.
+
+    Return the list of the clusters, each one as a list of products, in
+    order of appearance in the input list.
+    """
+    prods = list(prods)
+    disjoint_set = DisjointSet(len(prods))
+    first_dict = {}
+    isbn_dict = {}
+    for (i, prod) in enumerate(prods):
+        keys = [title_key(prod)]
+        if prod.doi is not None:
+            keys.append(('doi', prod.doi))
+        for key in keys:
+            j = first_dict.setdefault(key, i)
+            if j != i:
+                disjoint_set.union(i, j)
+        if prod.isbn is not None:
+            isbn_dict.setdefault(prod.isbn, []).append(i)
+    # The ISBN rule only links products sharing the ISBN with a monograph,
+    # but then all of them are linked to it.
+    for positions in isbn_dict.values():
+        for i in positions:
+            if prods[i].pub_type == MONOGRAPH_TYPE:
+                for j in positions:
+                    disjoint_set.union(i, j)
+                break
+    clusters = []
+    for positions in disjoint_set.sets():
+        if len(positions) < min_handles:
+            continue
+        cluster = [prods[i] for i in positions]
+        if len(set(prod.handle for prod in cluster)) >= min_handles:
+            clusters.append(cluster)
+    return clusters
+
+
+def duplicate_rows(clusters):
+    """Return the sorted list of the rows to be marked as duplicates for a
+    list of clusters, in the format of the DUPLICATES list in the _rating
+    configuration modules.
+
+    Within each cluster, the products are grouped by author, and all but the
+    first product (in row order) of each author are flagged, consistently
+    with what dump_duplicates.py does on a per-author basis.
+    """
+    rows = []
+    for cluster in clusters:
+        author_dict = {}
+        for prod in cluster:
+            author_dict.setdefault(prod.author_full_name, []).append(prod)
+        for prods in author_dict.values():
+            row_indices = sorted(prod.row_index for prod in prods)
+            rows += row_indices[1:]
+    return sorted(rows)
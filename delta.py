@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Incremental reload of a new export against the cached snapshot.
+
+Each entry parsed from an excel file carries a digest of the raw cell values
+of its row, which is stored in the cache along with all the other fields.
+When a new version of the file comes in, the last cached snapshot is used to
+avoid parsing the rows that have not changed: each row of the new file is
+digested and, if an entry with the same digest exists in the snapshot, the
+entry is reused as it is (with the row index updated), while only the rows
+that are new or changed are actually parsed.
+
+Once the new database is assembled, it is compared with the snapshot by a
+key attribute (the handle, for the products) to figure out which keys have
+been added, removed or changed. Since the raw values depend on the reader
+backend, the comparison is done on the parsed field values, so that a
+change of file format does not result in spurious changes (but only in a
+full reparse). Finally, the delta is mapped onto the set of the affected
+owners (the docents, for the products), i.e., those whose downstream results
+need to be recomputed.
+"""
+
+
+import hashlib
+
+
+"""Name of the (private) entry attribute holding the row digest.
+"""
+DIGEST_ATTR = '_digest'
+
+
+def row_digest(row):
+    """Return a digest of a row of raw cell values.
+
+    Mind we cannot use the built-in hash(), since the hashes of strings are
+    randomized on a per-process basis, and the digests need to be compared
+    across different runs.
+    """
+    return hashlib.blake2b(repr(tuple(row)).encode('utf-8'),
+                           digest_size=8).digest()
+
+
+
+class SnapshotIndex(object):
+
+    """Index of the entries in a cached snapshot by row digest.
+    """
+
+    def __init__(self, entries):
+        """Constructor.
+        """
+        self.entries = entries
+        self._digest_dict = {}
+        for entry in entries:
+            digest = entry.__dict__.get(DIGEST_ATTR)
+            if digest is not None:
+                self._digest_dict.setdefault(digest, []).append(entry)
+        self.num_reused = 0
+
+    def reuse(self, digest, row_index):
+        """Return an entry of the snapshot with a given digest (updating its
+        row index), or None if there is none left.
+
+        Each entry is reused at most once, so that identical rows in the new
+        file map onto distinct entries.
+        """
+        try:
+            entry = self._digest_dict[digest].pop()
+        except (KeyError, IndexError):
+            return None
+        entry.__dict__['row_index'] = row_index
+        self.num_reused += 1
+        return entry
+
+
+
+class ExportDelta(object):
+
+    """Small container describing the difference between two versions of a
+    database.
+    """
+
+    def __init__(self, added=(), removed=(), changed=(), affected=()):
+        """Constructor.
+        """
+        self.added = sorted(added, key=str)
+        self.removed = sorted(removed, key=str)
+        self.changed = sorted(changed, key=str)
+        self.affected = set(affected)
+
+    def empty(self):
+        """Return True if the two versions are equivalent.
+        """
+        return len(self.added) + len(self.removed) + len(self.changed) == 0
+
+    def __str__(self):
+        """String formatting.
+        """
+        return '%d added, %d removed, %d changed, %d owner(s) affected' %\
+            (len(self.added), len(self.removed), len(self.changed),
+             len(self.affected))
+
+
+
+def _group(entries, key_attr, fields):
+    """Group the field values of a list of entries by key.
+
+    Return a dictionary key -> {field values: multiplicity}.
+    """
+    groups = {}
+    for entry in entries:
+        values = tuple(entry.__dict__.get(attr) for attr in fields)
+        counts = groups.setdefault(entry.__dict__.get(key_attr), {})
+        counts[values] = counts.get(values, 0) + 1
+    return groups
+
+
+def _owners(entries, owner_attr):
+    """Return the set of the owners of a list of entries.
+    """
+    if owner_attr is None:
+        return set()
+    return set(entry.__dict__.get(owner_attr) for entry in entries)
+
+
+def diff(old_entries, new_entries, key_attr, fields, owner_attr=None):
+    """Compare two versions of a database by key.
+
+    All the entries sharing the same key are compared as a whole (as a
+    multiset of field values, so that their order does not matter), and the
+    key is flagged as changed if anything differs. owner_attr, if not None,
+    is the attribute identifying the owner of each entry, and the affected
+    owners are those of the entries, either old or new, under any key that
+    has been added, removed or changed.
+    """
+    old_groups = _group(old_entries, key_attr, fields)
+    new_groups = _group(new_entries, key_attr, fields)
+    added = [key for key in new_groups if key not in old_groups]
+    removed = [key for key in old_groups if key not in new_groups]
+    changed = [key for key in new_groups if key in old_groups and\
+               new_groups[key] != old_groups[key]]
+    keys = set(added + removed + changed)
+    affected = _owners((entry for entry in old_entries if\
+                        entry.__dict__.get(key_attr) in keys), owner_attr)
+    affected |= _owners((entry for entry in new_entries if\
+                         entry.__dict__.get(key_attr) in keys), owner_attr)
+    return ExportDelta(added, removed, changed, affected)
@@ -37,10 +37,7 @@ def dump_dbprod_reduced(file_path):
         'wos_jif',
         'wos_j5yif'
     ]
-    rows = []
-    for prod in db:
-        row = [prod.__getattribute__(key) for key in col_names]
-        rows.append(row)
+    rows = ([prod.__getattribute__(key) for key in col_names] for prod in db)
     table = ExcelTableDump()
     table.add_worksheet('DB prodotti ridotto', col_names, rows)
     table.write(file_path)
@@ -48,4 +45,4 @@ def dump_dbprod_reduced(file_path):
 
 
 if __name__ == '__main__':
-    dump_dbprod_reduced('db_prodotti_ridotto.xls')
+    dump_dbprod_reduced('db_prodotti_ridotto.xlsx')
@@ -17,56 +17,15 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
 
-from rating import *
+from qa import DoiDuplicateCheck, run_checks
+
 
 
 def dump_doi_duplicates(file_path=None):
     """Dump a list of papers with the same DOI and different unique handles.
     """
-    db = load_db_prod()
-    print('Dumping DOI duplicates...')
-
-    # Some bookkeeping variables.
-    handle_dict = {}
-    doi_dict = {}
-    num_errors = 0
-    error_doi_list = []
-
-    #Start the loop.
-    for prod in db:
-        doi = prod.doi
-        if doi is not None:
-            handle = prod.handle
-            label = '%s @ row %d.' % (prod.author(), prod.row_index)
-            if handle in handle_dict:
-                handle_dict[handle].append(label)
-            else:
-                handle_dict[handle] = [label]
-            if doi in doi_dict:
-                try:
-                    assert handle in doi_dict[doi]
-                except AssertionError:
-                    num_errors += 1
-                    doi_dict[doi].append(handle)
-                    error_doi_list.append(doi)
-                    print('Duplicated DOI (%s) for %s' % (doi, prod))
-            else:
-                doi_dict[doi] = [handle]
-    print('%d error(s) found.' % num_errors)
+    run_checks(file_path, [DoiDuplicateCheck()])
 
-    # Write the output file.
-    table = ExcelTableDump()
-    col_names = ['DOI', 'Handle 1', 'Handle 2', 'Handle 3', 'Handle 4']
-    rows = []
-    for i, doi in enumerate(error_doi_list):
-        row = [doi]
-        for col, value in enumerate(doi_dict[doi]):
-            value = '%s %s' % (value, handle_dict[value])
-            row.append(value)
-        rows.append(row)
-    table.add_worksheet('DOI duplicati', col_names, rows)
-    table.write(file_path)
-        
 
 
 if __name__ == '__main__':
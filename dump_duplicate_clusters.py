@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+from rating import *
+from dedup import cluster_duplicates, duplicate_rows
+
+import _rating2020 as _rating
+
+
+def dump_duplicate_clusters(file_path, print_duplicates=True):
+    """Dump all the clusters of duplicate products in the database.
+
+    If print_duplicates is True, the list of the rows to be marked as
+    duplicates is printed at the end, in a format that can be pasted
+    straight into the _rating configuration module.
+    """
+    db_prod = load_db_prod()
+
+    print('Clustering duplicates...')
+    clusters = cluster_duplicates(db_prod)
+    print('Done, %d cluster(s) found.' % len(clusters))
+    rows = []
+    for (i, cluster) in enumerate(clusters):
+        prod = cluster[0]
+        row_indices = ', '.join('%d' % p.row_index for p in cluster)
+        handles = ', '.join(sorted(set(p.handle for p in cluster)))
+        authors = ', '.join(sorted(set(p.author() for p in cluster)))
+        print('Cluster %d: rows %s (%s)' % (i, row_indices, prod.title))
+        rows.append([i, len(cluster), row_indices, handles, authors,
+                     prod.title, prod.journal, prod.year, prod.doi])
+
+    table = ExcelTableDump()
+    col_names = ['Cluster', 'Numero prodotti', 'Righe', 'Handle', 'Autori',
+                 'Titolo', 'Rivista', 'Anno', 'DOI']
+    table.add_worksheet('Cluster duplicati', col_names, rows)
+    table.write(file_path)
+
+    if print_duplicates:
+        print()
+        print('"""List of duplicates, indexed by row number.')
+        print('"""')
+        print('DUPLICATES = [')
+        for row_index in duplicate_rows(clusters):
+            line = '    %d,' % row_index
+            if row_index not in _rating.DUPLICATES:
+                line += ' # new'
+            print(line)
+        print(']')
+
+
+
+if __name__ == '__main__':
+    dump_duplicate_clusters('duplicate_clusters.xls')
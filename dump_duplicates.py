@@ -18,6 +18,7 @@
 
 
 from rating import *
+from dedup import find_duplicates
 
 
 def dump_duplicates(file_path):
@@ -28,22 +29,18 @@ def dump_duplicates(file_path):
 
     print('Searching for duplicates...')
     rows = []
+    prods_dict = db_prod.group_by('author_full_name')
     for pers in db_pers:
-        prods = db_prod.select(author_full_name=pers.full_name)
-        unique = ProductDatabase()
-        for prod in prods:
-            try:
-                duplicate = unique[unique.index(prod)]
-                print('%s is a duplicate of %s.' % (prod, duplicate))
-                row = [pers.full_name, prod.row_index, prod.handle, prod.doi,
-                       prod.title, prod.journal, prod.year,
-                       prod.impact_factor(), duplicate.row_index,
-                       duplicate.handle, duplicate.doi, duplicate.title,
-                       duplicate.journal, duplicate.year,
-                       duplicate.impact_factor()]
-                rows.append(row)
-            except ValueError:
-                unique.append(prod)
+        prods = prods_dict.get(pers.full_name, ProductDatabase())
+        for (prod, duplicate) in find_duplicates(prods):
+            print('%s is a duplicate of %s.' % (prod, duplicate))
+            row = [pers.full_name, prod.row_index, prod.handle, prod.doi,
+                   prod.title, prod.journal, prod.year,
+                   prod.impact_factor(), duplicate.row_index,
+                   duplicate.handle, duplicate.doi, duplicate.title,
+                   duplicate.journal, duplicate.year,
+                   duplicate.impact_factor()]
+            rows.append(row)
 
     print('Dumping duplicates...')
     table = ExcelTableDump()
@@ -17,30 +17,15 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
 
-from rating import *
+from qa import ErrataCheck, run_checks
+
 
 
 def dump_errata(file_path):
-    """Dump a list of papers with the same DOI and different unique handles.
+    """Dump a list of the products which are really errata or corrigenda.
     """
-    db_prod = load_db_prod()
-
-    print('Searching for errata...')
-    rows = []
-    for prod in db_prod:
-        title = prod.title.lower()
-        if title.startswith('errat') or title.startswith('corrig'):
-            print('Erratum @ row %d for %s' %\
-                  (prod.row_index, prod.author_surname))
-            row = [prod.author_surname, prod.row_index, prod.handle, prod.title]
-            rows.append(row)
-
-    print('Dumping errata...')
-    table = ExcelTableDump()
-    col_names = ['Autore', 'Riga', 'Handle', 'Titolo']
-    table.add_worksheet('Errata', col_names, rows)        
-    table.write(file_path)
-        
+    run_checks(file_path, [ErrataCheck()])
+
 
 
 if __name__ == '__main__':
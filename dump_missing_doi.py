@@ -17,7 +17,7 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
 
-from rating import *
+from qa import MissingDoiCheck, run_checks
 
 
 
@@ -25,26 +25,7 @@ def dump_missing_doi(file_path=None):
     """Dump a list of papers in (supposedly) refereed journals missing the
     DOI field.
     """
-    db = load_db_prod().select(pub_type='1.1 Articolo in rivista', doi=None)
-    print('Dumping suspect author lists...')
-
-    # Bookkeeping.
-    rows = []
-
-    # Product loop.
-    for prod in db:
-        handle = prod.handle
-        print(prod)
-        rows.append([handle, prod.pub_type, prod.author(), prod.title,
-                     prod.journal, prod.year, prod.impact_factor()])
-    print('Done, %s suspect entries found.' % len(rows))
-
-    # Write the output file.
-    table = ExcelTableDump()
-    col_names = ['Handle', 'Type', 'Author', 'Title', 'Journal', 'Year',
-                 'Impact factor']
-    table.add_worksheet('DOI mancanti', col_names, rows)
-    table.write(file_path)
+    run_checks(file_path, [MissingDoiCheck()])
 
 
 
@@ -17,7 +17,7 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
 
-from rating import *
+from qa import MissingIfCheck, run_checks
 
 
 
@@ -25,25 +25,7 @@ def dump_missing_if(file_path=None):
     """Dump a list of papers in (supposedly) refereed journals missing the
     impact factor.
     """
-    db = load_db_prod().select(pub_type='1.1 Articolo in rivista')
-
-    # Bookkeeping.
-    rows = []
-
-    # Product loop.
-    for prod in db:
-        if prod.impact_factor() is None:
-            print(prod)
-            rows.append([prod.handle, prod.pub_type, prod.author(), prod.title,
-                         prod.journal, prod.year, prod.impact_factor()])
-    print('Done, %s suspect entries found.' % len(rows))
-
-    # Write the output file.
-    table = ExcelTableDump()
-    col_names = ['Handle', 'Type', 'Author', 'Title', 'Journal', 'Year',
-                 'Impact factor']
-    table.add_worksheet('IF mancanti', col_names, rows)
-    table.write(file_path)
+    run_checks(file_path, [MissingIfCheck()])
 
 
 
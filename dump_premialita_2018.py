@@ -18,9 +18,9 @@
 
 
 import numpy
-import matplotlib.pyplot as plt
 
 from rating import *
+from ratingcache import RatingCache, RATING_CACHE_FILE_PATH
 
 import _rating2018 as _rating
 
@@ -32,39 +32,33 @@ CANDIDATES = ['BONATI CLAUDIO',
 YEAR = 2018
 
 
-def go():
-    """
+def go(cache_file_path=None):
+    """Dump the rating information for the 2018 candidates.
+
+    If cache_file_path is not None, the rating points are persisted to (and
+    read back from) the corresponding file across runs.
     """
+    # Mind dump_rating pulls in the plotting and all the rest of the
+    # machinery for the full dump, and we only need the post-processing.
+    from dump_rating import post_process
     db_prod = load_db_prod()
     db_pers = load_db_pers()
+    cache = RatingCache(file_path=cache_file_path)
     sub_areas = sorted(Product.SUB_AREA_DICT.keys())
 
     # First loop over the products, where we mark the invalid as such, and
-    # we manually set the journal impact factor where necessary.
+    # we manually set the journal impact factor where necessary (just like
+    # dump_rating does, with the 2018 lists).
     print('Post-processing product list...')
-    for prod in db_prod:
-        # Mark invalids.
-        if prod.row_index in _rating.INVALID:
-            print('Marking product @ row %d for %s as invalid...' %\
-                  (prod.row_index, prod.author_surname))
-            prod.valid = False
-        # Set impact factor if necessary.
-        if prod.pub_type == '1.1 Articolo in rivista' and \
-           prod.impact_factor() is None and \
-           prod.journal in _rating.IMPACT_FACTOR_DICT.keys():
-            journal = prod.journal
-            impact_factor = _rating.IMPACT_FACTOR_DICT[journal]
-            print('Setting IF for %s @ row %d to %.3f...' %\
-                  (journal, prod.row_index, impact_factor))
-            prod.set_impact_factor(impact_factor)
-    
+    post_process(db_prod, rating_module=_rating)
+
     for full_name in CANDIDATES:
         docent = db_pers.select(full_name=full_name, quiet=True)[0]
         print(docent)
         prods = db_prod.select(quiet=True, author_full_name=full_name,
                                year=YEAR, valid=True)
-        rating_points = numpy.array([p.rating_points(docent.sub_area,
-                                                     _rating.RATING_DICT) \
+        rating_points = numpy.array([cache.rating_points(p, docent.sub_area,
+                                                         _rating.RATING_DICT) \
                                      for p in prods])
         num_authors = numpy.array([p.num_authors for p in prods])
         print('Number of products in 2018: %d' % len(rating_points))
@@ -72,7 +66,17 @@ def go():
         print('Co-authors (min, median, max): %d, %.3f, %d' %\
               (num_authors.min(), numpy.median(num_authors), num_authors.max()))
         print('\n')
+    print(cache)
+    if cache_file_path is not None:
+        cache.save()
 
 
 if __name__ == '__main__':
-    go()
+    import argparse
+    parser = argparse.ArgumentParser(description='Dump the rating information '
+                                     'for the 2018 candidates.')
+    parser.add_argument('--cache', nargs='?', const=RATING_CACHE_FILE_PATH,
+                        default=None, help='persist the rating points to file '
+                        '(default %s)' % RATING_CACHE_FILE_PATH)
+    args = parser.parse_args()
+    go(args.cache)
@@ -18,13 +18,24 @@
 
 
 import numpy
-import matplotlib.pyplot as plt
 
 from rating import *
+from batch_rating import BatchRatingEngine
+from groupstats import GroupBy
+from journals import JournalIndex
+from logger import logger
+from metrics import RunMetrics, Span
+import plotting
 
 import _rating2020 as _rating
 
 
+"""Default path to the file collecting the metrics of the runs, when metrics
+recording is requested from the command line.
+"""
+METRICS_FILE_PATH = 'rating_metrics.jsonl'
+
+
 def filter_db_pers(db_pers):
     """This is filtering a DocentDatabse object removing all the persons with
     less than 2 products (which automatically get 0 rating points).
@@ -43,76 +54,155 @@ def filter_db_pers(db_pers):
     return db
 
 
-def dump_rating(file_path, collab_threshold=30):
+def post_process(db_prod, span=None, rating_module=_rating,
+                 if_fields=(Product.IF_FIELD,)):
+    """Mark the invalid products as such, and set the journal impact factor
+    where necessary (matching the journal names through a normalized index,
+    rather than by exact key).
+
+    rating_module is the module with the list of the invalid products and
+    the impact factor dictionary (by default, the one used for the rating).
+    if_fields are the product fields the impact factor is set for (by
+    default, the one used for the rating).
+    The number of products processed, invalid products and impact factors set
+    are counted in span (a metrics.Span object), if not None.
+    """
+    if span is None:
+        span = Span('post-processing')
+    journal_index = JournalIndex(rating_module.IMPACT_FACTOR_DICT)
+    fuzzy_journals = set()
+    for prod in db_prod:
+        # Mark invalids.
+        if prod.row_index in rating_module.INVALID:
+            logger.debug('Marking product @ row %d for %s as invalid...',
+                         prod.row_index, prod.author_surname)
+            prod.valid = False
+            span.count(counter='num_invalid')
+        # Set impact factor if necessary.
+        if prod.pub_type != '1.1 Articolo in rivista':
+            continue
+        for if_field in if_fields:
+            if prod.__getattribute__(if_field) is not None:
+                continue
+            match = journal_index.match(prod.journal)
+            impact_factor = journal_index.get(prod.journal)
+            if impact_factor is not None:
+                # Non-exact matches are worth a look (once per journal).
+                if match[1] < 1. and prod.journal not in fuzzy_journals:
+                    logger.warning('Journal "%s" matched to "%s" (similarity '
+                                   '%.3f)', prod.journal, match[0], match[1])
+                    fuzzy_journals.add(prod.journal)
+                logger.debug('Setting %s for %s @ row %d to %.3f...',
+                             if_field, prod.journal, prod.row_index,
+                             impact_factor)
+                prod.__setattr__(if_field, impact_factor)
+                span.count(counter='num_if_set')
+    # We have been changing the entries behind the back of the database.
+    db_prod.invalidate_indexes()
+    span.count(len(db_prod))
+
+
+def product_statistics(prods, collab_threshold=30):
+    """Calculate the basic product statistics for all the authors at once.
+
+    Return a dictionary attribute -> dictionary author full name -> value,
+    with all the values as native Python types (for the excel interface
+    module to be able to write them in the output file).
+    """
+    groups = GroupBy([prod.author_full_name for prod in prods])
+    num_authors = numpy.array([prod.num_authors for prod in prods])
+    return {
+        'num_collab_products':
+            groups.to_dict(groups.count(num_authors > collab_threshold)),
+        'min_num_authors': groups.to_dict(groups.min(num_authors)),
+        'median_num_authors': groups.to_dict(groups.median(num_authors)),
+        'max_num_authors': groups.to_dict(groups.max(num_authors))
+    }
+
+
+def dump_rating(file_path, collab_threshold=30, headless=None,
+                metrics_file_path=None):
     """Dump the full rating information.
+
+    If headless is True the plots are only saved to file, and not shown
+    (see the plotting module for the default).
+
+    Each phase of the run is timed and summarized on the terminal. If
+    metrics_file_path is not None, the metrics record for the run is also
+    appended to the corresponding file (see the metrics module).
     """
+    metrics = RunMetrics('dump_rating')
+
     # Load the underlying database objects.
-    db_prod = load_db_prod()
-    db_pers = load_db_pers()
+    with metrics.phase('load') as span:
+        db_prod = load_db_prod()
+        db_pers = load_db_pers()
+        span.count(len(db_prod) + len(db_pers))
     sub_areas = sorted(Product.SUB_AREA_DICT.keys())
 
     # First loop over the products, where we mark the invalid as such, and
     # we manually set the journal impact factor where necessary.
     print('Post-processing product list...')
-    for prod in db_prod:
-        # Mark invalids.
-        if prod.row_index in _rating.INVALID:
-            print('Marking product @ row %d for %s as invalid...' %\
-                  (prod.row_index, prod.author_surname))
-            prod.valid = False
-        # Set impact factor if necessary.
-        if prod.pub_type == '1.1 Articolo in rivista' and \
-           prod.impact_factor() is None and \
-           prod.journal in _rating.IMPACT_FACTOR_DICT.keys():
-            journal = prod.journal
-            impact_factor = _rating.IMPACT_FACTOR_DICT[journal]
-            print('Setting IF for %s @ row %d to %.3f...' %\
-                  (journal, prod.row_index, impact_factor))
-            prod.set_impact_factor(impact_factor)
+    with metrics.phase('post-processing') as span:
+        post_process(db_prod, span)
 
     # Break out the docent database into the three sub-areas.
     # Mind at this points the sub-lists still contain the persons with less
     # than 2 products.
     print('Populating sub-areas...')
-    pers_dict = {}
-    for sub_area in sub_areas:
-        pers_dict[sub_area] = db_pers.select(sub_area=sub_area)
+    with metrics.phase('sub-area split') as span:
+        pers_dict = {}
+        for sub_area in sub_areas:
+            pers_dict[sub_area] = db_pers.select(sub_area=sub_area)
+            span.count(len(pers_dict[sub_area]))
 
-    # Actual loop to calculate the rating points and the basic product
-    # statistics for all the docents.
+    # Actual loop to calculate the rating points for all the docents.
+    # Note we partition the valid products by author in a single pass, rather
+    # than running a separate selection for each docent.
     print('Calculating rating points...')
-    for sub_area in sub_areas:
-        for pers in pers_dict[sub_area]:
-            prods = db_prod.select(author_full_name=pers.full_name, valid=True)
-            pers.num_products = len(prods)
-            if len(prods) == 0:
-                continue
-            rating = sum(prod.rating_points(sub_area, _rating.RATING_DICT) for\
-                         prod in prods)
-
-            # Take any leave of absence into account.
-            if pers.full_name in _rating.LOA_SCALING_DICT:
-                scale = _rating.LOA_SCALING_DICT[pers.full_name]
-                print('Scaling rating for %s by %.3f' % (pers.full_name, scale))
-                rating *= scale
-
-            num_authors = numpy.array([prod.num_authors for prod in prods])
-            # Update the Docent object.
-            pers.rating = rating
-            # Note that we're casting all the numpy scalars to native Python
-            # types for the excel interface module to be able to write them in
-            # the output file.
-            pers.num_collab_products = \
-                int((num_authors > collab_threshold).sum())
-            pers.min_num_authors = int(num_authors.min())
-            pers.median_num_authors = float(numpy.median(num_authors))
-            pers.max_num_authors = int(num_authors.max())
+    with metrics.phase('rating loop') as span:
+        valid_prods = db_prod.query(True, valid=True)
+        prods_dict = valid_prods.group_by('author_full_name')
+        engine = BatchRatingEngine()
+        for sub_area in sub_areas:
+            for pers in pers_dict[sub_area]:
+                prods = prods_dict.get(pers.full_name, ProductDatabase())
+                pers.num_products = len(prods)
+                if len(prods) == 0:
+                    continue
+                result = engine.rate(prods, sub_area, _rating.RATING_DICT)
+                result.check(prods)
+                rating = result.total()
+                span.count(len(prods))
+                span.count(result.num_lookups, counter='num_lookups')
+
+                # Take any leave of absence into account.
+                if pers.full_name in _rating.LOA_SCALING_DICT:
+                    scale = _rating.LOA_SCALING_DICT[pers.full_name]
+                    print('Scaling rating for %s by %.3f' %\
+                          (pers.full_name, scale))
+                    rating *= scale
+                # Update the Docent object.
+                pers.rating = rating
+
+    # Calculate the basic product statistics for all the docents at once.
+    print('Calculating product statistics...')
+    with metrics.phase('product statistics') as span:
+        stats_dict = product_statistics(valid_prods, collab_threshold)
+        for sub_area in sub_areas:
+            for pers in pers_dict[sub_area]:
+                for (attr, value_dict) in stats_dict.items():
+                    if pers.full_name in value_dict:
+                        setattr(pers, attr, value_dict[pers.full_name])
+        span.count(len(valid_prods))
 
     # Now that we have the basic product statistics we can filter out
     # the docents with less than 2 products.
-    for sub_area in sub_areas:
-        print('Filtering docent databse for sub-area %s...' % sub_area)
-        pers_dict[sub_area] = filter_db_pers(pers_dict[sub_area])
+    with metrics.phase('filtering') as span:
+        for sub_area in sub_areas:
+            print('Filtering docent databse for sub-area %s...' % sub_area)
+            pers_dict[sub_area] = filter_db_pers(pers_dict[sub_area])
+            span.count(len(pers_dict[sub_area]))
 
     # Sort the docents and dump the excel file.
     print('Sorting docents within sub-areas...')
@@ -120,21 +210,40 @@ def dump_rating(file_path, collab_threshold=30):
     col_names = ['Ranking', 'Nome', 'Punti rating', 'Numero prodotti',
                  'Numero prodotti con > %d autori' % collab_threshold,
                  '# autori min', '# autori medio', '# autori max']
-    for sub_area in sub_areas:
-        rows = []
-        pers_dict[sub_area].sort(reverse=True)
-        print('Ratings points for sub-area %s:' % sub_area)
-        for i, pers in enumerate(pers_dict[sub_area]):
-            pers.ranking = i
-            print('%2i -- %s: %f rating points.' %\
-                  (i, pers.full_name, pers.rating))
-            rows.append([i, pers.full_name, pers.rating, pers.num_products,
-                         pers.num_collab_products, pers.min_num_authors,
-                         pers.median_num_authors, pers.max_num_authors])
-        table.add_worksheet('Sottoarea %s' % sub_area, col_names, rows)
-    table.write(file_path)
+    with metrics.phase('sorting') as span:
+        for sub_area in sub_areas:
+            rows = []
+            pers_dict[sub_area].sort(reverse=True)
+            print('Ratings points for sub-area %s:' % sub_area)
+            for i, pers in enumerate(pers_dict[sub_area]):
+                pers.ranking = i
+                print('%2i -- %s: %f rating points.' %\
+                      (i, pers.full_name, pers.rating))
+                rows.append([i, pers.full_name, pers.rating,
+                             pers.num_products, pers.num_collab_products,
+                             pers.min_num_authors, pers.median_num_authors,
+                             pers.max_num_authors])
+            table.add_worksheet('Sottoarea %s' % sub_area, col_names, rows)
+            span.count(len(rows))
+    with metrics.phase('excel write') as span:
+        table.write(file_path)
+        span.count(sum(len(pers_dict[sub_area]) for sub_area in sub_areas))
 
     # Do some plotting.
+    with metrics.phase('plotting') as span:
+        plot_rating(pers_dict, sub_areas, collab_threshold, headless)
+        span.count(len(sub_areas))
+
+    metrics.summary()
+    if metrics_file_path is not None:
+        metrics.write(metrics_file_path, output_file_path=file_path)
+
+
+def plot_rating(pers_dict, sub_areas, collab_threshold=30, headless=None):
+    """Plot the rating points vs. ranking for each sub-area, along with the
+    quantiles.
+    """
+    plt = plotting.pyplot(headless)
     for sub_area in sub_areas:
         plt.figure('Sottoarea %s' % sub_area, figsize=(12, 8))
         num_persons = len(pers_dict[sub_area])
@@ -180,8 +289,15 @@ def dump_rating(file_path, collab_threshold=30):
                      (p, n, n * p, 100. * frac), ha='center')
         print('Total rating points for area %s: %d' % (sub_area, psum))
         plt.savefig('rating02_2020_%s.png' % sub_area)
-    plt.show()
+    plotting.show()
 
 
 if __name__ == '__main__':
-    dump_rating('rating02_2020.xls')
+    import argparse
+    parser = argparse.ArgumentParser(description='Dump the full rating '
+                                     'information.')
+    parser.add_argument('--metrics', nargs='?', const=METRICS_FILE_PATH,
+                        default=None, help='append the run metrics to file '
+                        '(default %s)' % METRICS_FILE_PATH)
+    args = parser.parse_args()
+    dump_rating('rating02_2020.xls', metrics_file_path=args.metrics)
@@ -17,7 +17,7 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
 
-from rating import *
+from qa import SuspectAuthorListCheck, run_checks
 
 
 
@@ -25,40 +25,8 @@ def dump_suspect_author_lists(file_path=None, max_author_length=3799,
                               collab_author_threshold=20):
     """Dump a list of papers with suspect author lists.
     """
-    db = load_db_prod()
-    print('Dumping suspect author lists...')
-
-    # Bookkeeping.
-    rows = []
-    suspect_handles = []
-
-    # Product loop.
-    for prod in db:
-        handle = prod.handle
-        authors = prod.author_string.lower()
-        num_authors = prod.num_authors
-        num_splits = len(authors.split(';'))
-        error_summary = []
-        if len(authors) < max_author_length and num_authors != num_splits:
-            error_summary.append('split mismatch (%d)' % num_splits)
-        if 'et al' in authors:
-            error_summary.append('contains "et al"')
-        if 'author' in authors:
-            error_summary.append('contains "author"')
-        if 'collab' in authors and num_authors < collab_author_threshold:
-            error_summary.append('collab')
-        if len(error_summary) > 0:
-            if handle not in suspect_handles:
-                print('%s, %s' % (prod, error_summary))
-                rows.append([handle, error_summary, num_authors, authors])
-                suspect_handles.append(handle)
-    print('Done, %s suspect entries found.' % len(rows))
-
-    # Write the output file.
-    table = ExcelTableDump()
-    col_names = ['Handle', 'Errors', 'Num. Authors', 'Author list']
-    table.add_worksheet('Lista autori sospetta', col_names, rows)
-    table.write(file_path)
+    check = SuspectAuthorListCheck(max_author_length, collab_author_threshold)
+    run_checks(file_path, [check])
 
 
 
@@ -17,36 +17,14 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
 
-from rating import *
+from qa import SuspectProceedingsCheck, run_checks
 
 
 
 def dump_suspect_proceedings(file_path):
     """Dump a list of papers wich seem proceedings in disguise.
     """
-    db = load_db_prod()
-    db.select(pub_type='1.1 Articolo in rivista')
-
-    print('Dumping suspect proceedings...')
-    # Bookkeeping.
-    rows = []
-
-    # Product loop.
-    for prod in db:
-        handle = prod.handle
-        author = prod.author()
-        title = prod.title
-        journal = prod.journal
-        if journal is not None and 'proc' in journal.lower():
-            print(handle, author, journal)
-
-    print('Done, %s suspect entries found.' % len(rows))
-
-    # Write the output file.
-    #table = ExcelTableDump()
-    #col_names = ['Handle', 'Errors', 'Num. Authors', 'Author list']
-    #table.add_worksheet('Lista autori sospetta', col_names, rows)
-    #table.write(file_path)
+    run_checks(file_path, [SuspectProceedingsCheck()])
 
 
 
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Vectorized grouped aggregations.
+
+The GroupBy class takes the group key of a series of items (e.g., the full
+name of the author for each product), sorts the items by group once, and
+then computes any statistics of any array of values aligned with the items
+for all the groups at once, through the ufunc reduceat() methods over the
+group boundaries, rather than building a separate array for each group.
+Medians are calculated by sorting the values within the groups in a single
+lexsort() and picking the middle elements.
+
+All the statistics are returned as arrays aligned with the labels member
+(i.e., the sorted unique keys), and can be turned into a dictionary
+label -> native Python value with the to_dict() method.
+
+>>> groups = GroupBy([prod.author_full_name for prod in prods])
+>>> num_authors = numpy.array([prod.num_authors for prod in prods])
+>>> median_dict = groups.to_dict(groups.median(num_authors))
+"""
+
+
+import numpy
+
+
+class GroupBy(object):
+
+    """Small class describing the partition of a series of items into groups.
+    """
+
+    def __init__(self, keys):
+        """Constructor.
+
+        keys is the sequence of the group keys, one for each item.
+        """
+        keys = numpy.asarray(keys)
+        self.labels, self.inverse = numpy.unique(keys, return_inverse=True)
+        # This is the (stable) permutation sorting the items by group, so that
+        # the relative order of the items within each group is preserved.
+        self.order = numpy.argsort(self.inverse, kind='stable')
+        self.counts = numpy.bincount(self.inverse, minlength=len(self.labels))
+        self.starts = numpy.zeros(len(self.labels), dtype=int)
+        numpy.cumsum(self.counts[:-1], out=self.starts[1:])
+
+    def __len__(self):
+        """Return the number of groups.
+        """
+        return len(self.labels)
+
+    def sorted_values(self, values):
+        """Return an array of values (aligned with the items) sorted by group.
+        """
+        return numpy.asarray(values)[self.order]
+
+    def _reduce(self, ufunc, values):
+        """Apply the reduceat() method of a ufunc over the groups.
+        """
+        if len(self.labels) == 0:
+            return numpy.array([])
+        return ufunc.reduceat(self.sorted_values(values), self.starts)
+
+    def count(self, mask=None):
+        """Return the number of items in each group (or, if mask is not None,
+        the number of items for which the mask is True).
+        """
+        if mask is None:
+            return self.counts.copy()
+        return numpy.bincount(self.inverse, weights=numpy.asarray(mask),
+                              minlength=len(self.labels)).astype(int)
+
+    def sum(self, values):
+        """Return the sum of the values for each group.
+        """
+        return self._reduce(numpy.add, values)
+
+    def min(self, values):
+        """Return the minimum of the values for each group.
+        """
+        return self._reduce(numpy.minimum, values)
+
+    def max(self, values):
+        """Return the maximum of the values for each group.
+        """
+        return self._reduce(numpy.maximum, values)
+
+    def mean(self, values):
+        """Return the mean of the values for each group, ignoring NaNs.
+
+        The mean is NaN for the groups with no valid values.
+        """
+        values = numpy.asarray(values, dtype=float)
+        valid = numpy.isfinite(values)
+        total = numpy.bincount(self.inverse, weights=numpy.where(valid,
+                               values, 0.), minlength=len(self.labels))
+        num_valid = self.count(valid)
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            return total / num_valid
+
+    def median(self, values):
+        """Return the median of the values for each group.
+
+        This is equivalent to calling numpy.median() on the values of each
+        group, i.e., the median of an even number of values is the average of
+        the two middle ones.
+        """
+        values = numpy.asarray(values)
+        if len(self.labels) == 0:
+            return numpy.array([])
+        sorted_values = values[numpy.lexsort((values, self.inverse))]
+        low = sorted_values[self.starts + (self.counts - 1) // 2]
+        high = sorted_values[self.starts + self.counts // 2]
+        return (low + high) / 2.
+
+    def count_by(self, categories):
+        """Return a dictionary category -> array of the number of items in
+        each group belonging to the category.
+        """
+        categories, codes = numpy.unique(numpy.asarray(categories),
+                                         return_inverse=True)
+        counts = numpy.bincount(self.inverse * len(categories) + codes,
+                                minlength=len(self.labels) * len(categories))
+        counts = counts.reshape(len(self.labels), len(categories))
+        return dict((category, counts[:, i]) for (i, category) in\
+                    enumerate(categories.tolist()))
+
+    def to_dict(self, values):
+        """Turn an array of statistics aligned with the labels into a
+        dictionary label -> value, with all the numpy scalars cast to native
+        Python types.
+        """
+        return dict(zip(self.labels.tolist(), numpy.asarray(values).tolist()))
@@ -0,0 +1,350 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Normalized journal-name index.
+
+The journal names in the product database come in many spelling variants
+(e.g., 'PHYSICAL REVIEW D', 'PHYSICAL REVIEW. D' or 'PHYSICAL REVIEW D,
+PARTICLES, FIELDS, GRAVITATION, AND COSMOLOGY'), and the JournalIndex class
+allows to look up a value (typically, the impact factor) for any of them,
+starting from a reference dictionary keyed by journal name.
+
+All the names are normalized first (see normalize()): accents, case,
+punctuation and leading articles are dropped, and the full normalized name is
+the key for the exact lookup (so that, e.g., 'PHYSICAL REVIEW. D' and 'PHYSICAL
+REVIEW D' are the same journal, but 'NATURE: PHYSICS' and 'NATURE' are not).
+Names which are not found in the index are matched against the reference names
+through a trigram index: the candidates are the reference names sharing at
+least one trigram with the query, and the best one is accepted if the Dice
+coefficient of the two trigram sets is above a given threshold. Since a high
+threshold implies that the two names share most of their trigrams, it is enough
+to look up the rarest few trigrams of the query to collect all the viable
+candidates (this is the so-called prefix filtering), and counting the hits for
+each candidate in the postings of these trigrams allows to skim them further,
+so that only a handful is actually compared with the query. Since single
+letters and numbers (e.g., the section of a journal) only amount to a couple of
+trigrams, they are required to match exactly, so that 'JOURNAL OF PHYSICS A' is
+never confused with 'JOURNAL OF PHYSICS B'. Likewise, names whose words are a
+strict subset of each other are never considered a near miss, since an extra
+word typically makes for a different journal, e.g., 'MONTHLY NOTICES OF THE
+ROYAL ASTRONOMICAL SOCIETY' and 'MONTHLY NOTICES OF THE ROYAL ASTRONOMICAL
+SOCIETY. LETTERS'.
+
+As a last resort, the query is shortened (see shorten()) by dropping the
+parenthesized qualifiers such as '(PRINT)' and the subtitles (i.e., anything
+after the first comma, colon, semicolon, period or dash), and the shortened
+name is accepted only if it is the full name of a reference journal, and the
+only reference journal starting with it. Along the same lines, names only
+differing by the qualifiers (e.g., 'JOURNAL OF INSTRUMENTATION' and 'JOURNAL
+OF INSTRUMENTATION (PRINT)') are matched if they point to a single reference
+journal, and no other reference journal starts with the unqualified name.
+This way 'PHYSICAL REVIEW D, PARTICLES, FIELDS, GRAVITATION, AND COSMOLOGY'
+resolves to 'PHYSICAL REVIEW D', while 'NATURE: PHYSICS' does not resolve to
+'NATURE' (as long as there are other reference journals starting with
+'NATURE') and 'JOURNAL OF PHYSICS: CONFERENCE SERIES' does not resolve to
+'JOURNAL OF PHYSICS: CONDENSED MATTER'. These matches are reported with the
+trigram similarity of the full names, i.e., below the threshold.
+
+The results of the lookups are memoized by (raw) name, so that resolving a
+database with thousands of products only costs one lookup per distinct
+journal string.
+"""
+
+
+import collections
+import itertools
+import re
+import unicodedata
+
+
+"""Default minimum trigram similarity for a near-miss match.
+"""
+MIN_SIMILARITY = 0.9
+
+"""Number of extra trigrams looked up beyond the minimum required by the
+prefix filtering (the candidates are then required to share at least as
+many trigrams with the query, which makes for fewer of them).
+"""
+PREFIX_SLACK = 3
+
+"""Regular expression for the parenthesized qualifiers, e.g., '(PRINT)'.
+"""
+_QUALIFIER_PATTERN = re.compile(r'\([^)]*\)')
+
+"""Regular expression for the subtitle separators.
+"""
+_SUBTITLE_PATTERN = re.compile(r'[,:;.]| - ')
+
+"""Regular expression for the tokens of a name.
+"""
+_TOKEN_PATTERN = re.compile(r'[A-Z0-9]+')
+
+"""Leading articles to be dropped.
+"""
+ARTICLES = frozenset(['THE', 'LE', 'LA', 'IL', 'LES', 'DER', 'DIE', 'DAS'])
+
+
+def _fold(name):
+    """Strip the accents from a journal name and turn it to uppercase.
+    """
+    text = unicodedata.normalize('NFKD', name)
+    text = ''.join(c for c in text if not unicodedata.combining(c)).upper()
+    return text.replace('&', ' AND ')
+
+
+def _join(text):
+    """Join the tokens of a name, dropping any leading article.
+    """
+    tokens = _TOKEN_PATTERN.findall(text)
+    if len(tokens) > 1 and tokens[0] in ARTICLES:
+        tokens = tokens[1:]
+    return ' '.join(tokens)
+
+
+def normalize(name):
+    """Return the normalized form of a journal name.
+    """
+    return _join(_fold(name))
+
+
+def unqualify(name):
+    """Return the normalized form of a journal name, stripped of the
+    parenthesized qualifiers.
+    """
+    return _join(_QUALIFIER_PATTERN.sub(' ', _fold(name)))
+
+
+def shorten(name):
+    """Return the normalized form of a journal name, stripped of the
+    parenthesized qualifiers and of the subtitles.
+    """
+    text = _QUALIFIER_PATTERN.sub(' ', _fold(name))
+    return _join(_SUBTITLE_PATTERN.split(text, 1)[0])
+
+
+def trigrams(key):
+    """Return the set of the trigrams of a normalized name.
+    """
+    text = ' %s ' % key
+    return set(text[i:i + 3] for i in range(len(text) - 2))
+
+
+def signature(key):
+    """Return the tokens of a normalized name that are required to match
+    exactly in a near-miss lookup, i.e., single letters and numbers.
+    """
+    return tuple(token for token in key.split() if\
+                 len(token) == 1 or token.isdigit())
+
+
+
+class JournalIndex(object):
+
+    """Normalized journal-name index.
+    """
+
+    def __init__(self, value_dict=None, min_similarity=MIN_SIMILARITY):
+        """Constructor.
+
+        value_dict is an optional dictionary journal name -> value (e.g.,
+        one of the IMPACT_FACTOR_DICT in the _rating modules) to fill the
+        index with.
+        """
+        self.min_similarity = min_similarity
+        self._keys = []
+        self._values = []
+        self._names = []
+        self._ambiguous = set()
+        self._key_dict = {}
+        self._trigram_dict = {}
+        self._trigrams = []
+        self._signatures = []
+        self._tokens = []
+        self._prefix_count = {}
+        self._unqualified_dict = {}
+        self._cache = {}
+        if value_dict is not None:
+            for (name, value) in value_dict.items():
+                self.add(name, value)
+
+    def add(self, name, value):
+        """Add a journal to the index.
+
+        Different names with the same normalized form are fine as long as they
+        are associated with the same value, while names with the same
+        normalized form and different values are never resolved.
+        """
+        self._cache.clear()
+        key = normalize(name)
+        try:
+            pos = self._key_dict[key]
+            if self._values[pos] != value:
+                self._ambiguous.add(pos)
+            return
+        except KeyError:
+            pass
+        pos = len(self._keys)
+        self._key_dict[key] = pos
+        self._keys.append(key)
+        self._values.append(value)
+        self._names.append(name)
+        grams = trigrams(key)
+        self._trigrams.append(grams)
+        self._signatures.append(signature(key))
+        self._tokens.append(frozenset(key.split()))
+        unqualified_key = unqualify(name)
+        try:
+            self._unqualified_dict[unqualified_key].append(pos)
+        except KeyError:
+            self._unqualified_dict[unqualified_key] = [pos]
+        tokens = key.split()
+        for i in range(1, len(tokens) + 1):
+            prefix = ' '.join(tokens[:i])
+            self._prefix_count[prefix] = self._prefix_count.get(prefix, 0) + 1
+        for gram in grams:
+            try:
+                self._trigram_dict[gram].append(pos)
+            except KeyError:
+                self._trigram_dict[gram] = [pos]
+
+    def _near_miss(self, key):
+        """Return the (position, similarity) of the best near-miss match for a
+        normalized name, or None.
+        """
+        grams = trigrams(key)
+        size = len(grams)
+        # A Dice coefficient of at least t implies that the other trigram set
+        # has between t * size / (2 - t) and (2 - t) * size / t elements, and
+        # that the two share at least t * (size + other size) / 2 of them.
+        t = self.min_similarity
+        min_size = t * size / (2. - t)
+        max_size = (2. - t) * size / t
+        min_shared = max(1, int(t * (size + min_size) / 2.))
+        # Any such candidate necessarily shares at least k of the
+        # size - min_shared + k rarest trigrams of the query.
+        postings = sorted((self._trigram_dict.get(gram, ()) for gram in grams),
+                          key=len)
+        k = min(PREFIX_SLACK, min_shared)
+        counts = collections.Counter(itertools.chain.from_iterable(
+            postings[:size - min_shared + k]))
+        candidates = [pos for (pos, count) in counts.items() if count >= k]
+        sig = signature(key)
+        tokens = frozenset(key.split())
+        best = None
+        best_similarity = t
+        tie = False
+        for pos in candidates:
+            other = self._trigrams[pos]
+            if len(other) < min_size or len(other) > max_size or\
+               self._signatures[pos] != sig:
+                continue
+            if tokens < self._tokens[pos] or self._tokens[pos] < tokens:
+                continue
+            similarity = 2. * len(grams & other) / (size + len(other))
+            if similarity > best_similarity or\
+               (best is None and similarity == best_similarity):
+                best = pos
+                best_similarity = similarity
+                tie = False
+            elif similarity == best_similarity and\
+                 self._values[pos] != self._values[best]:
+                tie = True
+        # Give up on ties between different values.
+        if best is None or tie:
+            return None
+        return best, best_similarity
+
+    def _shortened(self, name, key):
+        """Return the (position, similarity) of the match for the shortened
+        forms of a journal name, or None.
+
+        The match is only accepted if the unqualified name points to a single
+        reference journal, or if the shortened name is the full name of a
+        reference journal, and in both cases no other reference journal
+        starts with it.
+        """
+        pos = None
+        unqualified_key = unqualify(name)
+        positions = self._unqualified_dict.get(unqualified_key, [])
+        if len(positions) == 1 and\
+           self._prefix_count.get(unqualified_key, 0) <= 1:
+            pos = positions[0]
+        short_key = shorten(name)
+        if pos is None and self._prefix_count.get(short_key) == 1:
+            pos = self._key_dict.get(short_key)
+        if pos is None:
+            return None
+        grams = trigrams(key)
+        other = self._trigrams[pos]
+        return pos, 2. * len(grams & other) / (len(grams) + len(other))
+
+    def match(self, name):
+        """Return the (reference name, similarity) tuple for the best match of
+        a journal name in the index, or None if there is no (unambiguous)
+        match.
+
+        The similarity is 1 for exact matches (after normalization), and
+        below the threshold for the matches through the shortened name.
+        """
+        if name is None:
+            return None
+        try:
+            return self._cache[name]
+        except KeyError:
+            pass
+        key = normalize(name)
+        pos = self._key_dict.get(key)
+        if pos is not None:
+            result = (pos, 1.)
+        else:
+            result = self._near_miss(key)
+            if result is None:
+                result = self._shortened(name, key)
+        if result is not None:
+            if result[0] in self._ambiguous:
+                result = None
+            else:
+                result = (self._names[result[0]], result[1])
+        self._cache[name] = result
+        return result
+
+    def get(self, name, default=None):
+        """Return the value for a journal name (or default, if there is no
+        match).
+        """
+        result = self.match(name)
+        if result is None:
+            return default
+        return self._values[self._key_dict[normalize(result[0])]]
+
+    def __contains__(self, name):
+        """Return True if there is a match for a journal name.
+        """
+        return self.match(name) is not None
+
+    def __len__(self):
+        """Return the number of distinct (normalized) journals in the index.
+        """
+        return len(self._keys)
+
+    def __str__(self):
+        """String formatting.
+        """
+        return 'Journal index with %d entries (min. similarity %.2f)' %\
+            (len(self), self.min_similarity)
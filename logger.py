@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Leveled logger for the per-item messages.
+
+The progress messages of the scripts are plain prints, but the messages
+emitted once per item in the inner loops (e.g., once per product) go
+through the logger defined here, which is silent by default, so that the
+loops are not bound by the terminal I/O. The messages can be switched on by
+setting the RATING_LOG_LEVEL environment variable (e.g., to DEBUG) or by
+calling set_level().
+
+Mind that the messages should be passed to the logger in the form
+logger.debug('format', *args), so that the formatting only happens when
+the message is actually emitted.
+"""
+
+
+import logging
+import os
+import sys
+
+
+"""Name of the environment variable setting the logging level.
+"""
+LOG_LEVEL_ENV_VAR = 'RATING_LOG_LEVEL'
+
+"""Default logging level.
+"""
+DEFAULT_LOG_LEVEL = 'WARNING'
+
+
+logger = logging.getLogger('rating')
+logger.propagate = False
+_handler = logging.StreamHandler(sys.stdout)
+_handler.setFormatter(logging.Formatter('%(message)s'))
+logger.addHandler(_handler)
+
+
+def set_level(level):
+    """Set the logging level (either a name, e.g., 'DEBUG', or a number).
+    """
+    if isinstance(level, str):
+        level = level.upper()
+    logger.setLevel(level)
+
+
+set_level(os.environ.get(LOG_LEVEL_ENV_VAR, DEFAULT_LOG_LEVEL))
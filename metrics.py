@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Lightweight instrumentation for the scripts.
+
+A RunMetrics object collects the timing of the different phases of a run,
+each one as a span opened through a context manager, e.g.
+
+>>> metrics = RunMetrics('dump_rating')
+>>> with metrics.phase('load') as span:
+...     db_prod = load_db_prod()
+...     span.count(len(db_prod))
+
+along with the number of items processed in each phase (and any additional
+named counter). At the end of the run the metrics can be summarized on the
+terminal and appended, as a single JSON record, to a metrics file (one
+record per line), so that different runs can be compared.
+"""
+
+
+import contextlib
+import json
+import platform
+import sys
+import time
+
+
+class Span(object):
+
+    """Small class describing a timed phase of a run.
+    """
+
+    def __init__(self, name):
+        """Constructor.
+        """
+        self.name = name
+        self.elapsed = None
+        self.num_items = 0
+        self.counters = {}
+
+    def count(self, num_items=1, counter=None):
+        """Add to the number of items processed in the phase or, if counter
+        is not None, to the corresponding named counter.
+        """
+        if counter is None:
+            self.num_items += num_items
+        else:
+            self.counters[counter] = self.counters.get(counter, 0) + num_items
+
+    def record(self):
+        """Return the span content as a dictionary.
+        """
+        record = {
+            'name': self.name,
+            'elapsed': self.elapsed,
+            'num_items': self.num_items
+        }
+        record.update(self.counters)
+        return record
+
+
+
+class RunMetrics(object):
+
+    """Collection of the metrics for a single run.
+    """
+
+    def __init__(self, name):
+        """Constructor.
+        """
+        self.name = name
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.spans = []
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Context manager timing a phase of the run.
+        """
+        span = Span(name)
+        start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            span.elapsed = time.perf_counter() - start
+            self.spans.append(span)
+
+    def total(self):
+        """Return the total elapsed time since the beginning of the run.
+        """
+        return time.perf_counter() - self._start
+
+    def record(self, **kwargs):
+        """Return the metrics record for the run, as a dictionary.
+
+        Any additional keyword argument is added to the record.
+        """
+        record = {
+            'run': self.name,
+            'start': time.strftime('%Y-%m-%dT%H:%M:%S',
+                                   time.localtime(self.start_time)),
+            'total': self.total(),
+            'python': platform.python_version(),
+            'argv': sys.argv,
+            'phases': [span.record() for span in self.spans]
+        }
+        record.update(kwargs)
+        return record
+
+    def summary(self):
+        """Print a summary of the run.
+        """
+        total = self.total()
+        print('Timing summary for %s (%.3f s total):' % (self.name, total))
+        for span in self.spans:
+            frac = span.elapsed / total if total > 0 else 0.
+            print('  %-20s %9.3f s (%5.1f%%) %9d item(s)' %\
+                  (span.name, span.elapsed, 100. * frac, span.num_items))
+
+    def write(self, file_path, **kwargs):
+        """Append the metrics record for the run to a file.
+        """
+        print('Writing run metrics to %s...' % file_path)
+        with open(file_path, 'a') as output_file:
+            output_file.write('%s\n' % json.dumps(self.record(**kwargs)))
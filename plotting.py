@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Small plotting facilities.
+
+matplotlib is by far the most expensive import in the scripts, and is only
+needed by the ones actually producing plots, so it is imported through the
+pyplot() function below, right where the plots are made.
+
+In headless mode the non-interactive Agg backend is used, and the plots are
+saved to file but never shown on the screen. Headless mode can be requested
+explicitly, or via the RATING_HEADLESS environment variable, and is the
+default on linux machines with no display.
+"""
+
+
+import os
+import sys
+
+
+"""Name of the environment variable to switch on the headless mode.
+"""
+HEADLESS_ENV_VAR = 'RATING_HEADLESS'
+
+
+def headless_default():
+    """Return the default for the headless mode.
+    """
+    if os.environ.get(HEADLESS_ENV_VAR, '') not in ('', '0'):
+        return True
+    if sys.platform.startswith('linux') and not os.environ.get('DISPLAY') and\
+       not os.environ.get('WAYLAND_DISPLAY'):
+        return True
+    return False
+
+
+def pyplot(headless=None):
+    """Import and return matplotlib.pyplot.
+
+    If headless is None, the default is used.
+    """
+    if headless is None:
+        headless = headless_default()
+    import matplotlib
+    if headless:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def show():
+    """Show the plots on the screen, unless we are running in headless mode.
+    """
+    import matplotlib
+    if matplotlib.get_backend().lower() == 'agg':
+        return
+    import matplotlib.pyplot as plt
+    plt.show()
@@ -0,0 +1,449 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Single-pass data-quality pipeline for the product database.
+
+Each data-quality check is a sub-class of Check, which gets to see the
+products one at a time through its process() method, accumulates the rows
+to be reported, and provides the name and the column names of the
+corresponding worksheet in the output table. A QAPipeline object runs any
+number of checks over the product database in a single pass, and writes the
+results in a single workbook, with one worksheet per check.
+
+Checks only concerned with specific publication types can list them in the
+PUB_TYPES class member, and the pipeline will only feed them the products
+of those types (the dispatching is done once per publication type, rather
+than once per product), so that adding a check never adds a scan over the
+database.
+
+Checks should also list the product fields they need in the FIELDS class
+member: when all the checks do, the pipeline only materializes those fields
+from the columnar database, and run_checks() loads the product database from
+the memory-mapped columnar store, where only the columns that are actually
+used are read from disk (e.g., four of them for the errata alone).
+"""
+
+
+from rating import ExcelTableDump, Product, load_db_prod
+from scanner import PatternScanner, split_count
+from logger import logger
+
+
+"""Publication type for journal articles.
+"""
+JOURNAL_PUB_TYPE = '1.1 Articolo in rivista'
+
+"""Default path to the output file for the full set of checks.
+"""
+QA_FILE_PATH = 'qa.xlsx'
+
+"""Product fields needed for the string formatting of a product (e.g., in
+the debug messages).
+"""
+PRODUCT_STR_FIELDS = ('pub_type', 'row_index', 'author_surname',
+                      'author_name', 'title', 'year')
+
+
+class Check(object):
+
+    """Base class for a data-quality check.
+
+    Sub-classes should set the NAME and COL_NAMES class members (i.e., the
+    name and the column names of the output worksheet) and reimplement the
+    process() method, calling add_row() for each suspect product. Checks
+    that can only tell which products are suspect after having seen all of
+    them (e.g., when looking for duplicates) can reimplement the finalize()
+    method instead, which is called by the pipeline at the end of the pass.
+
+    FIELDS is the list of the product fields accessed by the check (None
+    meaning that the check might need any of them).
+    """
+
+    NAME = None
+    COL_NAMES = []
+    PUB_TYPES = None
+    FIELDS = None
+
+    def __init__(self):
+        """Constructor.
+        """
+        self.rows = []
+
+    def process(self, prod):
+        """Process a single product---do nothing in the base class.
+        """
+        pass
+
+    def finalize(self):
+        """Hook called at the end of the pass---do nothing in the base class.
+        """
+        pass
+
+    def add_row(self, row):
+        """Add a row to the output worksheet.
+        """
+        self.rows.append(row)
+
+    def accepts(self, pub_type):
+        """Return True if the check should see the products of a given
+        publication type.
+        """
+        return self.PUB_TYPES is None or pub_type in self.PUB_TYPES
+
+    def __str__(self):
+        """String formatting.
+        """
+        return '%s: %d suspect entries found' % (self.NAME, len(self.rows))
+
+
+
+class ErrataCheck(Check):
+
+    """Products which are really errata or corrigenda.
+    """
+
+    NAME = 'Errata'
+    COL_NAMES = ['Autore', 'Riga', 'Handle', 'Titolo']
+    FIELDS = ('row_index', 'author_surname', 'handle', 'title')
+    PREFIXES = ('errat', 'corrig')
+
+    def process(self, prod):
+        """Overloaded method.
+        """
+        title = prod.title
+        if title is not None and title.lower().startswith(self.PREFIXES):
+            logger.debug('Erratum @ row %d for %s', prod.row_index,
+                         prod.author_surname)
+            self.add_row([prod.author_surname, prod.row_index, prod.handle,
+                          title])
+
+
+
+class JournalFieldCheck(Check):
+
+    """Base class for the checks of the journal articles, reporting the basic
+    information of the suspect products.
+    """
+
+    COL_NAMES = ['Handle', 'Type', 'Author', 'Title', 'Journal', 'Year',
+                 'Impact factor']
+    PUB_TYPES = frozenset([JOURNAL_PUB_TYPE])
+    FIELDS = PRODUCT_STR_FIELDS + ('handle', 'journal', Product.IF_FIELD)
+
+    def suspect(self, prod):
+        """Return True if the product is suspect---to be reimplemented in
+        sub-classes.
+        """
+        return False
+
+    def process(self, prod):
+        """Overloaded method.
+        """
+        if self.suspect(prod):
+            logger.debug('%s', prod)
+            self.add_row([prod.handle, prod.pub_type, prod.author(),
+                          prod.title, prod.journal, prod.year,
+                          prod.impact_factor()])
+
+
+
+class MissingDoiCheck(JournalFieldCheck):
+
+    """Journal articles missing the DOI.
+    """
+
+    NAME = 'DOI mancanti'
+    FIELDS = JournalFieldCheck.FIELDS + ('doi',)
+
+    def suspect(self, prod):
+        """Overloaded method.
+        """
+        return prod.doi is None
+
+
+
+class MissingIfCheck(JournalFieldCheck):
+
+    """Journal articles missing the impact factor.
+    """
+
+    NAME = 'IF mancanti'
+
+    def suspect(self, prod):
+        """Overloaded method.
+        """
+        return prod.impact_factor() is None
+
+
+
+class SuspectProceedingsCheck(Check):
+
+    """Journal articles which seem proceedings in disguise.
+    """
+
+    NAME = 'Proceedings sospetti'
+    COL_NAMES = ['Handle', 'Author', 'Title', 'Journal']
+    PUB_TYPES = frozenset([JOURNAL_PUB_TYPE])
+    FIELDS = ('handle', 'author_surname', 'author_name', 'title', 'journal')
+
+    def process(self, prod):
+        """Overloaded method.
+        """
+        journal = prod.journal
+        if journal is not None and 'proc' in journal.lower():
+            logger.debug('%s %s %s', prod.handle, prod.author(), journal)
+            self.add_row([prod.handle, prod.author(), prod.title, journal])
+
+
+
+"""Scanner for the suspect patterns in the author lists. Other checks can
+register additional patterns, which are reported in the error summary as
+'contains "<pattern name>"'.
+"""
+AUTHOR_LIST_SCANNER = PatternScanner([('et al', 'et al'),
+                                      ('author', 'author'),
+                                      ('collab', 'collab')])
+
+
+def author_list_errors(author_string, num_authors, max_author_length=3799,
+                       collab_author_threshold=20):
+    """Return the list of the problems found in an author string.
+    """
+    errors = []
+    num_splits = split_count(author_string)
+    if len(author_string) < max_author_length and num_authors != num_splits:
+        errors.append('split mismatch (%d)' % num_splits)
+    for name in AUTHOR_LIST_SCANNER.scan(author_string):
+        # Collaboration papers are only suspect with few authors.
+        if name == 'collab':
+            if num_authors < collab_author_threshold:
+                errors.append('collab')
+        else:
+            errors.append('contains "%s"' % name)
+    return errors
+
+
+
+class SuspectAuthorListCheck(Check):
+
+    """Products with suspect author lists.
+    """
+
+    NAME = 'Lista autori sospetta'
+    COL_NAMES = ['Handle', 'Errors', 'Num. Authors', 'Author list']
+    FIELDS = PRODUCT_STR_FIELDS + ('handle', 'num_authors', 'author_string')
+
+    def __init__(self, max_author_length=3799, collab_author_threshold=20):
+        """Constructor.
+        """
+        Check.__init__(self)
+        self.max_author_length = max_author_length
+        self.collab_author_threshold = collab_author_threshold
+        self.suspect_handles = set()
+
+    def process(self, prod):
+        """Overloaded method.
+        """
+        handle = prod.handle
+        if handle in self.suspect_handles:
+            return
+        num_authors = prod.num_authors
+        errors = author_list_errors(prod.author_string, num_authors,
+                                    self.max_author_length,
+                                    self.collab_author_threshold)
+        if len(errors) > 0:
+            logger.debug('%s, %s', prod, errors)
+            self.add_row([handle, ', '.join(errors), num_authors,
+                          prod.author_string.lower()])
+            self.suspect_handles.add(handle)
+
+
+
+class DoiDuplicateCheck(Check):
+
+    """Products with the same DOI and different unique handles.
+    """
+
+    NAME = 'DOI duplicati'
+    COL_NAMES = ['DOI', 'Handle 1', 'Handle 2', 'Handle 3', 'Handle 4']
+    FIELDS = PRODUCT_STR_FIELDS + ('doi', 'handle')
+
+    def __init__(self):
+        """Constructor.
+        """
+        Check.__init__(self)
+        self.handle_dict = {}
+        self.doi_dict = {}
+        self.error_doi_list = []
+
+    def process(self, prod):
+        """Overloaded method.
+        """
+        doi = prod.doi
+        if doi is None:
+            return
+        handle = prod.handle
+        label = '%s @ row %d.' % (prod.author(), prod.row_index)
+        try:
+            self.handle_dict[handle].append(label)
+        except KeyError:
+            self.handle_dict[handle] = [label]
+        try:
+            handles = self.doi_dict[doi]
+        except KeyError:
+            self.doi_dict[doi] = [handle]
+            return
+        if handle not in handles:
+            handles.append(handle)
+            self.error_doi_list.append(doi)
+            logger.debug('Duplicated DOI (%s) for %s', doi, prod)
+
+    def finalize(self):
+        """Overloaded method.
+
+        Note the labels for each handle are only complete at the end of the
+        pass, which is why the rows are built here.
+        """
+        for doi in self.error_doi_list:
+            row = [doi]
+            for handle in self.doi_dict[doi]:
+                row.append('%s %s' % (handle, self.handle_dict[handle]))
+            self.add_row(row)
+
+
+
+"""Default list of the check classes, in order of appearance in the output
+workbook.
+"""
+DEFAULT_CHECKS = [
+    ErrataCheck,
+    MissingDoiCheck,
+    MissingIfCheck,
+    SuspectProceedingsCheck,
+    SuspectAuthorListCheck,
+    DoiDuplicateCheck
+]
+
+
+class QAPipeline(object):
+
+    """Pipeline running a set of data-quality checks in a single pass over
+    the product database.
+    """
+
+    def __init__(self, checks=None):
+        """Constructor.
+
+        checks is an optional list of Check objects. If None, an instance of
+        each of the classes in DEFAULT_CHECKS is created.
+        """
+        self.checks = []
+        if checks is None:
+            checks = [check_class() for check_class in DEFAULT_CHECKS]
+        for check in checks:
+            self.register(check)
+
+    def register(self, check):
+        """Register a new check.
+        """
+        if check.NAME in [_check.NAME for _check in self.checks]:
+            raise ValueError('Check "%s" already registered' % check.NAME)
+        self.checks.append(check)
+
+    def processors(self, pub_type):
+        """Return the list of the process() methods of the checks accepting
+        the products of a given publication type.
+        """
+        return [check.process for check in self.checks if\
+                check.accepts(pub_type)]
+
+    def fields(self):
+        """Return the sorted list of the product fields needed by the checks
+        (including the publication type, for the dispatching), or None if
+        any of the checks does not declare its fields.
+        """
+        fields = set(['pub_type'])
+        for check in self.checks:
+            if check.FIELDS is None:
+                return None
+            fields.update(check.FIELDS)
+        return sorted(fields)
+
+    def run(self, db):
+        """Run all the checks over a product database.
+
+        If the database is a columnar one and all the checks declare their
+        fields, only those fields are materialized for each product.
+        """
+        print('Running %d data-quality check(s) over %d products...' %\
+              (len(self.checks), len(db)))
+        fields = self.fields()
+        prods = db
+        if fields is not None and hasattr(db, 'iter_products'):
+            prods = db.iter_products(fields)
+        dispatch_dict = {}
+        for prod in prods:
+            pub_type = prod.pub_type
+            try:
+                processors = dispatch_dict[pub_type]
+            except KeyError:
+                processors = self.processors(pub_type)
+                dispatch_dict[pub_type] = processors
+            for process in processors:
+                process(prod)
+        for check in self.checks:
+            check.finalize()
+            print(check)
+        print('Done.')
+
+    def table_dump(self):
+        """Return an ExcelTableDump object with one worksheet per check.
+        """
+        table = ExcelTableDump()
+        for check in self.checks:
+            table.add_worksheet(check.NAME, check.COL_NAMES, check.rows)
+        return table
+
+    def write(self, file_path, backend=None):
+        """Write the results of the checks to file.
+        """
+        self.table_dump().write(file_path, backend)
+
+
+
+def run_checks(file_path, checks=None, db=None, backend=None):
+    """Run a set of checks (by default, all of them) over the product
+    database, and write the results to file.
+
+    The product database is loaded, unless one is passed as an argument:
+    if all the checks declare the fields they need, the database is opened
+    from the memory-mapped columnar store, so that only the corresponding
+    columns are read from disk. Return the pipeline object.
+    """
+    pipeline = QAPipeline(checks)
+    if db is None:
+        db = load_db_prod(mmap=pipeline.fields() is not None)
+    pipeline.run(db)
+    pipeline.write(file_path, backend)
+    return pipeline
+
+
+
+if __name__ == '__main__':
+    run_checks(QA_FILE_PATH)
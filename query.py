@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Small predicate query engine for the databases.
+
+Queries are expressed as keyword arguments in the form attr__op=value, e.g.
+
+>>> db.query(year__ge=2017, pub_type__in=['1.1 Articolo in rivista'],
+             journal__icontains='proc')
+
+with the operation defaulting to equality when omitted. The available
+operations are listed in the OPERATION_DICT below. Note that, much like in
+SQL, None values never satisfy ordering comparisons or string matches.
+
+The query planner first resolves all the predicates that can be answered
+by the secondary indexes of the database (equality, membership and null
+tests), intersecting the position lists starting from the shortest one, and
+then evaluates the residual predicates on the surviving candidates, in order
+of increasing estimated selectivity, so that each entry is rejected as early
+as possible.
+"""
+
+
+def _lower(val):
+    """Lowercase a value, if it is a string.
+    """
+    if isinstance(val, str):
+        return val.lower()
+    return None
+
+
+def _compare(op):
+    """Turn an ordering comparison into a None-safe predicate.
+    """
+    def test(val, ref):
+        if val is None:
+            return False
+        try:
+            return op(val, ref)
+        except TypeError:
+            return False
+    return test
+
+
+"""Dictionary of the available operations, indexed by name. Each entry
+is a (test, selectivity) tuple, where test is a function of the entry value
+and the reference value, and selectivity is a rough a-priori estimate of the
+fraction of entries passing the test, which is used to order the residual
+predicates.
+"""
+OPERATION_DICT = {
+    'eq'         : (lambda val, ref: val == ref, 0.01),
+    'in'         : (lambda val, ref: val in ref, 0.05),
+    'startswith' : (lambda val, ref: isinstance(val, str) and\
+                    val.startswith(ref), 0.05),
+    'istartswith': (lambda val, ref: isinstance(val, str) and\
+                    val.lower().startswith(ref), 0.05),
+    'contains'   : (lambda val, ref: isinstance(val, str) and ref in val, 0.1),
+    'icontains'  : (lambda val, ref: isinstance(val, str) and\
+                    ref in val.lower(), 0.1),
+    'isnull'     : (lambda val, ref: (val is None) == ref, 0.2),
+    'lt'         : (_compare(lambda val, ref: val < ref), 0.3),
+    'le'         : (_compare(lambda val, ref: val <= ref), 0.3),
+    'gt'         : (_compare(lambda val, ref: val > ref), 0.3),
+    'ge'         : (_compare(lambda val, ref: val >= ref), 0.3),
+    'ne'         : (lambda val, ref: val != ref, 0.9)
+}
+
+
+
+class Predicate(object):
+
+    """Class describing a single predicate of a query.
+    """
+
+    def __init__(self, attr, op, value):
+        """Constructor.
+        """
+        if op not in OPERATION_DICT:
+            raise ValueError('Unknown query operation "%s"' % op)
+        self.attr = attr
+        self.op = op
+        # Case-insensitive operations are implemented by lowercasing the
+        # reference value once and for all.
+        if op in ('icontains', 'istartswith'):
+            value = value.lower()
+        # Membership tests are faster on sets, if the values are hashable.
+        if op == 'in':
+            try:
+                value = frozenset(value)
+            except TypeError:
+                value = list(value)
+        if op == 'isnull':
+            value = bool(value)
+        self.value = value
+        self._test, self.selectivity = OPERATION_DICT[op]
+
+    @classmethod
+    def from_keyword(cls, key, value):
+        """Create a predicate from a keyword argument in the form attr__op.
+        """
+        attr, sep, op = key.rpartition('__')
+        if sep == '' or op not in OPERATION_DICT:
+            return cls(key, 'eq', value)
+        return cls(attr, op, value)
+
+    def test(self, val):
+        """Test the predicate on a given value.
+        """
+        return self._test(val, self.value)
+
+    def lookup(self, index):
+        """Resolve the predicate through a secondary index (i.e., a
+        dictionary value -> sorted list of positions).
+
+        Return None if the predicate cannot be answered by the index.
+        """
+        try:
+            if self.op == 'eq':
+                return index.get(self.value, [])
+            if self.op == 'isnull' and self.value:
+                return index.get(None, [])
+            if self.op == 'in' and isinstance(self.value, frozenset):
+                positions = []
+                for val in self.value:
+                    positions += index.get(val, [])
+                return sorted(positions)
+        except TypeError:
+            pass
+        return None
+
+    def __str__(self):
+        """String formatting.
+        """
+        return '%s__%s=%r' % (self.attr, self.op, self.value)
+
+
+
+def parse_predicates(**kwargs):
+    """Turn a set of keyword arguments into a list of Predicate objects.
+    """
+    return [Predicate.from_keyword(key, val) for (key, val) in kwargs.items()]
+
+
+def plan(predicates, index_getter=None):
+    """Plan the execution of a list of predicates.
+
+    index_getter is a function taking an attribute name and returning the
+    corresponding secondary index (or None, if not available). Return a
+    (indexed, residual) tuple, where indexed is the list of the position
+    lists from the predicates resolved through the indexes (shortest first)
+    and residual the list of the remaining predicates, sorted by increasing
+    estimated selectivity.
+    """
+    indexed = []
+    residual = []
+    for pred in predicates:
+        positions = None
+        if index_getter is not None and pred.op in ('eq', 'in', 'isnull'):
+            index = index_getter(pred.attr)
+            if index is not None:
+                positions = pred.lookup(index)
+        if positions is None:
+            residual.append(pred)
+        else:
+            indexed.append(positions)
+    indexed.sort(key=len)
+    residual.sort(key=lambda pred: pred.selectivity)
+    return indexed, residual
+
+
+def execute(entries, predicates, index_getter=None):
+    """Execute a query on a list of entries and return the sorted list of the
+    positions of the matching ones.
+    """
+    indexed, residual = plan(predicates, index_getter)
+    if len(indexed) == 0:
+        candidates = range(len(entries))
+    elif len(indexed) == 1 or len(indexed[0]) == 0:
+        candidates = indexed[0]
+    else:
+        candidates = set(indexed[0])
+        for positions in indexed[1:]:
+            candidates.intersection_update(positions)
+        candidates = sorted(candidates)
+    if len(residual) == 0:
+        return list(candidates)
+    positions = []
+    for pos in candidates:
+        entry = entries[pos]
+        for pred in residual:
+            if not pred.test(getattr(entry, pred.attr)):
+                break
+        else:
+            positions.append(pos)
+    return positions
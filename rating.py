@@ -16,19 +16,24 @@
 # with this program; if not, write to the Free Software Foundation, Inc.,
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
-import os
 import sys
-import pickle
-
-import xlrd
-import xlwt
 
+import dbcache
+import delta
+import query
+import readers
+import writers
+from logger import logger
 from _rating2020 import ZERO_DOCENTS
 
 
 DB_PROD_FILE_PATH = 'db_prodotti.xlsx'
 DB_PERS_FILE_PATH = 'db_docenti.xlsx'
 
+"""Sentinel for missing attributes.
+"""
+_MISSING = object()
+
 
 class DatabaseEntry(object):
 
@@ -40,25 +45,57 @@ class DatabaseEntry(object):
 
     def __init__(self, row, row_index):
         """Constructor from a row of an excel file.
+
+        Note that row is the sequence of raw cell values for the columns
+        returned by the columns() class method, in the same order (this is
+        what the reader backends in the readers module provide).
+        """
+        self.__dict__.update(self.parse_row(row, row_index))
+
+    @classmethod
+    def parse_row(cls, row, row_index):
+        """Parse a row of an excel file into a dictionary attr -> value,
+        holding all the attributes of the corresponding entry.
+
+        This is the actual parsing logic behind the constructor, and can be
+        used by the storage engines that do not need the entry objects.
         """
-        self.__setattr__('row_index', row_index)
-        for (attr, col) in self.FIELD_DICT.items():
-            val = row[col].value
+        values = {'row_index': row_index}
+        for (attr, val) in zip(cls.FIELD_DICT.keys(), row):
             # If the column needs to be casted to a specific type, go ahead
             # and do it.
             try:
-                val = self.FORMAT_DICT[attr](val)
+                val = cls.FORMAT_DICT[attr](val)
             # Here we basically have two different kinds of exceptions:
             # - KeyError, if the column does not need to be casted;
             # - ValueError, if the actual value cannot be converted.
             # In both cases we take the string with minimal formatting.
             except:
-                val = self.format_string(val)
+                val = cls.format_string(val)
             # And if we're left with an empty string, we manually set the
             # field value to None.
             if val == '':
                 val = None
-            self.__setattr__(attr, val)
+            values[attr] = val
+        return values
+
+    @classmethod
+    def columns(cls):
+        """Return the list of the spreadsheet columns the entry is built from.
+        """
+        return list(cls.FIELD_DICT.values())
+
+    @classmethod
+    def from_values(cls, row_index, **values):
+        """Create an entry from a set of already-parsed field values.
+
+        This bypasses the excel parsing altogether, and is used to materialize
+        entries from alternative storage engines (e.g., the columnar one).
+        """
+        entry = cls.__new__(cls)
+        entry.__dict__['row_index'] = row_index
+        entry.__dict__.update(values)
+        return entry
 
     @classmethod
     def format_string(self, string):
@@ -68,6 +105,44 @@ class DatabaseEntry(object):
 
 
 
+def _split_rows(entry_class, rows, chunk_size):
+    """Split an iterable of excel rows into (entry_class, row_index, rows)
+    chunks of (at most) chunk_size rows for the parallel parsing.
+
+    Note that row_index is the row index of the first row in the chunk.
+    """
+    chunk = []
+    row_index = 2
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield entry_class, row_index, chunk
+            row_index += len(chunk)
+            chunk = []
+    if chunk:
+        yield entry_class, row_index, chunk
+
+
+def _parse_rows(chunk):
+    """Parse a chunk of excel rows.
+
+    This is the function executed in the worker processes for the parallel
+    parsing, and needs to live at the module level to be picklable. Since
+    pickling full-fledged objects is expensive, we send back the attribute
+    names and the list of the attribute values for each entry, and the
+    entries are re-assembled in the main process.
+    """
+    entry_class, row_index, rows = chunk
+    entries = [entry_class(row, row_index + i) for (i, row) in enumerate(rows)]
+    for (entry, row) in zip(entries, rows):
+        entry.__dict__[delta.DIGEST_ATTR] = delta.row_digest(row)
+    if len(entries) == 0:
+        return [], []
+    attrs = list(entries[0].__dict__.keys())
+    return attrs, [list(entry.__dict__.values()) for entry in entries]
+
+
+
 class Database(list):
 
     """Base class for a database.
@@ -81,47 +156,241 @@ class Database(list):
 
     Since the product database is generally quite large, and most of its
     information is irrelvant for our purposes, in order to decrease the
-    bootstrap time, we do create a pickles version of the database on the
-    first read and use that for subsequent accesses. (Simply remove the pickle
-    file to recreate it.)
-
-    Note that none of the xlrd object is preserved as class members, since
-    that would make pickling problematic.
+    bootstrap time, we do create a cached version of the database on the
+    first read and use that for subsequent accesses. The cache (see the
+    dbcache module) is keyed on the size, modification time and content hash
+    of the excel file, as well as on a fingerprint of the database schema,
+    and is rebuilt automatically whenever any of these change.
+
+    The excel files are read through the pluggable backends in the readers
+    module, which only read the columns listed in the FIELD_DICT of the
+    entry class and yield the rows lazily. Note that none of the reader
+    objects is preserved as class members, since that would make pickling
+    problematic.
+
+    When a new version of an excel file comes in, the last cached snapshot
+    can be used to only parse the rows that have changed, and to figure out
+    which entries have been added, removed or changed (see the delta
+    module). The DELTA_KEY and DELTA_OWNER class members define the
+    attributes identifying each entry and its owner for this purpose.
     """
 
-    def __init__(self, file_path=None, sheet_index=0):
+    ENTRY_CLASS = DatabaseEntry
+    DELTA_KEY = None
+    DELTA_OWNER = None
+
+    def __init__(self, file_path=None, sheet_index=0, backend=None,
+                 num_processes=None, incremental=False):
         """Constructor.
+
+        The backend argument allows to select the reader backend explicitly
+        (see the readers module), the default being dictated by the file
+        extension. If num_processes is larger than one, the parsing of the
+        excel file (when no valid cache is available) is spread over a pool
+        of worker processes.
+
+        If incremental is True and the cache is stale, the rows of the excel
+        file that are unchanged with respect to the cached snapshot are not
+        parsed again, and the delta member is set to the difference between
+        the two (an ExportDelta object). Note delta is None whenever no
+        comparison is possible, e.g., if no snapshot is available.
         """
         list.__init__(self)
+        self._indexes = {}
+        self._snapshot = None
+        self.num_processes = num_processes
+        self.delta = None
         # If file_path is None create an empty database (this is used for
         # the underlying selction mechanism.)
         if file_path is None:
             return
-        pickle_file_path = '%s.pickle' % file_path
-        # Case 1: the pickled file path exists, so use it.
-        if os.path.exists(pickle_file_path):
-            print('Loading pickled db from %s...' % pickle_file_path)
-            for item in pickle.load(open(pickle_file_path, 'rb')):
-                self.append(item)
+        fingerprint = self.cache_fingerprint()
+        columns = dbcache.load(file_path, fingerprint)
+        # Case 1: we have a valid cache, so use it.
+        if columns is not None:
+            self.extend(dbcache.columns_to_entries(self.ENTRY_CLASS, columns))
+            print('Done, %d entries loaded.' % len(self))
+            if incremental:
+                self.delta = delta.ExportDelta()
         # Case 2: read the actual data from the original excel file.
         else:
+            if incremental:
+                self._open_snapshot(file_path, fingerprint)
             print('Opening excel file %s...' % file_path)
-            workbook = xlrd.open_workbook(file_path)
-            print('Loading sheet at index %d...' % sheet_index)
-            sheet = workbook.sheet_by_index(sheet_index)
-            print('Done, %d column(s) by %d row(s) found.' %\
-                  (sheet.ncols, sheet.nrows))
-            print('Parsing file information...')
-            self.parse(sheet)
-            print('Done, %d row(s) parsed.' % sheet.nrows)
-            print('Dumping pickled db to %s...' % pickle_file_path)
-            pickle.dump(self, open(pickle_file_path, 'wb'))
-
-    def parse(self, sheet):
+            reader = readers.open_reader(file_path, sheet_index, backend)
+            print('Parsing file information with the %s...' % reader)
+            self.parse(reader)
+            print('Done, %d entries parsed.' % len(self))
+            if self._snapshot is not None:
+                self._close_snapshot()
+            dbcache.save(file_path, fingerprint,
+                         dbcache.entries_to_columns(self))
+
+    @classmethod
+    def cache_fingerprint(cls):
+        """Return the schema fingerprint used to validate the cache.
+
+        Sub-classes can reimplement this to add any piece of configuration
+        affecting the content of the database.
+        """
+        return dbcache.schema_fingerprint(cls.ENTRY_CLASS)
+
+    def _open_snapshot(self, file_path, fingerprint):
+        """Load the last cached snapshot of a given file, for the entries to
+        be reused in the parsing.
+        """
+        if self.DELTA_KEY is None:
+            msg = 'Incremental load not supported for %s' %\
+                self.__class__.__name__
+            raise NotImplementedError(msg)
+        columns = dbcache.load_snapshot(file_path, fingerprint)
+        if columns is None:
+            print('No cached snapshot available, doing a full parse.')
+            return
+        entries = dbcache.columns_to_entries(self.ENTRY_CLASS, columns)
+        print('Done, %d entries loaded from the snapshot.' % len(entries))
+        self._snapshot = delta.SnapshotIndex(entries)
+
+    def _close_snapshot(self):
+        """Compare the database with the cached snapshot, set the delta and
+        drop the snapshot.
+        """
+        snapshot = self._snapshot
+        self._snapshot = None
+        print('%d entries reused from the snapshot, %d parsed.' %\
+              (snapshot.num_reused, len(self) - snapshot.num_reused))
+        self.delta = delta.diff(snapshot.entries, self, self.DELTA_KEY,
+                                list(self.ENTRY_CLASS.FIELD_DICT),
+                                self.DELTA_OWNER)
+        print('Changes with respect to the snapshot: %s.' % self.delta)
+
+    def parse(self, reader):
         """Do-nothing parse mehod to be reimplemented in derived classes.
         """
         raise NotImplementedError
 
+    def read_entries(self, reader, chunk_size=5000):
+        """Iterate over the entries in the excel file, in order.
+
+        If the num_processes class member is larger than one, the rows
+        are split into chunks of chunk_size, that are parsed in a pool of
+        worker processes and merged back in order.
+
+        Each entry carries the digest of its row, and if a snapshot is
+        available, the entries with a matching digest are taken from it,
+        rather than being parsed. (Since only a handful of rows are parsed in
+        this case, the parsing is always serial.)
+        """
+        rows = reader.rows(self.ENTRY_CLASS.columns())
+        snapshot = self._snapshot
+        if snapshot is not None or self.num_processes is None or\
+           self.num_processes <= 1:
+            for (i, row) in enumerate(rows, 2):
+                digest = delta.row_digest(row)
+                entry = None
+                if snapshot is not None:
+                    entry = snapshot.reuse(digest, i)
+                if entry is None:
+                    entry = self.ENTRY_CLASS(row, i)
+                    entry.__dict__[delta.DIGEST_ATTR] = digest
+                yield entry
+            return
+        import multiprocessing
+        print('Parsing in parallel with %d processes...' % self.num_processes)
+        chunks = _split_rows(self.ENTRY_CLASS, rows, chunk_size)
+        entry_class = self.ENTRY_CLASS
+        with multiprocessing.Pool(self.num_processes) as pool:
+            for (attrs, values) in pool.imap(_parse_rows, chunks):
+                for entry_values in values:
+                    entry = entry_class.__new__(entry_class)
+                    entry.__dict__.update(zip(attrs, entry_values))
+                    yield entry
+
+    def invalidate_indexes(self):
+        """Drop all the secondary indexes.
+
+        This is called automatically whenever the database itself is
+        modified, but the database has no way to know when the attributes of
+        its entries are changed: in that case this needs to be called
+        explicitly, for the indexes to be rebuilt on the next selection.
+        """
+        self._indexes.clear()
+
+    def attribute_index(self, attr):
+        """Return the secondary index for a given attribute, i.e., a
+        dictionary mapping each value of the attribute into the (sorted) list
+        of the positions of the entries with that value.
+
+        Indexes are built lazily on first use and cached until the next call
+        to invalidate_indexes(), see the corresponding docstring. (Entries
+        lacking the attribute are simply not indexed.)
+
+        Return None if the attribute values are not hashable, and raise an
+        AttributeError if none of the entries of a non-empty database has the
+        attribute (which is almost certainly a typo in the attribute name).
+        """
+        try:
+            return self._indexes[attr]
+        except KeyError:
+            pass
+        index = {}
+        try:
+            for (pos, entry) in enumerate(self):
+                val = getattr(entry, attr, _MISSING)
+                if val is _MISSING:
+                    continue
+                try:
+                    index[val].append(pos)
+                except KeyError:
+                    index[val] = [pos]
+        except TypeError:
+            return None
+        if len(index) == 0 and len(self) > 0:
+            raise AttributeError('No entry in the database has attribute "%s"'\
+                                 % attr)
+        self._indexes[attr] = index
+        return index
+
+    def _scan(self, **kwargs):
+        """Select the positions of the entries matching a given set of
+        criteria with a plain linear scan.
+        """
+        positions = []
+        for (pos, pub) in enumerate(self):
+            accept = True
+            for (attr, val) in kwargs.items():
+                if pub.__getattribute__(attr) != val:
+                    accept = False
+                    break
+            if accept:
+                positions.append(pos)
+        return positions
+
+    def select_positions(self, **kwargs):
+        """Return the (sorted) list of the positions of the entries matching
+        a given set of criteria.
+
+        The secondary indexes are used whenever possible, and for multi-key
+        selections the position lists are intersected starting from the
+        shortest one.
+        """
+        buckets = []
+        for (attr, val) in kwargs.items():
+            index = self.attribute_index(attr)
+            try:
+                buckets.append(index.get(val, []))
+            except (AttributeError, TypeError):
+                return self._scan(**kwargs)
+        buckets.sort(key=len)
+        if len(buckets) == 1 or len(buckets[0]) == 0:
+            return list(buckets[0])
+        positions = set(buckets[0])
+        for bucket in buckets[1:]:
+            positions.intersection_update(bucket)
+            if not positions:
+                break
+        return sorted(positions)
+
     def select(self, quiet=False, **kwargs):
         """Select a subsample of publications based on a given set of
         criteria.
@@ -131,18 +400,122 @@ class Database(list):
         if not quiet:
             print('Selecting entries with %s...' % kwargs)
         selection = ProductDatabase()
-        for pub in self:
-            accept = True
-            for (attr, val) in kwargs.items():
-                if pub.__getattribute__(attr) != val:
-                    accept = False
-                    break
-            if accept:
-                selection.append(pub)
+        selection.extend(self[pos] for pos in self.select_positions(**kwargs))
         if not quiet:
             print('Done, %d entries selected.' % len(selection))
         return selection
 
+    def query(self, quiet=False, **kwargs):
+        """Select a subsample of entries based on a set of generic predicates
+        in the form attr__op=value (e.g., year__ge=2017, journal__isnull=True
+        or pub_type__in=[...]). See the query module for all the details.
+        """
+        if kwargs == {}:
+            return self
+        if not quiet:
+            print('Querying entries with %s...' % kwargs)
+        predicates = query.parse_predicates(**kwargs)
+        positions = query.execute(self, predicates, self.attribute_index)
+        selection = ProductDatabase()
+        selection.extend(self[pos] for pos in positions)
+        if not quiet:
+            print('Done, %d entries selected.' % len(selection))
+        return selection
+
+    def group_by(self, attr, **kwargs):
+        """Partition the entries by the value of a given attribute, in a
+        single pass over the database.
+
+        The optional keyword arguments are passed to query() to restrict the
+        entries to be grouped beforehand. Return a dictionary mapping each
+        value of the attribute into the database of the corresponding
+        entries (in their original order).
+        """
+        groups = {}
+        for entry in self.query(True, **kwargs):
+            key = entry.__getattribute__(attr)
+            try:
+                groups[key].append(entry)
+            except KeyError:
+                group = ProductDatabase()
+                group.append(entry)
+                groups[key] = group
+        return groups
+
+    # All the methods modifying the list need to invalidate the indexes.
+
+    def append(self, item):
+        """Overloaded method.
+        """
+        self.invalidate_indexes()
+        list.append(self, item)
+
+    def extend(self, items):
+        """Overloaded method.
+        """
+        self.invalidate_indexes()
+        list.extend(self, items)
+
+    def insert(self, pos, item):
+        """Overloaded method.
+        """
+        self.invalidate_indexes()
+        list.insert(self, pos, item)
+
+    def remove(self, item):
+        """Overloaded method.
+        """
+        self.invalidate_indexes()
+        list.remove(self, item)
+
+    def pop(self, *args):
+        """Overloaded method.
+        """
+        self.invalidate_indexes()
+        return list.pop(self, *args)
+
+    def clear(self):
+        """Overloaded method.
+        """
+        self.invalidate_indexes()
+        list.clear(self)
+
+    def sort(self, *args, **kwargs):
+        """Overloaded method.
+        """
+        self.invalidate_indexes()
+        list.sort(self, *args, **kwargs)
+
+    def reverse(self):
+        """Overloaded method.
+        """
+        self.invalidate_indexes()
+        list.reverse(self)
+
+    def __setitem__(self, key, value):
+        """Overloaded method.
+        """
+        self.invalidate_indexes()
+        list.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        """Overloaded method.
+        """
+        self.invalidate_indexes()
+        list.__delitem__(self, key)
+
+    def __iadd__(self, items):
+        """Overloaded method.
+        """
+        self.invalidate_indexes()
+        return list.__iadd__(self, items)
+
+    def __imul__(self, value):
+        """Overloaded method.
+        """
+        self.invalidate_indexes()
+        return list.__imul__(self, value)
+
 
 
 class Product(DatabaseEntry):
@@ -170,6 +543,12 @@ class Product(DatabaseEntry):
 
     IF_FIELD = 'wos_j5yif'
 
+    """Version of the rating logic in rating_points()---bump this whenever the
+    hardcoded weights, impact-factor thresholds or author cap change, so that
+    the persistent rating caches are invalidated.
+    """
+    RATING_LOGIC_VERSION = 1
+
     FORMAT_DICT = {
         'year'          : int,
         'num_authors'   : int,
@@ -189,16 +568,35 @@ class Product(DatabaseEntry):
         'c'             : 0.5
     }
 
-    def __init__(self, row, row_index):
-        """Overloaded constructor.
+    """Product types totaling zero rating points.
+    """
+    ZERO_RATING_TYPES = frozenset([
+        '1.2 Recensione in rivista',
+        '1.5 Abstract in rivista',
+        '1.6 Traduzione in rivista',
+        '2.2 Prefazione/Postfazione',
+        '2.3 Breve introduzione',
+        '4.2 Abstract in Atti di convegno',
+        '4.3 Poster'
+    ])
+
+    """Cache of the author-number normalization for the rating points,
+    indexed by (num_authors, weighting index).
+    """
+    _NORM_CACHE = {}
+
+    @classmethod
+    def parse_row(cls, row, row_index):
+        """Overloaded method.
         """
-        DatabaseEntry.__init__(self, row, row_index)
+        values = super(Product, cls).parse_row(row, row_index)
         # This is needed to match publications by name when dumping the rate,
         # since the person database only has a field with the full name.
-        self.author_full_name = '%s %s' %\
-            (self.author_surname, self.author_name)
+        values['author_full_name'] = '%s %s' %\
+            (values['author_surname'], values['author_name'])
         # Flag allowing to mark duplicates and otherwise invalid products
-        self.valid = True
+        values['valid'] = True
+        return values
 
     def __eq__(self, other):
         """Loose comparison operator to remove duplicates from the product
@@ -256,7 +654,13 @@ class Product(DatabaseEntry):
         in journals and proceedings.
         """
         q = self._weighting_index(sub_area)
-        return 6. * weight / min(self.num_authors**q, 10.)
+        key = (self.num_authors, q)
+        try:
+            norm = self._NORM_CACHE[key]
+        except KeyError:
+            norm = min(self.num_authors**q, 10.)
+            self._NORM_CACHE[key] = norm
+        return 6. * weight / norm
 
     def rating_points(self, sub_area, lookup_table={}):
         """Return the rating points for the product.
@@ -277,8 +681,8 @@ class Product(DatabaseEntry):
         # read the number and return.
         try:
             rating = lookup_table[self.handle]
-            print('Reading rating for handle %s from lookup table (%.3f)' %\
-                  (self.handle, rating))
+            logger.debug('Reading rating for handle %s from lookup table '
+                         '(%.3f)', self.handle, rating)
             return rating
         except KeyError:
             pass
@@ -317,11 +721,7 @@ class Product(DatabaseEntry):
                 return self._weight_to_rating_points(0.6, sub_area)
 
         # Now a whole bunch of categories totaling zero rating points.
-        zero_types = ['1.2 Recensione in rivista', '1.5 Abstract in rivista',
-                      '1.6 Traduzione in rivista',
-                      '2.2 Prefazione/Postfazione', '2.3 Breve introduzione',
-                      '4.2 Abstract in Atti di convegno', '4.3 Poster']
-        if pub_type in zero_types:
+        if pub_type in self.ZERO_RATING_TYPES:
             return 0.
 
         sys.exit('Error: cannot rate handle %s, %s, %d author(s), IF = %s...' %\
@@ -343,22 +743,22 @@ class ProductDatabase(Database):
     publication excel file.
     """
 
-    def parse(self, sheet):
+    ENTRY_CLASS = Product
+    DELTA_KEY = 'handle'
+    DELTA_OWNER = 'author_full_name'
+
+    def parse(self, reader):
         """Parse the content of the file and fill a comprehesive list
         of Product objects.
         """
-        for i in range(1, sheet.nrows):
-            prod = Product(sheet.row(i), i + 1)
+        for prod in self.read_entries(reader):
             self.append(prod)
 
     def select_journal_pubs(self, quiet=False, **kwargs):
         """Select all the publications on a journal (i.e., where the journal
         field is not None).
         """
-        selection = ProductDatabase()
-        for prod in self:
-            if prod.journal is not None:
-                selection.append(prod)
+        selection = self.query(True, journal__isnull=False)
         if kwargs != {}:
             selection = selection.select(quiet, **kwargs)
         return selection
@@ -367,10 +767,7 @@ class ProductDatabase(Database):
         """
         """
         print('Selecting titles matching "%s" with %s...' % (pattern, kwargs))
-        selection = ProductDatabase()
-        for prod in self.select(True, **kwargs):
-            if pattern.lower() in prod.title.lower():
-                selection.append(prod)
+        selection = self.query(True, title__icontains=pattern, **kwargs)
         print('Done, %d item(s) selected.' % len(selection))
         return selection
 
@@ -379,10 +776,8 @@ class ProductDatabase(Database):
         """
         print('Selecting author strings matching "%s" with %s...' %\
               (pattern, kwargs))
-        selection = ProductDatabase()
-        for prod in self.select(True, **kwargs):
-            if pattern.lower() in prod.author_string.lower():
-                selection.append(prod)
+        selection = self.query(True, author_string__icontains=pattern,
+                               **kwargs)
         print('Done, %d item(s) selected.' % len(selection))
         return selection
 
@@ -486,11 +881,21 @@ class DocentDatabase(Database):
     """Class representing the person database.
     """
 
-    def parse(self, sheet):
+    ENTRY_CLASS = Docent
+    DELTA_KEY = 'identifier'
+    DELTA_OWNER = 'full_name'
+
+    @classmethod
+    def cache_fingerprint(cls):
+        """Overloaded method---the list of docents with no products is
+        applied at parse time, and therefore affects the content of the cache.
+        """
+        return dbcache.schema_fingerprint(cls.ENTRY_CLASS, ZERO_DOCENTS)
+
+    def parse(self, reader):
         """Parse method.
         """
-        for i in range(1, sheet.nrows):
-            pers = Docent(sheet.row(i), i + 1)
+        for pers in self.read_entries(reader):
             if pers.full_name in ZERO_DOCENTS:
                 print('Skipping %s with no products' % pers)
             else:
@@ -501,42 +906,96 @@ class ExcelTableDump:
 
     """Convenience class describing a table to be written in an output
     excel file.
+
+    The worksheets are only stored when added, and the rows are actually
+    consumed when the table is written (i.e., the rows can be any iterable,
+    including a generator). The output format is dictated by the file
+    extension, unless a backend is explicitly passed to write() (see the
+    writers module): xlsx and csv files are streamed to disk in constant
+    memory, Parquet and Arrow files are written by columns in bulk (csv,
+    Parquet and Arrow output use one file per worksheet), and everything
+    else goes through xlwt.
     """
 
     def __init__(self):
         """Create an empty workbook.
         """
-        self.workbook = xlwt.Workbook()
+        self.worksheets = []
 
     def add_worksheet(self, name, col_names, rows):
         """Add a worksheet to the workbook.
+
+        Raise a ValueError if the name is not a valid (and unique) worksheet
+        name (see writers.check_sheet_name()).
         """
-        worksheet = self.workbook.add_sheet(name)
-        for col, name in enumerate(col_names):
-            worksheet.write(0, col, name)
-        for i, row in enumerate(rows):
-            for j, val in enumerate(row):
-                worksheet.write(i + 1, j, val)
+        writers.check_sheet_name(name, [sheet[0] for sheet in self.worksheets])
+        self.worksheets.append((name, col_names, rows))
 
-    def write(self, file_path):
+    def write(self, file_path, backend=None):
         """Write the table dump to file.
+
+        If anything goes wrong, the partial output is removed before the
+        exception is propagated.
         """
-        print('Writing table dump to %s...' % file_path)
-        self.workbook.save(file_path)
+        writer = writers.open_writer(file_path, backend)
+        print('Writing table dump with the %s...' % writer)
+        try:
+            for (name, col_names, rows) in self.worksheets:
+                writer.write_sheet(name, col_names, rows)
+            writer.close()
+        except BaseException:
+            writer.abort()
+            raise
         print('Done.')
 
 
 
-def load_db_prod():
+def load_db_prod(columnar=False, mmap=False, num_processes=None,
+                 incremental=False):
     """Load the publication list from the excel file.
+
+    If columnar is True, a numpy-backed ColumnarProductDatabase is returned
+    in place of the plain list of Product objects. If mmap is True, the
+    columnar database is backed by the memory-mapped on-disk store, and
+    columns are only loaded when they are first accessed. num_processes
+    allows to parse the excel file in parallel when no cache is available,
+    while incremental allows to reuse the last cached snapshot when the
+    excel file has changed (see the Database class).
+
+    If the RATING_SERVER environment variable is set, the (plain) database
+    is fetched from the rating server, if the latter is running (see the
+    server module), in which case num_processes and incremental have no
+    effect (and a warning is issued if they are set).
     """
-    return ProductDatabase(DB_PROD_FILE_PATH)
+    if mmap:
+        from columnar import ColumnarProductDatabase
+        return ColumnarProductDatabase.from_store(DB_PROD_FILE_PATH,
+                                                  num_processes)
+    if columnar:
+        from columnar import ColumnarProductDatabase
+        return ColumnarProductDatabase.from_file(DB_PROD_FILE_PATH,
+                                                 num_processes)
+    import server
+    db_prod = server.remote_database('db_prod')
+    if db_prod is not None:
+        if num_processes is not None or incremental:
+            logger.warning('num_processes and incremental are ignored when '
+                           'loading the product database from the rating '
+                           'server.')
+        return db_prod
+    return ProductDatabase(DB_PROD_FILE_PATH, num_processes=num_processes,
+                           incremental=incremental)
 
 
 
 def load_db_pers():
-    """Load the personnel DB from the excel file.
+    """Load the personnel DB from the excel file (or from the rating server,
+    see load_db_prod()).
     """
+    import server
+    db_pers = server.remote_database('db_pers')
+    if db_pers is not None:
+        return db_pers
     return DocentDatabase(DB_PERS_FILE_PATH)
 
 
@@ -547,6 +1006,7 @@ def print_info():
     db_prod = load_db_prod()
     db_pers = load_db_pers()
     vals = db_prod.unique_values('pub_type')
+    prods_by_type = db_prod.group_by('pub_type')
     for pub_type in ['1.2 Recensione in rivista',
                      '1.6 Traduzione in rivista',
                      '3.1 Monografia o trattato scientifico',
@@ -555,7 +1015,7 @@ def print_info():
                      '5.12 Altro',
                      '6.1 Brevetto',
                      '7.1 Curatela']:
-        prods = db_prod.select(pub_type=pub_type, quiet=True)
+        prods = prods_by_type.get(pub_type, [])
         print(pub_type)
         for prod in prods:
             print(prod)
@@ -563,12 +1023,12 @@ def print_info():
     print()
     print('Total number of docents: %d' % len(db_pers))
     sub_areas = sorted(Product.SUB_AREA_DICT.keys())
+    prods_by_author = db_prod.group_by('author_full_name')
     for sub_area in sub_areas:
         db = db_pers.select(sub_area=sub_area, quiet=True)
         print('%d docent(s) in sub-area %s' % (len(db), sub_area))
         for pers in db:
-            prods = db_prod.select(author_full_name=pers.full_name, quiet=True)
-            num_prods = len(prods)
+            num_prods = len(prods_by_author.get(pers.full_name, []))
             if num_prods < 2:
                 print('%s only has %d product(s).' %\
                       (pers.full_name, num_prods))
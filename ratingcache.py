@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Bounded memoization cache for the rating points of the products.
+
+The rating points of a product only depend on the sub-area and on a handful
+of fields of the product itself (the publication type, the impact factor and
+the number of authors), along with the content of the lookup table for the
+product handle. The RatingCache class wraps Product.rating_points() with a
+least-recently-used cache keyed on all of these, which can be optionally
+persisted on disk between different runs.
+
+Products found in the lookup table are never cached: reading the table is
+as fast as reading the cache, and this way the stamp of the lookup table in
+the cache key (i.e., the table entry for the product, which is the only part
+of the table the result depends on) is always None, so that editing the table
+never invalidates the cached ratings. Products that cannot be rated are
+not cached either, and rating_points() exits just like the original method.
+
+The file on disk is keyed on a fingerprint of the rating configuration
+(the weighting indices, the list of zero-rating types, the field used for
+the impact factor, the version of the rating logic and the source code of
+the methods implementing it, so that any change to the hardcoded weights,
+thresholds or author cap is picked up), and is discarded whenever the latter
+changes.
+"""
+
+
+import collections
+import hashlib
+import inspect
+import os
+import pickle
+
+from rating import Product
+
+
+"""Version of the cache file format---bump this whenever the layout changes.
+"""
+CACHE_VERSION = 1
+
+"""Default path to the cache file.
+"""
+RATING_CACHE_FILE_PATH = 'rating_points.cache'
+
+
+"""Product methods the rating points depend on.
+"""
+RATING_METHODS = ('impact_factor', '_weighting_index',
+                  '_weight_to_rating_points', 'rating_points')
+
+
+def rating_source():
+    """Return the source code of the methods implementing the rating logic
+    (or an empty string if the source is not available).
+    """
+    try:
+        return ''.join(inspect.getsource(getattr(Product, name)) for name in\
+                       RATING_METHODS)
+    except (OSError, TypeError):
+        return ''
+
+
+def rating_fingerprint():
+    """Return a fingerprint of the rating configuration.
+    """
+    text = repr((sorted(Product.WEIGHTING_INDEX_DICT.items()),
+                 sorted(Product.ZERO_RATING_TYPES), Product.IF_FIELD,
+                 Product.RATING_LOGIC_VERSION, rating_source()))
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+
+class RatingCache(object):
+
+    """Least-recently-used cache for the rating points.
+    """
+
+    def __init__(self, max_size=100000, file_path=None):
+        """Constructor.
+
+        If file_path is not None, the cache is initialized with the content of
+        the file, if the latter exists and is valid, and the save() method can
+        be used to write it back.
+        """
+        self.max_size = max_size
+        self.file_path = file_path
+        self.hits = 0
+        self.misses = 0
+        self._cache = collections.OrderedDict()
+        if file_path is not None:
+            self.load(file_path)
+
+    @staticmethod
+    def key(prod, sub_area, lookup_table={}):
+        """Return the cache key for a given product.
+        """
+        return (prod.handle, sub_area, prod.impact_factor(), prod.num_authors,
+                prod.pub_type, lookup_table.get(prod.handle))
+
+    def rating_points(self, prod, sub_area, lookup_table={}):
+        """Return the rating points for a product (see
+        Product.rating_points()), reading them from the cache whenever
+        possible.
+        """
+        if prod.handle in lookup_table:
+            return prod.rating_points(sub_area, lookup_table)
+        key = self.key(prod, sub_area, lookup_table)
+        try:
+            rating = self._cache[key]
+        except KeyError:
+            self.misses += 1
+            rating = prod.rating_points(sub_area, lookup_table)
+            self._cache[key] = rating
+            if len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+            return rating
+        except TypeError:
+            # Unhashable field values---just don't bother.
+            self.misses += 1
+            return prod.rating_points(sub_area, lookup_table)
+        self.hits += 1
+        self._cache.move_to_end(key)
+        return rating
+
+    def clear(self):
+        """Empty the cache and reset the counters.
+        """
+        self._cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def hit_rate(self):
+        """Return the fraction of the requests served by the cache.
+        """
+        num_requests = self.hits + self.misses
+        if num_requests == 0:
+            return 0.
+        return float(self.hits) / num_requests
+
+    def load(self, file_path):
+        """Fill the cache from file.
+        """
+        try:
+            with open(file_path, 'rb') as cache_file:
+                header = pickle.load(cache_file)
+                if header != (CACHE_VERSION, rating_fingerprint()):
+                    print('Rating configuration changed, cache is stale.')
+                    return
+                items = pickle.load(cache_file)
+        except Exception:
+            return
+        print('Loading cached rating points from %s...' % file_path)
+        self._cache.update(items[-self.max_size:])
+        print('Done, %d rating(s) loaded.' % len(self._cache))
+
+    def save(self, file_path=None):
+        """Write the content of the cache to file (in order of use, so that
+        the least recently used entries are evicted first upon loading).
+        """
+        if file_path is None:
+            file_path = self.file_path
+        print('Writing cached rating points to %s...' % file_path)
+        tmp_file_path = '%s.tmp' % file_path
+        with open(tmp_file_path, 'wb') as cache_file:
+            pickle.dump((CACHE_VERSION, rating_fingerprint()), cache_file,
+                        pickle.HIGHEST_PROTOCOL)
+            pickle.dump(list(self._cache.items()), cache_file,
+                        pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file_path, file_path)
+
+    def __len__(self):
+        """Return the number of cached ratings.
+        """
+        return len(self._cache)
+
+    def __str__(self):
+        """String formatting.
+        """
+        return 'Rating cache: %d/%d entries, %d hit(s), %d miss(es) '\
+            '(hit rate %.1f%%)' % (len(self), self.max_size, self.hits,
+                                   self.misses, 100. * self.hit_rate())
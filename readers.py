@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Pluggable spreadsheet reader backends.
+
+All the readers implement the same, minimal interface: the rows() method
+yields, lazily, one tuple of raw cell values per row (skipping the header),
+restricted to (and in the same order of) the list of columns passed as an
+argument. Empty cells are always returned as empty strings, which is what
+the downstream parsing in DatabaseEntry expects.
+
+The actual spreadsheet libraries are only imported when the corresponding
+backend is used.
+"""
+
+
+import csv
+import os
+
+
+class SheetReader(object):
+
+    """Base class for all the reader backends.
+    """
+
+    NAME = None
+
+    def __init__(self, file_path, sheet_index=0):
+        """Constructor.
+        """
+        self.file_path = file_path
+        self.sheet_index = sheet_index
+        self.ncols = None
+        self.nrows = None
+
+    def rows(self, columns):
+        """Do-nothing method to be reimplemented in derived classes.
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def _project(row, columns, default=''):
+        """Project a full row onto a list of columns, padding short rows.
+        """
+        size = len(row)
+        return tuple(row[col] if col < size else default for col in columns)
+
+    def __str__(self):
+        """String formatting.
+        """
+        return '%s reader for %s (sheet %d)' %\
+            (self.NAME, self.file_path, self.sheet_index)
+
+
+
+class XlrdReader(SheetReader):
+
+    """Reader backend based on xlrd (the original one).
+
+    Note that xlrd loads the whole workbook in memory, but we only convert
+    to Python values the cells in the columns we are interested in.
+    """
+
+    NAME = 'xlrd'
+
+    def __init__(self, file_path, sheet_index=0):
+        """Constructor.
+        """
+        SheetReader.__init__(self, file_path, sheet_index)
+        import xlrd
+        self.workbook = xlrd.open_workbook(file_path, on_demand=True)
+        self.sheet = self.workbook.sheet_by_index(sheet_index)
+        self.ncols = self.sheet.ncols
+        self.nrows = self.sheet.nrows
+
+    def _column(self, col):
+        """Return the values in a given column, excluding the header.
+        """
+        if col >= self.ncols:
+            return [''] * (self.nrows - 1)
+        return self.sheet.col_values(col, start_rowx=1)
+
+    def rows(self, columns):
+        """Overloaded method.
+        """
+        return zip(*[self._column(col) for col in columns])
+
+
+
+class XlsxStreamReader(SheetReader):
+
+    """Streaming reader backend for xlsx files, based on the read-only mode
+    of openpyxl.
+
+    The rows are parsed one at a time from the underlying xml, and the whole
+    workbook is never loaded in memory.
+    """
+
+    NAME = 'openpyxl'
+
+    def __init__(self, file_path, sheet_index=0):
+        """Constructor.
+        """
+        SheetReader.__init__(self, file_path, sheet_index)
+        import openpyxl
+        self.workbook = openpyxl.load_workbook(file_path, read_only=True,
+                                               data_only=True)
+        self.sheet = self.workbook.worksheets[sheet_index]
+        self.ncols = self.sheet.max_column
+        self.nrows = self.sheet.max_row
+
+    def rows(self, columns):
+        """Overloaded method.
+        """
+        max_col = max(columns) + 1
+        for row in self.sheet.iter_rows(min_row=2, max_col=max_col,
+                                        values_only=True):
+            values = self._project(row, columns)
+            yield tuple('' if val is None else val for val in values)
+        self.workbook.close()
+
+
+
+class CsvReader(SheetReader):
+
+    """Reader backend for csv files (comma-separated, utf-8 encoded, with
+    a header row).
+
+    Note that all the values are read as strings, and it is up to the
+    FORMAT_DICT of the entry classes to cast them to the proper types.
+    """
+
+    NAME = 'csv'
+
+    def rows(self, columns):
+        """Overloaded method.
+        """
+        with open(self.file_path, newline='', encoding='utf-8') as input_file:
+            reader = csv.reader(input_file)
+            header = next(reader, [])
+            self.ncols = len(header)
+            self.nrows = 1
+            for row in reader:
+                self.nrows += 1
+                yield self._project(row, columns)
+
+
+
+READER_DICT = {
+    'xlrd'    : XlrdReader,
+    'openpyxl': XlsxStreamReader,
+    'csv'     : CsvReader
+}
+
+
+def default_backend(file_path):
+    """Return the name of the default backend for a given file.
+
+    xlsx files are read in streaming mode with openpyxl, when available,
+    csv files with the csv backend and everything else with xlrd.
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == '.csv':
+        return 'csv'
+    if ext in ('.xlsx', '.xlsm'):
+        try:
+            import openpyxl
+            return 'openpyxl'
+        except ImportError:
+            pass
+    return 'xlrd'
+
+
+def open_reader(file_path, sheet_index=0, backend=None):
+    """Open a reader for a given file.
+
+    If backend is None, the default backend for the file type is used.
+    """
+    if backend is None:
+        backend = default_backend(file_path)
+    return READER_DICT[backend](file_path, sheet_index)
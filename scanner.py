@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Multi-pattern string scanner.
+
+A PatternScanner checks a string against a set of registered patterns at
+once, with the matching being case-insensitive. Patterns come in two
+flavors, which are treated differently for performance reasons:
+
+* literal patterns (the default) are matched against a lowercase copy of
+  the string (made once per string, no matter how many patterns) with plain
+  substring searches, which in CPython run at C speed and beat any
+  automaton written in terms of regular expressions by at least an order of
+  magnitude, even for strings of tens of thousands of characters;
+* regular-expression patterns are compiled once (on first use) and
+  searched for one at a time. (Mind that combining them in a single
+  alternation would only report the first pattern matching at any given
+  position, and therefore miss patterns overlapping with others.)
+"""
+
+
+import re
+
+
+class PatternScanner(object):
+
+    """Multi-pattern scanner.
+    """
+
+    def __init__(self, patterns=()):
+        """Constructor.
+
+        patterns is an optional iterable of (name, pattern) tuples, that are
+        registered as literal strings.
+        """
+        self._names = []
+        self._literals = []
+        self._sources = []
+        self._regexes = None
+        for (name, pattern) in patterns:
+            self.register(name, pattern)
+
+    def register(self, name, pattern, regex=False):
+        """Register a new pattern.
+
+        If regex is True the pattern is interpreted as a regular expression,
+        otherwise it is matched literally. Patterns are reported by name,
+        and in order of registration.
+        """
+        if name in self._names:
+            raise ValueError('Pattern "%s" already registered' % name)
+        self._names.append(name)
+        if regex:
+            self._sources.append((name, pattern))
+            self._regexes = None
+        else:
+            self._literals.append((name, pattern.lower()))
+
+    def names(self):
+        """Return the names of the registered patterns, in order of
+        registration.
+        """
+        return list(self._names)
+
+    def _compile(self):
+        """Compile the regular expressions.
+        """
+        self._regexes = [(name, re.compile(source, re.IGNORECASE)) for\
+                         (name, source) in self._sources]
+
+    def _scan_regex(self, text):
+        """Return the set of the names of the regular-expression patterns
+        found in a string.
+        """
+        if self._regexes is None:
+            self._compile()
+        return set(name for (name, regex) in self._regexes if\
+                   regex.search(text) is not None)
+
+    def scan(self, text):
+        """Scan a string and return the list of the names of the patterns
+        found in it, in order of registration.
+        """
+        if not text:
+            return []
+        found = set()
+        if self._literals:
+            lower_text = text.lower()
+            for (name, pattern) in self._literals:
+                if pattern in lower_text:
+                    found.add(name)
+        if self._sources:
+            found |= self._scan_regex(text)
+        return [name for name in self._names if name in found]
+
+
+
+def split_count(text, separator=';'):
+    """Return the number of fields in a separated string, i.e., the length of
+    text.split(separator), without actually building the list.
+    """
+    return text.count(separator) + 1
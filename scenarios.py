@@ -0,0 +1,414 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Batch what-if scenario engine for the rating parameters.
+
+A scenario is a dictionary of rating parameters, overriding the defaults,
+with the following keys (all of them optional):
+
+* name: the name of the scenario;
+* weighting_index_dict: the weighting indices, by sub-area (e.g.,
+  {'c': 0.4}---the sub-areas not listed keep the default index);
+* if_thresholds: the impact-factor thresholds for the journal papers;
+* author_cap: the cap on the author-number normalization;
+* if_field: the product field used for the impact factor (the manual
+  impact factors for the journals missing one are filled in for all the
+  fields in use, see load_engine());
+* loa_scaling: whether the leaves of absence are taken into account;
+* min_products: the minimum number of products for a docent to be ranked.
+
+The ScenarioEngine class takes the (post-processed) products and the docents
+once, turns them into the arrays the rating depends on (see the batch_rating
+module), and evaluates any number of scenarios over them, possibly spreading
+them over a pool of worker processes. The result is a ScenarioResult object,
+containing the scenario x docent matrices of the ratings and of the rankings
+within each sub-area, which can be written to file. Docents with products
+that cannot be rated in a given scenario are excluded from the ranking for
+that scenario, and listed, along with the number of such products, in a
+separate worksheet. Usage:
+
+>>> python scenarios.py [scenarios.json] [--output scenarios.xls]
+
+where the optional json file contains a list of scenarios (by default, the
+examples in EXAMPLE_SCENARIOS are evaluated). With the default parameters
+the ratings and rankings are identical to those of dump_rating.
+"""
+
+
+import os
+
+import numpy
+
+from batch_rating import BatchRatingEngine, ProductArrays
+from rating import ExcelTableDump, Product
+
+
+"""Default values for the scenario parameters not passed to the rating engine.
+"""
+SCENARIO_DEFAULTS = {
+    'loa_scaling': True,
+    'min_products': 2
+}
+
+"""Scenario parameters passed to the rating engine.
+"""
+ENGINE_PARAMETERS = ('weighting_index_dict', 'if_thresholds', 'author_cap',
+                     'if_field')
+
+"""Example scenarios.
+"""
+EXAMPLE_SCENARIOS = [
+    {'name': 'default'},
+    {'name': 'if_thresholds_2_4', 'if_thresholds': (2., 4.)},
+    {'name': 'index_c_0.4', 'weighting_index_dict': {'c': 0.4}},
+    {'name': 'author_cap_15', 'author_cap': 15.},
+    {'name': 'wos_jif', 'if_field': 'wos_jif'},
+    {'name': 'no_loa', 'loa_scaling': False}
+]
+
+
+def scenario_name(scenario, index):
+    """Return the name of a scenario, defaulting to its index in the list.
+    """
+    return scenario.get('name', 'scenario_%d' % index)
+
+
+def rating_engine(scenario):
+    """Return the BatchRatingEngine object for a given scenario.
+    """
+    unknown = set(scenario) - set(ENGINE_PARAMETERS) -\
+              set(SCENARIO_DEFAULTS) - set(['name'])
+    if unknown:
+        raise ValueError('Unknown scenario parameter(s) %s' % sorted(unknown))
+    kwargs = dict((key, scenario[key]) for key in ENGINE_PARAMETERS if\
+                  key in scenario)
+    if 'weighting_index_dict' in kwargs:
+        weighting_index_dict = dict(Product.WEIGHTING_INDEX_DICT)
+        weighting_index_dict.update(kwargs['weighting_index_dict'])
+        kwargs['weighting_index_dict'] = weighting_index_dict
+    return BatchRatingEngine(**kwargs)
+
+
+
+class ScenarioInputs(object):
+
+    """Input data for the scenario evaluation, i.e., the arrays the rating
+    depends on, along with the information on the docents.
+
+    This is what gets shipped (once) to each of the worker processes, and
+    therefore only contains arrays and native Python types.
+    """
+
+    def __init__(self, prods, docents, lookup_table={}, loa_scaling_dict={},
+                 if_fields=(Product.IF_FIELD,)):
+        """Constructor.
+
+        prods is the list of the products to be rated (i.e., post-processed
+        and with the invalid ones filtered out) and docents the list of
+        Docent objects. Products whose author is not in the list are ignored,
+        and so are the docents outside the sub-areas in
+        Product.SUB_AREA_DICT (just like in dump_rating).
+        """
+        skipped = [pers for pers in docents if\
+                   pers.sub_area not in Product.SUB_AREA_DICT]
+        if len(skipped) > 0:
+            print('Warning: skipping %d docent(s) outside the rated sub-areas '
+                  '(%s)' % (len(skipped), ', '.join(pers.full_name for pers in\
+                                                   skipped)))
+            docents = [pers for pers in docents if\
+                       pers.sub_area in Product.SUB_AREA_DICT]
+        self.full_names = [pers.full_name for pers in docents]
+        self.sub_areas = [pers.sub_area for pers in docents]
+        index_dict = dict((name, i) for (i, name) in\
+                          enumerate(self.full_names))
+        prods = [prod for prod in prods if prod.author_full_name in index_dict]
+        docent_index = numpy.array([index_dict[prod.author_full_name] for\
+                                    prod in prods], dtype=int)
+        # Sort the products by docent, preserving the original order within
+        # each docent, so that the rating points can be summed in the same
+        # order as in dump_rating.
+        self.docent_index = docent_index
+        self.order = numpy.argsort(docent_index, kind='stable')
+        self.counts = numpy.bincount(docent_index,
+                                     minlength=len(self.full_names))
+        self.boundaries = numpy.concatenate(([0], numpy.cumsum(self.counts)))
+        self.prod_sub_areas = numpy.array(self.sub_areas, dtype=object)\
+                              [docent_index]
+        self.lookup_table = dict(lookup_table)
+        self.loa_scale = numpy.array([loa_scaling_dict.get(name, 1.) for\
+                                      name in self.full_names])
+        self.loa_mask = numpy.array([name in loa_scaling_dict for name in\
+                                     self.full_names], dtype=bool)
+        self.arrays = {}
+        for if_field in if_fields:
+            self.arrays[if_field] = ProductArrays.from_products(prods, if_field)
+
+    def num_docents(self):
+        """Return the number of docents.
+        """
+        return len(self.full_names)
+
+    def evaluate(self, scenario):
+        """Evaluate a single scenario.
+
+        Return a (ratings, rankings, unrateable) tuple of arrays with one
+        element per docent, unrateable being the number of products of each
+        docent that cannot be rated. Docents with too few products, or with
+        any product that cannot be rated, have NaN rating and a ranking of -1.
+        """
+        parameters = dict(SCENARIO_DEFAULTS)
+        parameters.update(scenario)
+        engine = rating_engine(scenario)
+        result = engine.rate_arrays(self.arrays[engine.if_field],
+                                    self.prod_sub_areas, self.lookup_table)
+        points = result.points[self.order].tolist()
+        ratings = numpy.zeros(self.num_docents())
+        # Mind we sum sequentially as native Python floats, to stay bit-by-bit
+        # identical with dump_rating (see RatingResult.total()).
+        for i in range(self.num_docents()):
+            start, stop = self.boundaries[i], self.boundaries[i + 1]
+            ratings[i] = sum(points[start:stop])
+        if parameters['loa_scaling']:
+            ratings *= self.loa_scale
+        unrateable = numpy.bincount(self.docent_index[result.unrateable],
+                                    minlength=self.num_docents())
+        ratings[unrateable > 0] = numpy.nan
+        ratings[self.counts < parameters['min_products']] = numpy.nan
+        rankings = numpy.full(self.num_docents(), -1, dtype=int)
+        sub_areas = numpy.array(self.sub_areas, dtype=object)
+        for sub_area in sorted(set(self.sub_areas)):
+            index = numpy.nonzero((sub_areas == sub_area) &\
+                                  ~numpy.isnan(ratings))[0]
+            # A stable sort of the negative ratings matches the order of
+            # list.sort(reverse=True) in dump_rating, ties included.
+            order = index[numpy.argsort(-ratings[index], kind='stable')]
+            rankings[order] = numpy.arange(len(order))
+        return ratings, rankings, unrateable
+
+
+
+"""Scenario inputs for the worker processes.
+"""
+_WORKER_INPUTS = None
+
+
+def _init_worker(inputs):
+    """Initialize a worker process.
+    """
+    global _WORKER_INPUTS
+    _WORKER_INPUTS = inputs
+
+
+def _evaluate(scenario):
+    """Evaluate a scenario in a worker process.
+    """
+    return _WORKER_INPUTS.evaluate(scenario)
+
+
+
+class ScenarioResult(object):
+
+    """Scenario x docent result matrices.
+    """
+
+    def __init__(self, names, full_names, sub_areas, ratings, rankings,
+                 unrateable):
+        """Constructor.
+
+        unrateable is the scenario x docent matrix of the number of products
+        that cannot be rated (the corresponding docents being excluded from
+        the ranking).
+        """
+        self.names = names
+        self.full_names = full_names
+        self.sub_areas = sub_areas
+        self.ratings = ratings
+        self.rankings = rankings
+        self.unrateable = unrateable
+
+    def rating(self, name, full_name):
+        """Return the rating of a docent in a given scenario.
+        """
+        return float(self.ratings[self.names.index(name),
+                                  self.full_names.index(full_name)])
+
+    def ranking(self, name, full_name):
+        """Return the ranking of a docent in a given scenario.
+        """
+        return int(self.rankings[self.names.index(name),
+                                 self.full_names.index(full_name)])
+
+    def excluded(self, name):
+        """Return the list of the full names of the docents excluded from the
+        ranking in a given scenario because of products that cannot be rated.
+        """
+        row = self.unrateable[self.names.index(name)]
+        return [full_name for (full_name, num) in\
+                zip(self.full_names, row.tolist()) if num > 0]
+
+    def table_dump(self):
+        """Return an ExcelTableDump object with the rating and ranking
+        matrices (one row per docent, one column per scenario), along with
+        the list of the docents excluded because of products that cannot be
+        rated, if any.
+        """
+        col_names = ['Nome', 'Sottoarea'] + self.names
+        tables = [('Rating', self.ratings), ('Ranking', self.rankings)]
+        table = ExcelTableDump()
+        for (sheet_name, matrix) in tables:
+            rows = []
+            for (i, full_name) in enumerate(self.full_names):
+                values = [None if val != val else val for val in\
+                          matrix[:, i].tolist()]
+                rows.append([full_name, self.sub_areas[i]] + values)
+            table.add_worksheet(sheet_name, col_names, rows)
+        rows = []
+        for (i, name) in enumerate(self.names):
+            for (j, num) in enumerate(self.unrateable[i].tolist()):
+                if num > 0:
+                    rows.append([name, self.full_names[j], self.sub_areas[j],
+                                 num])
+        if len(rows) > 0:
+            table.add_worksheet('Esclusi', ['Scenario', 'Nome', 'Sottoarea',
+                                            'Prodotti non valutabili'], rows)
+        return table
+
+    def write(self, file_path, backend=None):
+        """Write the result matrices to file.
+        """
+        self.table_dump().write(file_path, backend)
+
+    def __str__(self):
+        """String formatting.
+        """
+        return '%d scenario(s) x %d docent(s)' %\
+            (len(self.names), len(self.full_names))
+
+
+
+class ScenarioEngine(object):
+
+    """Batch scenario engine.
+    """
+
+    def __init__(self, prods, docents, lookup_table={}, loa_scaling_dict={},
+                 num_processes=None):
+        """Constructor.
+
+        If num_processes is None the number of processes defaults to the
+        number of cores, and the scenarios are only evaluated in parallel if
+        there are more than one of each.
+        """
+        self.prods = prods
+        self.docents = docents
+        self.lookup_table = lookup_table
+        self.loa_scaling_dict = loa_scaling_dict
+        if num_processes is None:
+            num_processes = os.cpu_count() or 1
+        self.num_processes = num_processes
+        self._inputs = None
+
+    def inputs(self, scenarios):
+        """Return the ScenarioInputs object for a list of scenarios.
+
+        The inputs are cached, and only rebuilt if the scenarios need an
+        impact-factor field which is not there yet.
+        """
+        if_fields = set(rating_engine(scenario).if_field for\
+                        scenario in scenarios)
+        if self._inputs is None or\
+           not if_fields.issubset(self._inputs.arrays.keys()):
+            if self._inputs is not None:
+                if_fields.update(self._inputs.arrays.keys())
+            self._inputs = ScenarioInputs(self.prods, self.docents,
+                                          self.lookup_table,
+                                          self.loa_scaling_dict,
+                                          sorted(if_fields))
+        return self._inputs
+
+    def run(self, scenarios):
+        """Evaluate a list of scenarios and return a ScenarioResult object.
+        """
+        names = [scenario_name(scenario, i) for (i, scenario) in\
+                 enumerate(scenarios)]
+        if len(set(names)) != len(names):
+            raise ValueError('Duplicated scenario names in %s' % names)
+        inputs = self.inputs(scenarios)
+        num_processes = min(self.num_processes, len(scenarios))
+        print('Evaluating %d scenario(s) for %d docent(s)...' %\
+              (len(scenarios), inputs.num_docents()))
+        if num_processes <= 1:
+            results = [inputs.evaluate(scenario) for scenario in scenarios]
+        else:
+            import multiprocessing
+            print('Evaluating in parallel with %d processes...' %\
+                  num_processes)
+            with multiprocessing.Pool(num_processes, _init_worker,
+                                      (inputs,)) as pool:
+                results = pool.map(_evaluate, scenarios)
+        ratings = numpy.array([result[0] for result in results])
+        rankings = numpy.array([result[1] for result in results])
+        unrateable = numpy.array([result[2] for result in results])
+        result = ScenarioResult(names, inputs.full_names, inputs.sub_areas,
+                                ratings, rankings, unrateable)
+        for (name, num) in zip(names, unrateable.sum(axis=1).tolist()):
+            if num > 0:
+                print('Warning: %d product(s) cannot be rated in scenario %s, '
+                      'excluding %s' % (num, name,
+                                        ', '.join(result.excluded(name))))
+        print('Done, %s.' % result)
+        return result
+
+
+
+def load_engine(num_processes=None, if_fields=(Product.IF_FIELD,)):
+    """Load and post-process the databases (just like dump_rating does), and
+    return the corresponding ScenarioEngine object.
+
+    if_fields are the impact-factor fields to be post-processed, and should
+    include all the fields used by the scenarios to be evaluated.
+    """
+    from rating import load_db_prod, load_db_pers
+    from dump_rating import post_process
+    import _rating2020 as _rating
+    db_prod = load_db_prod()
+    db_pers = load_db_pers()
+    post_process(db_prod, if_fields=if_fields)
+    prods = db_prod.query(True, valid=True)
+    return ScenarioEngine(prods, db_pers, _rating.RATING_DICT,
+                          _rating.LOA_SCALING_DICT, num_processes)
+
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('scenarios', nargs='?', default=None)
+    parser.add_argument('--output', default='scenarios.xls')
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+    scenarios = EXAMPLE_SCENARIOS
+    if args.scenarios is not None:
+        with open(args.scenarios) as input_file:
+            scenarios = json.load(input_file)
+    if_fields = sorted(set(rating_engine(scenario).if_field for scenario in\
+                           scenarios))
+    engine = load_engine(args.processes, if_fields)
+    engine.run(scenarios).write(args.output)
@@ -0,0 +1,486 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Persistent in-memory server for the product and docent databases.
+
+The server loads both databases once and keeps them in memory, answering
+requests over HTTP on localhost. Usage:
+
+>>> python server.py [--port 8642]
+
+Requests are POST requests to /<operation>, with the parameters in a JSON
+body, and the available operations are listed in RatingServer.OPERATIONS.
+Plain results are sent back in JSON, while sets of database entries (e.g.,
+the full databases or the output of a selection) are sent back as pickled
+columns (see the dbcache module), which the client turns back into database
+objects. The serialized full databases are prepared once and reused for all
+the requests.
+
+Before each request the server checks the size and modification time of the
+excel files, and reloads any database that has changed (the product
+database incrementally, see the delta module), so that the clients always
+see the current snapshot.
+
+When the RATING_SERVER environment variable is set (to the port, or to
+host:port) load_db_prod() and load_db_pers() transparently fetch the
+databases from the server, falling back to the local files if the server
+cannot be reached, so that the existing scripts need no changes. Mind that
+pickled data are exchanged, and the server only listens on localhost: do not
+expose it to anybody you would not give your shell to.
+"""
+
+
+import json
+import os
+import pickle
+
+
+"""Name of the environment variable with the address of the server.
+"""
+SERVER_ENV_VAR = 'RATING_SERVER'
+
+"""Default host and port for the server.
+"""
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8642
+
+"""Content types for the responses.
+"""
+JSON_CONTENT_TYPE = 'application/json'
+PICKLE_CONTENT_TYPE = 'application/x-python-pickle'
+
+
+class ServerError(RuntimeError):
+
+    """Exception raised on the client side when a request fails.
+    """
+
+    pass
+
+
+
+def _columns_payload(entries):
+    """Serialize a set of database entries for the transfer.
+    """
+    import dbcache
+    return pickle.dumps(dbcache.entries_to_columns(entries),
+                        pickle.HIGHEST_PROTOCOL)
+
+
+
+class RatingServer(object):
+
+    """Server-side state, i.e., the databases and the operations on them.
+    """
+
+    """Operations available to the clients.
+    """
+    OPERATIONS = ('ping', 'load_db_prod', 'load_db_pers', 'select', 'query',
+                  'unique_values', 'rating', 'dump')
+
+    def __init__(self, prod_file_path=None, pers_file_path=None):
+        """Constructor.
+        """
+        import rating
+        if prod_file_path is None:
+            prod_file_path = rating.DB_PROD_FILE_PATH
+        if pers_file_path is None:
+            pers_file_path = rating.DB_PERS_FILE_PATH
+        self.prod_file_path = os.path.abspath(prod_file_path)
+        self.pers_file_path = os.path.abspath(pers_file_path)
+        self.db_prod = None
+        self.db_pers = None
+        self._stats = {}
+        self._payloads = {}
+        self._rating_prods = None
+        self.num_requests = 0
+        self.refresh()
+
+    @staticmethod
+    def _stat(file_path):
+        """Return the size and modification time of a file.
+        """
+        stat = os.stat(file_path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def refresh(self):
+        """Reload any database whose excel file has changed.
+        """
+        from rating import ProductDatabase, DocentDatabase
+        stat = self._stat(self.prod_file_path)
+        if stat != self._stats.get('prod'):
+            incremental = self.db_prod is not None
+            self.db_prod = ProductDatabase(self.prod_file_path,
+                                           incremental=incremental)
+            if self.db_prod.delta is not None:
+                print(self.db_prod.delta)
+            self._stats['prod'] = stat
+            self._payloads.pop('prod', None)
+            self._rating_prods = None
+        stat = self._stat(self.pers_file_path)
+        if stat != self._stats.get('pers'):
+            self.db_pers = DocentDatabase(self.pers_file_path)
+            self._stats['pers'] = stat
+            self._payloads.pop('pers', None)
+
+    def ping(self):
+        """Return the basic information about the server.
+        """
+        return {
+            'pid': os.getpid(),
+            'prod_file_path': self.prod_file_path,
+            'pers_file_path': self.pers_file_path,
+            'num_products': len(self.db_prod),
+            'num_docents': len(self.db_pers),
+            'num_requests': self.num_requests
+        }
+
+    def load_db_prod(self):
+        """Return the serialized product database.
+        """
+        if 'prod' not in self._payloads:
+            self._payloads['prod'] = _columns_payload(self.db_prod)
+        return self._payloads['prod']
+
+    def load_db_pers(self):
+        """Return the serialized docent database.
+        """
+        if 'pers' not in self._payloads:
+            self._payloads['pers'] = _columns_payload(self.db_pers)
+        return self._payloads['pers']
+
+    def select(self, **kwargs):
+        """Return the serialized output of ProductDatabase.select().
+        """
+        return _columns_payload(self.db_prod.select(True, **kwargs))
+
+    def query(self, **kwargs):
+        """Return the serialized output of ProductDatabase.query().
+        """
+        return _columns_payload(self.db_prod.query(True, **kwargs))
+
+    def unique_values(self, field, **kwargs):
+        """Return the output of ProductDatabase.unique_values() as a list of
+        [value, count] pairs (since the values need not be strings).
+        """
+        val_dict = self.db_prod.unique_values(field, **kwargs)
+        return [[val, num] for (val, num) in val_dict.items()]
+
+    def rating_products(self):
+        """Return the valid products, post-processed just like in
+        dump_rating, grouped by author full name.
+
+        The post-processing is done on a copy of the products (so that the
+        clients keep on getting the original database) once per snapshot.
+        """
+        if self._rating_prods is None:
+            import copy
+            from rating import ProductDatabase
+            from dump_rating import post_process
+            db_prod = ProductDatabase()
+            db_prod.extend(copy.copy(prod) for prod in self.db_prod)
+            post_process(db_prod)
+            self._rating_prods = db_prod.group_by('author_full_name',
+                                                  valid=True)
+        return self._rating_prods
+
+    def rating(self, full_names=None):
+        """Return the rating of the docents (all of them, or those with the
+        given full names) with their current products, as a dictionary
+        full_name -> {'sub_area', 'num_products', 'rating', 'unrateable'},
+        where unrateable is the list of the handles of the products that
+        could not be rated.
+
+        The ratings are the same as in dump_rating, i.e., the products are
+        post-processed, rated with the same rating module, and the leave of
+        absence scaling is applied. Docents outside the rated sub-areas are
+        not included.
+        """
+        from batch_rating import BatchRatingEngine
+        from dump_rating import _rating
+        from rating import Product
+        prods_dict = self.rating_products()
+        engine = BatchRatingEngine()
+        ratings = {}
+        for pers in self.db_pers:
+            if full_names is not None and pers.full_name not in full_names:
+                continue
+            if pers.sub_area not in Product.SUB_AREA_DICT:
+                continue
+            prods = prods_dict.get(pers.full_name, [])
+            rating = 0.
+            unrateable = []
+            if len(prods) > 0:
+                result = engine.rate(prods, pers.sub_area, _rating.RATING_DICT)
+                unrateable = [prods[int(i)].handle for i in result.unrateable]
+                if result.ok():
+                    rating = result.total()
+                    rating *= _rating.LOA_SCALING_DICT.get(pers.full_name, 1.)
+            ratings[pers.full_name] = {
+                'sub_area': pers.sub_area,
+                'num_products': len(prods),
+                'rating': rating,
+                'unrateable': unrateable
+            }
+        return ratings
+
+    def dump(self, file_path, checks=None):
+        """Run a set of data-quality checks (by default, all of them) and
+        write the results to file (see the qa module).
+
+        checks is an optional list of the names of the check classes. Return
+        the number of suspect entries found by each check.
+        """
+        import qa
+        check_dict = dict((check_class.__name__, check_class) for\
+                          check_class in qa.DEFAULT_CHECKS)
+        if checks is not None:
+            checks = [check_dict[name]() for name in checks]
+        pipeline = qa.run_checks(file_path, checks, self.db_prod)
+        return dict((check.NAME, len(check.rows)) for check in\
+                    pipeline.checks)
+
+    def handle(self, operation, params):
+        """Run an operation.
+        """
+        if operation not in self.OPERATIONS:
+            raise ValueError('Unknown operation "%s"' % operation)
+        self.refresh()
+        self.num_requests += 1
+        return getattr(self, operation)(**params)
+
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, prod_file_path=None,
+          pers_file_path=None):
+    """Load the databases and serve the requests until interrupted.
+
+    Requests are served one at a time, since the databases are not meant to
+    be accessed concurrently.
+    """
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+
+    state = RatingServer(prod_file_path, pers_file_path)
+
+    class RequestHandler(BaseHTTPRequestHandler):
+
+        """Request handler.
+        """
+
+        def _send(self, code, content_type, body):
+            """Send a response.
+            """
+            self.send_response(code)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            """Overloaded method.
+            """
+            operation = self.path.strip('/')
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                params = json.loads(self.rfile.read(length) or b'{}')
+                result = state.handle(operation, params)
+            except (ValueError, TypeError, KeyError, AttributeError) as\
+                   exception:
+                body = json.dumps({'error': str(exception)}).encode('utf-8')
+                self._send(400, JSON_CONTENT_TYPE, body)
+                return
+            except Exception as exception:
+                body = json.dumps({'error': repr(exception)}).encode('utf-8')
+                self._send(500, JSON_CONTENT_TYPE, body)
+                return
+            if isinstance(result, bytes):
+                self._send(200, PICKLE_CONTENT_TYPE, result)
+            else:
+                body = json.dumps({'result': result}).encode('utf-8')
+                self._send(200, JSON_CONTENT_TYPE, body)
+
+        def log_message(self, format, *args):
+            """Overloaded method, routing the request log to the logger.
+            """
+            from logger import logger
+            logger.info(format, *args)
+
+    httpd = HTTPServer((host, port), RequestHandler)
+    print('Serving %d products and %d docents on http://%s:%d...' %\
+          (len(state.db_prod), len(state.db_pers), host, port))
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print('Shutting down...')
+    finally:
+        httpd.server_close()
+
+
+
+def parse_address(address):
+    """Parse a server address in the form port or host:port.
+    """
+    address = str(address)
+    if ':' in address:
+        host, port = address.rsplit(':', 1)
+        return host or DEFAULT_HOST, int(port)
+    return DEFAULT_HOST, int(address)
+
+
+
+class RatingClient(object):
+
+    """Thin client for the rating server.
+    """
+
+    def __init__(self, address=None, timeout=600.):
+        """Constructor.
+
+        If address is None the content of the RATING_SERVER environment
+        variable is used, and failing that, the default address.
+        """
+        if address is None:
+            address = os.environ.get(SERVER_ENV_VAR) or DEFAULT_PORT
+        self.host, self.port = parse_address(address)
+        self.timeout = timeout
+
+    def request(self, operation, **params):
+        """Send a request to the server and return the result.
+
+        Sets of database entries are returned as dictionaries of columns.
+        """
+        import http.client
+        connection = http.client.HTTPConnection(self.host, self.port,
+                                                timeout=self.timeout)
+        try:
+            body = json.dumps(params).encode('utf-8')
+            connection.request('POST', '/%s' % operation, body,
+                               {'Content-Type': JSON_CONTENT_TYPE})
+            response = connection.getresponse()
+            data = response.read()
+            content_type = response.getheader('Content-Type')
+        finally:
+            connection.close()
+        if content_type == PICKLE_CONTENT_TYPE:
+            return pickle.loads(data)
+        data = json.loads(data)
+        if response.status != 200:
+            raise ServerError('%s failed (%d): %s' %\
+                              (operation, response.status, data['error']))
+        return data['result']
+
+    @staticmethod
+    def _database(db_class, columns):
+        """Build a database object from a dictionary of columns.
+        """
+        import dbcache
+        db = db_class()
+        db.extend(dbcache.columns_to_entries(db_class.ENTRY_CLASS, columns))
+        return db
+
+    def ping(self):
+        """Return the basic information about the server.
+        """
+        return self.request('ping')
+
+    def load_db_prod(self):
+        """Return the full product database.
+        """
+        from rating import ProductDatabase
+        return self._database(ProductDatabase, self.request('load_db_prod'))
+
+    def load_db_pers(self):
+        """Return the full docent database.
+        """
+        from rating import DocentDatabase
+        return self._database(DocentDatabase, self.request('load_db_pers'))
+
+    def select(self, **kwargs):
+        """Return the output of ProductDatabase.select() on the server.
+        """
+        from rating import ProductDatabase
+        return self._database(ProductDatabase,
+                              self.request('select', **kwargs))
+
+    def query(self, **kwargs):
+        """Return the output of ProductDatabase.query() on the server.
+        """
+        from rating import ProductDatabase
+        return self._database(ProductDatabase,
+                              self.request('query', **kwargs))
+
+    def unique_values(self, field, **kwargs):
+        """Return the output of ProductDatabase.unique_values() on the server.
+        """
+        return dict((val, num) for (val, num) in\
+                    self.request('unique_values', field=field, **kwargs))
+
+    def rating(self, full_names=None):
+        """Return the rating of the docents (see RatingServer.rating()).
+        """
+        return self.request('rating', full_names=full_names)
+
+    def dump(self, file_path, checks=None):
+        """Run a set of data-quality checks on the server (see
+        RatingServer.dump()).
+
+        Mind that the output file is written by the server, and the path is
+        therefore made absolute before being sent.
+        """
+        return self.request('dump', file_path=os.path.abspath(file_path),
+                            checks=checks)
+
+    def __str__(self):
+        """String formatting.
+        """
+        return 'rating server at http://%s:%d' % (self.host, self.port)
+
+
+
+def remote_database(name):
+    """Fetch a database (either 'db_prod' or 'db_pers') from the server, if
+    the RATING_SERVER environment variable is set.
+
+    Return None if the environment variable is not set, or if the server
+    cannot be reached.
+    """
+    if not os.environ.get(SERVER_ENV_VAR):
+        return None
+    client = RatingClient()
+    print('Loading %s from the %s...' % (name, client))
+    try:
+        db = getattr(client, 'load_%s' % name)()
+    except (OSError, ServerError) as exception:
+        print('Cannot reach the %s (%s), loading locally.' %\
+              (client, exception))
+        return None
+    print('Done, %d entries loaded.' % len(db))
+    return db
+
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--prod', default=None)
+    parser.add_argument('--pers', default=None)
+    args = parser.parse_args()
+    serve(args.host, args.port, args.prod, args.pers)
@@ -0,0 +1,337 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Monte Carlo ranking-stability analysis.
+
+The rankings within each sub-area decide the allocation of the points in
+dump_rating (4, 3, 2 and 1 points, with the boundaries between the bands at
+the quantile cuts), and small perturbations of the inputs can move the
+docents around the cuts. The RankingStability class draws a large number of
+perturbed replicas of the inputs, namely:
+
+* the impact factor of each journal paper is multiplied by a log-normal
+  factor (with a given relative width), which moves the papers close to the
+  thresholds from one weight to another;
+* each product is dropped with a given probability, which models the
+  borderline duplicates (and the borderline invalid products in general);
+* the leave-of-absence scaling factors (for the docents having one) are
+  smeared with a given relative Gaussian width (and clipped at 0);
+
+and rates all of them at once: the rating points are a (replicas x products)
+array, with the products sorted by docent (see scenarios.ScenarioInputs), so
+that the ratings are obtained by summing it over the docent boundaries with
+numpy.add.reduceat(), and the rankings and the bands are computed for all the
+replicas in a few array operations. Replicas are processed in
+batches, to keep the memory footprint under control. Usage:
+
+>>> python stability.py [--replicas 2000] [--output ranking_stability.xls]
+
+The output contains, for each docent, the nominal ranking, the mean and
+the 5%, 50% and 95% quantiles of the ranking distribution, and the
+probability of landing in each of the points bands (or of being excluded
+from the ranking because of having too few products).
+"""
+
+
+import numpy
+
+from batch_rating import JOURNAL_TYPE
+from rating import ExcelTableDump
+import scenarios
+
+
+"""Fractions of the docents in a sub-area defining the quantile cuts between
+the points bands (see dump_rating).
+"""
+QUANTILE_FRACTIONS = numpy.linspace(0.22, 0.75, 3)
+
+"""Points for each band, from the top of the ranking down.
+"""
+BAND_POINTS = (4, 3, 2, 1)
+
+
+def band_points(rankings, num_ranked):
+    """Return the band points for an array of rankings (with -1 for the
+    docents not ranked, getting 0 points), given the number of ranked docents.
+
+    Both arguments can be arrays, with the number of ranked docents
+    broadcastable against the rankings (e.g., one per replica).
+    """
+    rankings = numpy.asarray(rankings)
+    num_ranked = numpy.asarray(num_ranked)
+    cuts = numpy.floor(QUANTILE_FRACTIONS * num_ranked[..., None]) + 0.5
+    num_cuts_passed = (rankings[..., None] > cuts).sum(axis=-1)
+    points = numpy.array(BAND_POINTS)[num_cuts_passed]
+    return numpy.where(rankings >= 0, points, 0)
+
+
+
+class StabilityResult(object):
+
+    """Result of the ranking-stability analysis.
+    """
+
+    def __init__(self, full_names, sub_areas, nominal_rankings, rank_counts,
+                 band_counts, num_replicas):
+        """Constructor.
+
+        rank_counts is the (docents x possible rankings) array of the number
+        of replicas in which each docent got each ranking, and band_counts the
+        (docents x 5) array of the number of replicas in which each docent
+        got 0 (i.e., was not ranked), 1, 2, 3 and 4 points.
+        """
+        self.full_names = full_names
+        self.sub_areas = sub_areas
+        self.nominal_rankings = nominal_rankings
+        self.rank_counts = rank_counts
+        self.band_counts = band_counts
+        self.num_replicas = num_replicas
+
+    def band_probabilities(self):
+        """Return the (docents x 5) array of the probabilities of getting 0
+        (i.e., not being ranked), 1, 2, 3 and 4 points.
+        """
+        return self.band_counts / float(self.num_replicas)
+
+    def rank_quantiles(self, q):
+        """Return the q quantile of the ranking distribution for each docent
+        (-1 for the docents that are never ranked).
+        """
+        cumulative = numpy.cumsum(self.rank_counts, axis=1)
+        num_ranked = cumulative[:, -1]
+        quantiles = numpy.argmax(cumulative >= q * num_ranked[:, None], axis=1)
+        return numpy.where(num_ranked > 0, quantiles, -1)
+
+    def mean_ranks(self):
+        """Return the mean ranking for each docent (over the replicas in which
+        it is ranked).
+        """
+        rankings = numpy.arange(self.rank_counts.shape[1])
+        num_ranked = self.rank_counts.sum(axis=1)
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            return (self.rank_counts * rankings).sum(axis=1) / num_ranked
+
+    def table_dump(self):
+        """Return an ExcelTableDump object with one worksheet per sub-area,
+        with the docents in order of nominal ranking.
+        """
+        col_names = ['Nome', 'Ranking nominale', 'Ranking medio',
+                     'Ranking 5%', 'Ranking 50%', 'Ranking 95%',
+                     'P(4 punti)', 'P(3 punti)', 'P(2 punti)', 'P(1 punto)',
+                     'P(escluso)']
+        mean = self.mean_ranks()
+        low = self.rank_quantiles(0.05)
+        median = self.rank_quantiles(0.5)
+        high = self.rank_quantiles(0.95)
+        prob = self.band_probabilities()
+        table = ExcelTableDump()
+        for sub_area in sorted(set(self.sub_areas)):
+            index = [i for (i, area) in enumerate(self.sub_areas) if\
+                     area == sub_area]
+            index.sort(key=lambda i: (self.nominal_rankings[i] < 0,
+                                      self.nominal_rankings[i]))
+            rows = []
+            for i in index:
+                row = [self.full_names[i], int(self.nominal_rankings[i]),
+                       None if mean[i] != mean[i] else float(mean[i]),
+                       int(low[i]), int(median[i]), int(high[i])]
+                row += [float(p) for p in prob[i, ::-1]]
+                rows.append(row)
+            table.add_worksheet('Sottoarea %s' % sub_area, col_names, rows)
+        return table
+
+    def write(self, file_path, backend=None):
+        """Write the result to file.
+        """
+        self.table_dump().write(file_path, backend)
+
+
+
+class RankingStability(object):
+
+    """Monte Carlo ranking-stability analysis.
+    """
+
+    def __init__(self, inputs, scenario={}, if_sigma=0.1,
+                 drop_probability=0.01, loa_sigma=0.05, seed=None):
+        """Constructor.
+
+        inputs is a scenarios.ScenarioInputs object, and scenario the
+        dictionary of the rating parameters (see the scenarios module) the
+        replicas are perturbed around.
+        """
+        self.inputs = inputs
+        self.scenario = scenario
+        self.if_sigma = if_sigma
+        self.drop_probability = drop_probability
+        self.loa_sigma = loa_sigma
+        self.rng = numpy.random.default_rng(seed)
+        parameters = dict(scenarios.SCENARIO_DEFAULTS)
+        parameters.update(scenario)
+        self.min_products = parameters['min_products']
+        self.loa_scaling = parameters['loa_scaling']
+        self.engine = scenarios.rating_engine(scenario)
+        self._setup()
+
+    def _setup(self):
+        """Calculate all the quantities that do not change across replicas.
+        """
+        inputs = self.inputs
+        arrays = inputs.arrays[self.engine.if_field]
+        weights, rateable, normalized = self.engine.weights(arrays)
+        norm = self.engine.norm(arrays.num_authors, inputs.prod_sub_areas)
+        lookup = numpy.array([handle in inputs.lookup_table for handle in\
+                              arrays.handles], dtype=bool)
+        # Docents with products that cannot be rated are never ranked (see
+        # ScenarioInputs.evaluate()).
+        unrateable = ~(rateable | lookup)
+        self.rateable_docents = numpy.bincount(inputs.docent_index[unrateable],
+            minlength=inputs.num_docents()) == 0
+        points = numpy.zeros(len(arrays))
+        normalized &= ~unrateable
+        points[normalized] = 6. * weights[normalized] / norm[normalized]
+        for i in numpy.nonzero(lookup)[0]:
+            points[i] = inputs.lookup_table[arrays.handles[i]]
+        # The journal papers with an impact factor (and not in the lookup
+        # table) are those whose points change with the impact factor.
+        if_mask = (arrays.pub_types == JOURNAL_TYPE) &\
+                  ~numpy.isnan(arrays.impact_factors) & ~lookup & ~unrateable
+        # From now on the products are sorted by docent, so that the sums
+        # over the products of each docent can be done with reduceat() over
+        # the (non-empty) docent boundaries.
+        order = inputs.order
+        self.points = points[order]
+        self.if_mask = if_mask[order]
+        self.impact_factors = arrays.impact_factors[order][self.if_mask]
+        self.if_norm = norm[order][self.if_mask]
+        self.nonempty = inputs.counts > 0
+        self.starts = inputs.boundaries[:-1][self.nonempty]
+        if self.loa_scaling:
+            self.loa_scale = inputs.loa_scale
+            self.loa_mask = inputs.loa_mask
+        else:
+            self.loa_scale = numpy.ones(inputs.num_docents())
+            self.loa_mask = numpy.zeros(inputs.num_docents(), dtype=bool)
+        self.sub_areas = numpy.array(inputs.sub_areas, dtype=object)
+
+    def _replica_points(self, num_replicas):
+        """Return the (replicas x products) array of the rating points, along
+        with the corresponding mask of the products that are kept.
+        """
+        points = numpy.tile(self.points, (num_replicas, 1))
+        if self.if_sigma > 0. and len(self.impact_factors) > 0:
+            smearing = numpy.exp(self.if_sigma *\
+                self.rng.standard_normal((num_replicas,
+                                          len(self.impact_factors))))
+            impact_factors = self.impact_factors * smearing
+            low, high = self.engine.if_thresholds
+            weights = numpy.where(impact_factors < low, 0.6,
+                                  numpy.where(impact_factors < high, 1., 1.3))
+            points[:, self.if_mask] = 6. * weights / self.if_norm
+        kept = self.rng.random(points.shape) >= self.drop_probability
+        return points * kept, kept
+
+    def _docent_sums(self, values):
+        """Sum a (replicas x products) array over the products of each docent,
+        and return the corresponding (replicas x docents) array.
+        """
+        sums = numpy.zeros((len(values), self.inputs.num_docents()),
+                           dtype=values.dtype)
+        if len(self.starts) > 0:
+            sums[:, self.nonempty] = numpy.add.reduceat(values, self.starts,
+                                                        axis=1)
+        return sums
+
+    def _replica_rankings(self, ratings, ranked):
+        """Return the (replicas x docents) array of the rankings within each
+        sub-area (-1 for the docents that are not ranked), along with the
+        (replicas x sub-areas) array of the number of ranked docents.
+        """
+        rankings = numpy.full(ratings.shape, -1, dtype=int)
+        num_ranked = numpy.zeros(ratings.shape, dtype=int)
+        for sub_area in sorted(set(self.inputs.sub_areas)):
+            index = numpy.nonzero(self.sub_areas == sub_area)[0]
+            values = numpy.where(ranked[:, index], -ratings[:, index],
+                                 numpy.inf)
+            order = numpy.argsort(values, axis=1, kind='stable')
+            ranks = numpy.empty_like(order)
+            numpy.put_along_axis(ranks, order,
+                                 numpy.arange(len(index))[None, :], axis=1)
+            rankings[:, index] = numpy.where(ranked[:, index], ranks, -1)
+            num_ranked[:, index] = ranked[:, index].sum(axis=1)[:, None]
+        return rankings, num_ranked
+
+    def run(self, num_replicas=1000, batch_size=250):
+        """Run the analysis and return a StabilityResult object.
+        """
+        inputs = self.inputs
+        num_docents = inputs.num_docents()
+        print('Running %d perturbed replica(s) for %d docent(s)...' %\
+              (num_replicas, num_docents))
+        nominal_rankings = inputs.evaluate(self.scenario)[1]
+        rank_counts = numpy.zeros((num_docents, num_docents), dtype=int)
+        band_counts = numpy.zeros((num_docents, 5), dtype=int)
+        docent_range = numpy.arange(num_docents)
+        num_done = 0
+        while num_done < num_replicas:
+            size = min(batch_size, num_replicas - num_done)
+            points, kept = self._replica_points(size)
+            ratings = self._docent_sums(points)
+            num_products = self._docent_sums(kept.astype(int))
+            if self.loa_sigma > 0.:
+                scale = self.loa_scale * (1. + self.loa_sigma *\
+                    self.rng.standard_normal((size, num_docents)))
+                scale = numpy.where(self.loa_mask, numpy.clip(scale, 0., None),
+                                    self.loa_scale)
+            else:
+                scale = self.loa_scale
+            ratings *= scale
+            ranked = (num_products >= self.min_products) &\
+                     self.rateable_docents
+            rankings, num_ranked = self._replica_rankings(ratings, ranked)
+            bands = band_points(rankings, num_ranked)
+            for (counts, values) in ((rank_counts, rankings),
+                                     (band_counts, bands)):
+                valid = values >= 0
+                numpy.add.at(counts, (numpy.broadcast_to(docent_range,
+                             values.shape)[valid], values[valid]), 1)
+            num_done += size
+        print('Done.')
+        return StabilityResult(inputs.full_names, inputs.sub_areas,
+                               nominal_rankings, rank_counts, band_counts,
+                               num_replicas)
+
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--replicas', type=int, default=2000)
+    parser.add_argument('--if-sigma', type=float, default=0.1)
+    parser.add_argument('--drop-probability', type=float, default=0.01)
+    parser.add_argument('--loa-sigma', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--output', default='ranking_stability.xls')
+    args = parser.parse_args()
+    engine = scenarios.load_engine()
+    inputs = engine.inputs([{}])
+    analysis = RankingStability(inputs, {}, args.if_sigma,
+                                args.drop_probability, args.loa_sigma,
+                                args.seed)
+    analysis.run(args.replicas).write(args.output)
@@ -0,0 +1,366 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Generator of synthetic product and docent databases.
+
+The output files have exactly the same column layout of the real exports
+(i.e., all the columns listed in the FIELD_DICT of the Product and Docent
+classes, at the right positions, with all the other columns left empty), so
+that they can be used in place of the real, confidential data for testing
+and benchmarking. Usage:
+
+>>> python synthetic.py [--num-products N] [--num-docents N] ...
+
+The distributions are loosely modeled on those of a physics department:
+
+* docents are split among the three sub-areas, with a spread in the
+  productivity;
+* papers in sub-area a are written by large collaborations (hundreds to
+  thousands of authors) and are typically shared by several docents, i.e.,
+  the same handle appears in several rows, one per docent, while papers in
+  sub-area b (c) have a few tens (a few) of authors;
+* most of the products are journal papers, with a tail of proceedings,
+  chapters, abstracts and books, and a fraction of the journals has no
+  impact factor;
+* a configurable number of duplicates (i.e., the same product registered
+  twice by the same docent, with a different handle) is injected at random
+  positions.
+
+The generation is fully deterministic, given the seed.
+"""
+
+
+import math
+import random
+
+from rating import Product, Docent, ExcelTableDump
+
+
+"""Relative frequencies of the publication types.
+"""
+PUB_TYPE_WEIGHTS = {
+    '1.1 Articolo in rivista'                     : 0.72,
+    '4.1 Contributo in Atti di convegno'          : 0.15,
+    '2.1 Contributo in volume (Capitolo o Saggio)': 0.04,
+    '1.5 Abstract in rivista'                     : 0.03,
+    '4.2 Abstract in Atti di convegno'            : 0.02,
+    '4.3 Poster'                                  : 0.01,
+    '1.2 Recensione in rivista'                   : 0.01,
+    '2.2 Prefazione/Postfazione'                  : 0.005,
+    '3.1 Monografia o trattato scientifico'       : 0.005
+}
+
+"""Relative sizes of the sub-areas.
+"""
+SUB_AREA_WEIGHTS = {'a': 0.35, 'b': 0.25, 'c': 0.40}
+
+"""Roles of the docents.
+"""
+ROLES = ['PO', 'PA', 'RU', 'RTD']
+
+"""Syllables for the synthetic names and words for the synthetic titles.
+"""
+SYLLABLES = ['BA', 'CA', 'DE', 'FI', 'GO', 'LU', 'MA', 'NE', 'PI', 'RO', 'SA',
+             'TI', 'VE', 'ZO', 'RI', 'LLI', 'NI', 'TTI', 'SSI', 'NO']
+FIRST_NAMES = ['LUCA', 'MARIO', 'ANNA', 'GIULIA', 'PAOLO', 'SARA', 'MARCO',
+               'FRANCESCA', 'ANDREA', 'CHIARA', 'STEFANO', 'ELENA', 'GIOVANNI',
+               'MARTA', 'ALESSANDRO', 'VALERIA']
+WORDS = ['measurement', 'search', 'observation', 'study', 'evidence', 'of',
+         'the', 'in', 'with', 'for', 'neutrino', 'gamma-ray', 'dark', 'matter',
+         'quantum', 'field', 'theory', 'lattice', 'detector', 'cosmic', 'rays',
+         'decay', 'cross', 'section', 'magnetic', 'spin', 'plasma', 'laser',
+         'galaxy', 'cluster', 'top', 'quark', 'Higgs', 'boson', 'gravitational',
+         'waves', 'silicon', 'tracker', 'calorimeter', 'simulation']
+
+
+def _weighted_choice(rng, weight_dict):
+    """Pick a key from a dictionary of weights.
+    """
+    keys = list(weight_dict.keys())
+    return rng.choices(keys, weights=[weight_dict[key] for key in keys])[0]
+
+
+def _name(rng, num_syllables):
+    """Generate a synthetic surname.
+    """
+    return ''.join(rng.choice(SYLLABLES) for i in range(num_syllables))
+
+
+
+class SyntheticDepartment(object):
+
+    """Synthetic department, i.e., a set of docents along with their
+    products.
+    """
+
+    def __init__(self, num_products=5000, num_docents=75, num_duplicates=50,
+                 num_journals=300, first_year=2016, last_year=2019, seed=1):
+        """Constructor.
+        """
+        self.rng = random.Random(seed)
+        self.first_year = first_year
+        self.last_year = last_year
+        self._next_handle = 100000
+        self.docents = self._generate_docents(num_docents)
+        self.journals = self._generate_journals(num_journals)
+        self.products = self._generate_products(num_products, num_duplicates)
+
+    def _generate_docents(self, num_docents):
+        """Generate the list of docents.
+
+        Each docent is a dictionary with the Docent fields, plus the surname,
+        the name and a productivity weight.
+        """
+        rng = self.rng
+        docents = []
+        full_names = set()
+        while len(docents) < num_docents:
+            surname = _name(rng, rng.randint(3, 4))
+            name = rng.choice(FIRST_NAMES)
+            full_name = '%s %s' % (surname, name)
+            if full_name in full_names:
+                continue
+            full_names.add(full_name)
+            docents.append({
+                'identifier'  : len(docents) + 1,
+                'full_name'   : full_name,
+                'role'        : rng.choice(ROLES),
+                'sub_area'    : _weighted_choice(rng, SUB_AREA_WEIGHTS),
+                'surname'     : surname,
+                'name'        : name,
+                'productivity': rng.lognormvariate(0., 0.7)
+            })
+        return docents
+
+    def _generate_journals(self, num_journals):
+        """Generate the list of (journal, jif, j5yif) tuples.
+
+        About one journal out of ten has no impact factor.
+        """
+        rng = self.rng
+        journals = []
+        for i in range(num_journals):
+            journal = 'JOURNAL OF %s %s' % (rng.choice(WORDS).upper(),
+                                            _name(rng, 3))
+            if rng.random() < 0.1:
+                journals.append((journal, None, None))
+                continue
+            jif = round(rng.lognormvariate(math.log(2.5), 0.8), 3)
+            j5yif = round(jif * rng.uniform(0.9, 1.2), 3)
+            journals.append((journal, jif, j5yif))
+        return journals
+
+    def _handle(self):
+        """Return a new, unique handle.
+        """
+        self._next_handle += 1
+        return '11568/%d' % self._next_handle
+
+    def _num_authors(self, sub_area):
+        """Draw the number of authors for a paper in a given sub-area.
+        """
+        rng = self.rng
+        if sub_area == 'a':
+            return int(min(rng.lognormvariate(math.log(400.), 1.), 5000)) + 1
+        if sub_area == 'b':
+            return int(min(rng.lognormvariate(math.log(15.), 0.6), 200)) + 1
+        return rng.choice([1, 1, 2, 2, 2, 3, 3, 4, 5])
+
+    def _paper(self, sub_area):
+        """Generate the fields of a new paper in a given sub-area.
+        """
+        rng = self.rng
+        pub_type = _weighted_choice(rng, PUB_TYPE_WEIGHTS)
+        handle = self._handle()
+        title = ' '.join(rng.choice(WORDS) for i in range(rng.randint(5, 14)))
+        paper = {
+            'handle'     : handle,
+            'year'       : rng.randint(self.first_year, self.last_year),
+            'title'      : title[0].upper() + title[1:],
+            'pub_type'   : pub_type,
+            'num_authors': self._num_authors(sub_area),
+            'doi'        : None,
+            'isbn'       : None,
+            'journal'    : None,
+            'volume'     : None,
+            'wos_jif'    : None,
+            'wos_j5yif'  : None
+        }
+        if pub_type.startswith('1.') or rng.random() < 0.3:
+            journal, jif, j5yif = rng.choice(self.journals)
+            paper['journal'] = journal
+            if pub_type.startswith('1.'):
+                paper['wos_jif'] = jif
+                paper['wos_j5yif'] = j5yif
+            elif jif is not None and rng.random() < 0.5:
+                # Proceedings and chapters indexed with an impact factor.
+                paper['wos_jif'] = jif
+                paper['wos_j5yif'] = j5yif
+        else:
+            paper['volume'] = 'Proceedings of the %s conference' %\
+                              _name(rng, 3).title()
+        if rng.random() < 0.85:
+            paper['doi'] = '10.%d/%s' % (rng.randint(1000, 9999),
+                                         handle.split('/')[1])
+        if pub_type.startswith('2.') or pub_type.startswith('3.'):
+            paper['isbn'] = '978-88-%d-%d' % (rng.randint(1000, 9999),
+                                              rng.randint(100, 999))
+        return paper
+
+    def _author_string(self, paper, authors):
+        """Generate the author string for a paper, including the docents
+        from the department among the authors.
+
+        Mind that long author lists are truncated, as in the real export.
+        """
+        rng = self.rng
+        names = ['%s %s.' % (docent['surname'].title(), docent['name'][0]) for\
+                 docent in authors]
+        num_names = min(paper['num_authors'], 100)
+        while len(names) < num_names:
+            names.insert(rng.randint(0, len(names)),
+                         '%s %s.' % (_name(rng, 3).title(),
+                                     rng.choice(FIRST_NAMES)[0]))
+        author_string = '; '.join(names[:num_names])
+        if paper['num_authors'] > num_names:
+            author_string += '; et al.'
+        return author_string
+
+    def _generate_products(self, num_products, num_duplicates):
+        """Generate the list of products, i.e., of rows of the product db.
+
+        Each product is a dictionary with all the Product fields.
+        """
+        rng = self.rng
+        area_dict = {}
+        for docent in self.docents:
+            area_dict.setdefault(docent['sub_area'], []).append(docent)
+        weights = [docent['productivity'] for docent in self.docents]
+        products = []
+        while len(products) < num_products - num_duplicates:
+            docent = rng.choices(self.docents, weights=weights)[0]
+            sub_area = docent['sub_area']
+            paper = self._paper(sub_area)
+            # Large-collaboration papers are shared among several docents.
+            authors = [docent]
+            if sub_area == 'a':
+                num_coauthors = min(int(rng.expovariate(0.5)),
+                                    len(area_dict['a']) - 1)
+                others = [pers for pers in area_dict['a'] if pers is not docent]
+                authors += rng.sample(others, num_coauthors)
+            elif sub_area == 'b' and rng.random() < 0.2:
+                others = [pers for pers in area_dict['b'] if pers is not docent]
+                if others:
+                    authors.append(rng.choice(others))
+            author_string = self._author_string(paper, authors)
+            for author in authors:
+                prod = dict(paper)
+                prod['author_name'] = author['name']
+                prod['author_surname'] = author['surname']
+                prod['author_string'] = author_string
+                products.append(prod)
+        del products[num_products - num_duplicates:]
+        # Inject the duplicates---same product, same docent, different handle.
+        for i in range(min(num_duplicates, len(products))):
+            prod = dict(rng.choice(products))
+            prod['handle'] = self._handle()
+            products.insert(rng.randint(0, len(products)), prod)
+        return products
+
+    @staticmethod
+    def _rows(entry_class, entries):
+        """Convert a list of entries into full-width rows, with the fields at
+        the right column positions.
+        """
+        num_cols = max(entry_class.FIELD_DICT.values()) + 1
+        for entry in entries:
+            row = [None] * num_cols
+            for (attr, col) in entry_class.FIELD_DICT.items():
+                row[col] = entry[attr]
+            yield row
+
+    @staticmethod
+    def _col_names(entry_class):
+        """Return the header row for a given entry class.
+        """
+        num_cols = max(entry_class.FIELD_DICT.values()) + 1
+        col_names = ['Colonna %d' % col for col in range(num_cols)]
+        for (attr, col) in entry_class.FIELD_DICT.items():
+            col_names[col] = attr
+        return col_names
+
+    def write_products(self, file_path):
+        """Write the product database to file.
+        """
+        table = ExcelTableDump()
+        table.add_worksheet('Prodotti', self._col_names(Product),
+                            self._rows(Product, self.products))
+        table.write(file_path)
+
+    def write_docents(self, file_path):
+        """Write the docent database to file.
+        """
+        table = ExcelTableDump()
+        table.add_worksheet('Docenti', self._col_names(Docent),
+                            self._rows(Docent, self.docents))
+        table.write(file_path)
+
+    def lookup_table(self, rating=1.):
+        """Return a lookup table with a fixed rating for all the products that
+        cannot be rated programmatically (e.g., books).
+        """
+        rateable = set(Product.ZERO_RATING_TYPES)
+        rateable.update(['1.1 Articolo in rivista',
+                         '4.1 Contributo in Atti di convegno',
+                         '2.1 Contributo in volume (Capitolo o Saggio)'])
+        return dict((prod['handle'], rating) for prod in self.products if\
+                    prod['pub_type'] not in rateable)
+
+
+
+def generate(prod_file_path, pers_file_path, **kwargs):
+    """Generate a synthetic department and write the product and docent
+    databases to file.
+
+    All the keyword arguments are passed to the SyntheticDepartment
+    constructor. Return the SyntheticDepartment object.
+    """
+    print('Generating synthetic department with %s...' % kwargs)
+    department = SyntheticDepartment(**kwargs)
+    print('Done, %d product(s) for %d docent(s).' %\
+          (len(department.products), len(department.docents)))
+    department.write_products(prod_file_path)
+    department.write_docents(pers_file_path)
+    return department
+
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--prod-file', default='db_prodotti_synthetic.xlsx')
+    parser.add_argument('--pers-file', default='db_docenti_synthetic.xlsx')
+    parser.add_argument('--num-products', type=int, default=5000)
+    parser.add_argument('--num-docents', type=int, default=75)
+    parser.add_argument('--num-duplicates', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    generate(args.prod_file, args.pers_file, num_products=args.num_products,
+             num_docents=args.num_docents, num_duplicates=args.num_duplicates,
+             seed=args.seed)
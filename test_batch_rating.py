@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Unit tests for the batch rating engine.
+"""
+
+
+import numpy
+import pytest
+
+import synthetic
+from batch_rating import BatchRatingEngine
+from rating import Product, ProductDatabase
+
+
+@pytest.fixture(scope='module')
+def department(tmp_path_factory):
+    """Generate and load a small synthetic product database, and return the
+    (products, lookup table) tuple.
+    """
+    folder_path = tmp_path_factory.mktemp('batch_rating')
+    prod_file_path = str(folder_path / 'db_prodotti.xlsx')
+    pers_file_path = str(folder_path / 'db_docenti.xlsx')
+    department = synthetic.generate(prod_file_path, pers_file_path,
+                                    num_products=300, num_docents=10,
+                                    num_duplicates=5)
+    return list(ProductDatabase(prod_file_path)), department.lookup_table()
+
+
+@pytest.mark.parametrize('sub_area', sorted(Product.WEIGHTING_INDEX_DICT))
+def test_batch_vs_scalar(department, sub_area):
+    """The batch rating must be bit-by-bit identical to the scalar one.
+    """
+    prods, lookup_table = department
+    result = BatchRatingEngine().rate(prods, sub_area, lookup_table)
+    assert result.ok()
+    expected = [prod.rating_points(sub_area, lookup_table) for prod in prods]
+    assert result.points.tolist() == expected
+    assert result.total() == sum(expected)
+    assert result.num_lookups == len([prod for prod in prods if\
+                                      prod.handle in lookup_table])
+
+
+def test_unrateable(department):
+    """Products that need a manual rating must be flagged as such.
+    """
+    prods, lookup_table = department
+    result = BatchRatingEngine().rate(prods, 'a')
+    assert not result.ok()
+    assert len(result.unrateable) > 0
+    assert numpy.isnan(result.points[result.unrateable]).all()
+    for i in result.unrateable:
+        assert prods[i].handle in lookup_table
+    with pytest.raises(SystemExit):
+        result.check(prods)
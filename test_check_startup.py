@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Unit tests for the startup-time check.
+"""
+
+
+import pytest
+
+import check_startup
+
+
+"""Sample output of -X importtime.
+"""
+IMPORT_TIME_OUTPUT = '''import time: self [us] | cumulative | imported package
+import time:       100 |        100 |     _io
+import time:       200 |        300 |   io
+import time:        50 |         50 |   logger
+import time:       400 |        750 | rating
+some unrelated line
+'''
+
+
+def test_parse_import_times():
+    """Check the parsing of the -X importtime output.
+    """
+    import_times = check_startup.parse_import_times(IMPORT_TIME_OUTPUT)
+    assert [(name, depth) for (name, depth, _, _) in import_times] ==\
+        [('_io', 2), ('io', 1), ('logger', 1), ('rating', 0)]
+    assert import_times[-1][2:] == pytest.approx((400.e-6, 750.e-6))
+    total, direct = check_startup.script_imports(import_times, 'rating')
+    assert total == pytest.approx(750.e-6)
+    assert [name for (name, _) in direct] == ['logger', 'io']
+    assert check_startup.script_imports(import_times, 'other') == (0., [])
+
+
+@pytest.mark.parametrize('module_name', ['rating', 'dump_rating',
+                                         'dump_errata',
+                                         'dump_premialita_2018'])
+def test_deferred_imports(module_name):
+    """Importing the scripts must not pull in the heavy plotting and excel
+    libraries.
+    """
+    code = 'import sys, %s; assert not set(sys.modules) & '\
+        'set(["matplotlib", "xlrd", "xlwt", "openpyxl"])' % module_name
+    check_startup.run_python(code, num_runs=1)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Unit tests for the memory-mapped columnar store.
+"""
+
+
+import numpy
+
+import colstore
+from columnar import ColumnarProductDatabase, pack_column
+
+
+FINGERPRINT = 'fingerprint'
+
+
+def _store(tmp_path):
+    """Write a small store with all the different kinds of columns, and
+    return the (source file path, columns, kinds) tuple.
+    """
+    file_path = str(tmp_path / 'db.xls')
+    with open(file_path, 'wb') as output_file:
+        output_file.write(b'source')
+    values = {
+        'year': ([2019, None, 2017], 'int'),
+        'wos_jif': ([1.5, None, 0.25], 'float'),
+        'valid': ([True, False, True], 'bool'),
+        'title': (['Titolo', None, 'Perché no?'], 'object'),
+        'volume': (['12', 3, None], 'object'),
+        'empty': ([None, None, None], 'object')
+    }
+    columns = {}
+    kinds = {}
+    for (attr, (vals, kind)) in values.items():
+        columns[attr], kinds[attr] = pack_column(vals, kind)
+    colstore.write_store(file_path, FINGERPRINT, columns, kinds)
+    return file_path, columns, kinds
+
+
+def test_roundtrip(tmp_path):
+    """All the kinds of columns must survive a write/read cycle.
+    """
+    file_path, columns, kinds = _store(tmp_path)
+    store = colstore.open_store(file_path, FINGERPRINT)
+    assert store.kinds() == kinds
+    for (attr, column) in columns.items():
+        assert store[attr].dtype == column.dtype
+        if kinds[attr] == 'float':
+            assert numpy.array_equal(store[attr], column, equal_nan=True)
+        else:
+            assert list(store[attr]) == list(column)
+
+
+def test_lazy_loading(tmp_path):
+    """Columns must only be read on first access.
+    """
+    file_path, columns, kinds = _store(tmp_path)
+    store = colstore.open_store(file_path, FINGERPRINT)
+    assert store.loaded() == []
+    assert 'title' in store
+    assert store.loaded() == []
+    store['title']
+    assert store.loaded() == ['title']
+    db = ColumnarProductDatabase(store, store.kinds())
+    assert db.values('year') == [2019, None, 2017]
+    assert sorted(store.loaded()) == ['title', 'year']
+
+
+def test_stale(tmp_path):
+    """The store must be ignored when stale.
+    """
+    file_path, columns, kinds = _store(tmp_path)
+    assert colstore.open_store(file_path, 'other fingerprint') is None
+    with open(file_path, 'wb') as output_file:
+        output_file.write(b'changed source')
+    assert colstore.open_store(file_path, FINGERPRINT) is None
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Unit tests for the columnar storage engine.
+"""
+
+
+import os
+
+import numpy
+import pytest
+
+import columnar
+import dbcache
+import query
+import synthetic
+from rating import ProductDatabase
+
+
+@pytest.fixture(scope='module')
+def prod_file_path(tmp_path_factory):
+    """Generate a small synthetic product database.
+    """
+    folder_path = tmp_path_factory.mktemp('columnar')
+    prod_file_path = str(folder_path / 'db_prodotti.xlsx')
+    pers_file_path = str(folder_path / 'db_docenti.xlsx')
+    synthetic.generate(prod_file_path, pers_file_path, num_products=300,
+                       num_docents=10, num_duplicates=5)
+    return prod_file_path
+
+
+def _remove_cache(file_path):
+    """Remove the database cache for a given file, if any.
+    """
+    if os.path.exists(dbcache.cache_file_path(file_path)):
+        os.remove(dbcache.cache_file_path(file_path))
+
+
+def test_cold_load(prod_file_path):
+    """A cold load, parsing the rows directly into the columns, must yield
+    the same values (and the same cache) as the ProductDatabase class.
+    """
+    _remove_cache(prod_file_path)
+    db = columnar.ColumnarProductDatabase.from_file(prod_file_path)
+    values = dbcache.load(prod_file_path, ProductDatabase.cache_fingerprint())
+    _remove_cache(prod_file_path)
+    prods = ProductDatabase(prod_file_path)
+    assert values == dbcache.entries_to_columns(prods)
+    for attr in db.field_names():
+        assert db.values(attr) == [prod.__dict__[attr] for prod in prods]
+
+
+def test_parallel_read(prod_file_path):
+    """The parallel parsing must yield the same columns as the serial one.
+    """
+    read_columns = columnar.ColumnarProductDatabase.read_columns
+    assert read_columns(prod_file_path, 2, 50) == read_columns(prod_file_path)
+
+
+def test_int_columns():
+    """Integer columns are stored as int64, with a sentinel for the nulls.
+    """
+    column, kind = columnar.pack_column([2019, None, 2017], 'int')
+    assert kind == 'int' and column.dtype == numpy.int64
+    assert [columnar.unpack_value(val, kind) for val in column] ==\
+        [2019, None, 2017]
+    assert columnar.equal_mask(column, kind, None).tolist() ==\
+        [False, True, False]
+    pred = query.Predicate('year', 'lt', 2018)
+    mask = columnar.predicate_mask(pred, column, kind)
+    assert mask.tolist() == [False, False, True]
+    column, kind = columnar.pack_column([2019, 1.5], 'int')
+    assert kind == 'float'
+    column, kind = columnar.pack_column([2019, 'n/a'], 'int')
+    assert kind == 'object'
+
+
+def test_query_vs_select(prod_file_path):
+    """Check the selections against the plain ProductDatabase class.
+    """
+    db = columnar.ColumnarProductDatabase.from_file(prod_file_path)
+    prods = ProductDatabase(prod_file_path)
+    for kwargs in ({'year__lt': 2018}, {'num_authors__ge': 100},
+                   {'journal__isnull': True}, {'year__ne': 2019}):
+        assert db.query(True, **kwargs).values('row_index') ==\
+            [prod.row_index for prod in prods.query(True, **kwargs)]
+    assert db.select(True, year=2017).values('row_index') ==\
+        [prod.row_index for prod in prods.select(True, year=2017)]
+
+
+def test_set_values(prod_file_path):
+    """Setting values must preserve (or, if needed, upgrade) the column kind.
+    """
+    db = columnar.ColumnarProductDatabase.from_file(prod_file_path)
+    mask = db.mask(year=2017)
+    db.set_values('num_authors', None, mask)
+    assert db.kinds['num_authors'] == 'int'
+    assert len(db.select(True, num_authors=None)) == mask.sum()
+    db.set_values('year', 2017.5, mask)
+    assert db.kinds['year'] == 'float'
+    assert len(db.select(True, year=2017.5)) == mask.sum()
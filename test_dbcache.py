@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Unit tests for the database cache.
+"""
+
+
+import os
+
+import dbcache
+from rating import Docent, Product
+
+
+PAYLOAD = {'row_index': [2, 3], 'handle': ['11568/1', '11568/2']}
+
+
+def _source_file(tmp_path, content=b'original content'):
+    """Write a (fake) source file.
+    """
+    file_path = str(tmp_path / 'db.xls')
+    with open(file_path, 'wb') as output_file:
+        output_file.write(content)
+    return file_path
+
+
+def test_roundtrip(tmp_path):
+    """The payload must survive a save/load cycle.
+    """
+    file_path = _source_file(tmp_path)
+    fingerprint = dbcache.schema_fingerprint(Product)
+    assert dbcache.load(file_path, fingerprint) is None
+    dbcache.save(file_path, fingerprint, PAYLOAD)
+    assert dbcache.load(file_path, fingerprint) == PAYLOAD
+
+
+def test_fingerprint(tmp_path):
+    """The cache must be invalidated by any change in the schema.
+    """
+    file_path = _source_file(tmp_path)
+    fingerprint = dbcache.schema_fingerprint(Product)
+    assert fingerprint != dbcache.schema_fingerprint(Docent)
+    assert fingerprint != dbcache.schema_fingerprint(Product, ['extra'])
+    dbcache.save(file_path, fingerprint, PAYLOAD)
+    assert dbcache.load(file_path, dbcache.schema_fingerprint(Docent)) is None
+    assert dbcache.load_snapshot(file_path,
+                                 dbcache.schema_fingerprint(Docent)) is None
+
+
+def test_content_change(tmp_path):
+    """The cache must be invalidated when the content of the source file
+    changes, but not when the file is merely touched.
+    """
+    file_path = _source_file(tmp_path)
+    fingerprint = dbcache.schema_fingerprint(Product)
+    dbcache.save(file_path, fingerprint, PAYLOAD)
+    stat = os.stat(file_path)
+    os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert dbcache.load(file_path, fingerprint) == PAYLOAD
+    # Same size, different content.
+    _source_file(tmp_path, b'modified content')
+    assert dbcache.load(file_path, fingerprint) is None
+    # The snapshot is still there, though.
+    assert dbcache.load_snapshot(file_path, fingerprint) == PAYLOAD
+
+
+def test_corrupted(tmp_path):
+    """A corrupted cache file must be simply ignored.
+    """
+    file_path = _source_file(tmp_path)
+    with open(dbcache.cache_file_path(file_path), 'wb') as output_file:
+        output_file.write(b'garbage')
+    assert dbcache.load(file_path, dbcache.schema_fingerprint(Product)) is None
+
+
+def test_columns():
+    """Entries must survive the conversion to columns and back.
+    """
+    row = [''] * len(Product.columns())
+    entries = [Product(row, i) for i in range(2, 5)]
+    columns = dbcache.entries_to_columns(entries)
+    copies = dbcache.columns_to_entries(Product, columns)
+    assert [entry.__dict__ for entry in copies] ==\
+        [entry.__dict__ for entry in entries]
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Unit tests for the duplicate detection.
+"""
+
+
+import pytest
+
+import dedup
+import synthetic
+from rating import Product, ProductDatabase
+
+
+@pytest.fixture(scope='module')
+def prods(tmp_path_factory):
+    """Generate and load a small synthetic product database, and append a
+    few hand-crafted products exercising the ISBN rule.
+    """
+    folder_path = tmp_path_factory.mktemp('dedup')
+    prod_file_path = str(folder_path / 'db_prodotti.xlsx')
+    pers_file_path = str(folder_path / 'db_docenti.xlsx')
+    synthetic.generate(prod_file_path, pers_file_path, num_products=300,
+                       num_docents=10, num_duplicates=5)
+    prods = list(ProductDatabase(prod_file_path))
+    row = [''] * len(Product.columns())
+    for (i, (pub_type, title)) in enumerate((
+            (dedup.MONOGRAPH_TYPE, 'A monograph'),
+            ('2.1 Contributo in volume (Capitolo o Saggio)', 'A chapter'),
+            ('2.1 Contributo in volume (Capitolo o Saggio)', 'Another one'))):
+        prod = Product(row, 1000 + i)
+        prod.handle = '11568/%d' % (1000 + i)
+        prod.pub_type = pub_type
+        prod.title = title
+        prod.isbn = '978-88-00000-00-0'
+        prod.author_full_name = 'ROSSI MARIO'
+        prods.append(prod)
+    # Mind the ISBN rule is not symmetric: moving one of the chapters before
+    # the monograph makes sure it is not flagged as a duplicate.
+    prods.insert(0, prods.pop())
+    return prods
+
+
+def _naive_duplicates(prods):
+    """Plain list.index() implementation of find_duplicates().
+    """
+    unique = []
+    pairs = []
+    for prod in prods:
+        try:
+            pairs.append((prod, unique[unique.index(prod)]))
+        except ValueError:
+            unique.append(prod)
+    return pairs
+
+
+def _naive_clusters(prods):
+    """Plain pairwise implementation of the clustering.
+    """
+    clusters = []
+    for prod in prods:
+        linked = [cluster for cluster in clusters if\
+                  any(prod == other or other == prod for other in cluster)]
+        for cluster in linked:
+            clusters.remove(cluster)
+        clusters.append(sum(linked, []) + [prod])
+    return clusters
+
+
+def test_find_duplicates(prods):
+    """The blocking-key lookups must match the list.index() scan.
+    """
+    pairs = dedup.find_duplicates(prods)
+    assert len(pairs) > 0
+    assert [(id(a), id(b)) for (a, b) in pairs] ==\
+        [(id(a), id(b)) for (a, b) in _naive_duplicates(prods)]
+
+
+def test_disjoint_set():
+    """Check the union-find data structure.
+    """
+    disjoint_set = dedup.DisjointSet(6)
+    disjoint_set.union(4, 1)
+    disjoint_set.union(1, 3)
+    disjoint_set.union(5, 2)
+    disjoint_set.union(3, 4)
+    assert disjoint_set.find(3) == disjoint_set.find(4)
+    assert disjoint_set.find(0) != disjoint_set.find(1)
+    assert sorted(disjoint_set.sets()) == [[0], [1, 3, 4], [2, 5]]
+
+
+def test_cluster_duplicates(prods):
+    """The clustering must match the pairwise connected components.
+    """
+    clusters = dedup.cluster_duplicates(prods, min_handles=1)
+    expected = _naive_clusters(prods)
+    key = lambda cluster: sorted(id(prod) for prod in cluster)
+    assert sorted(map(key, clusters)) == sorted(map(key, expected))
+    clusters = dedup.cluster_duplicates(prods)
+    assert len(clusters) > 0
+    assert all(len(set(prod.handle for prod in cluster)) >= 2 for\
+               cluster in clusters)
+    titles = [prod.title for prod in clusters[0]]
+    assert sorted(titles) == ['A chapter', 'A monograph', 'Another one']
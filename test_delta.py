@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Unit tests for the incremental reload.
+"""
+
+
+import delta
+import synthetic
+from rating import ProductDatabase
+
+
+def _author(prod):
+    """Return the full name of the author of a synthetic product.
+    """
+    return '%s %s' % (prod['author_surname'], prod['author_name'])
+
+
+def test_digest():
+    """The digest must depend on the values and their order.
+    """
+    assert delta.row_digest(['a', 1.]) == delta.row_digest(('a', 1.))
+    assert delta.row_digest(['a', 1.]) != delta.row_digest([1., 'a'])
+    assert delta.row_digest(['a', 1.]) != delta.row_digest(['a', 1])
+
+
+def test_diff():
+    """Check the comparison of two versions of a database.
+    """
+    class Entry(object):
+        def __init__(self, key, value, owner):
+            self.key, self.value, self.owner = key, value, owner
+    old = [Entry(1, 'a', 'x'), Entry(2, 'b', 'y'), Entry(2, 'c', 'z'),
+           Entry(3, 'd', 'x')]
+    new = [Entry(2, 'c', 'z'), Entry(2, 'b', 'y'), Entry(3, 'e', 'w'),
+           Entry(4, 'f', 'v')]
+    changes = delta.diff(old, new, 'key', ['value'], 'owner')
+    assert (changes.added, changes.removed, changes.changed) == ([4], [1], [3])
+    assert changes.affected == set(['v', 'w', 'x'])
+    assert delta.diff(old, old, 'key', ['value'], 'owner').empty()
+
+
+def test_incremental_reload(tmp_path):
+    """An incremental reload must yield the same database as a full parse,
+    and flag the modified products.
+    """
+    department = synthetic.SyntheticDepartment(num_products=200,
+                                               num_docents=8,
+                                               num_duplicates=3)
+    file_path = str(tmp_path / 'db_prodotti.xlsx')
+    department.write_products(file_path)
+    db_prod = ProductDatabase(file_path, incremental=True)
+    assert db_prod.delta is None
+    assert ProductDatabase(file_path, incremental=True).delta.empty()
+    # Change the title of a product and remove another one.
+    changed = department.products[5]
+    changed['title'] = 'A brand new title'
+    removed = department.products.pop(17)
+    department.write_products(file_path)
+    db_prod = ProductDatabase(file_path, incremental=True)
+    assert db_prod.delta.changed == [changed['handle']]
+    assert db_prod.delta.removed == [removed['handle']]
+    assert db_prod.delta.added == []
+    assert set([_author(changed), _author(removed)]) <= db_prod.delta.affected
+    # And compare with a full parse.
+    full_file_path = str(tmp_path / 'db_prodotti_full.xlsx')
+    department.write_products(full_file_path)
+    assert [prod.__dict__ for prod in db_prod] ==\
+        [prod.__dict__ for prod in ProductDatabase(full_file_path)]
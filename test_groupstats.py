@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Unit tests for the grouped aggregations.
+"""
+
+
+import numpy
+import pytest
+
+import synthetic
+from dump_rating import product_statistics
+from groupstats import GroupBy
+from rating import ProductDatabase
+
+
+@pytest.fixture(scope='module')
+def prods(tmp_path_factory):
+    """Generate and load a small synthetic product database.
+    """
+    folder_path = tmp_path_factory.mktemp('groupstats')
+    prod_file_path = str(folder_path / 'db_prodotti.xlsx')
+    pers_file_path = str(folder_path / 'db_docenti.xlsx')
+    synthetic.generate(prod_file_path, pers_file_path, num_products=300,
+                       num_docents=10, num_duplicates=5)
+    return list(ProductDatabase(prod_file_path))
+
+
+def _group_dict(keys, values):
+    """Group a list of values by key with a plain dictionary.
+    """
+    group_dict = {}
+    for (key, val) in zip(keys, values):
+        group_dict.setdefault(key, []).append(val)
+    return group_dict
+
+
+def test_statistics():
+    """Check all the statistics against a plain per-group computation.
+    """
+    rng = numpy.random.default_rng(1)
+    keys = rng.choice(['c', 'a', 'd', 'b'], size=101)
+    values = rng.integers(0, 50, size=len(keys))
+    groups = GroupBy(keys)
+    group_dict = _group_dict(keys.tolist(), values.tolist())
+    assert groups.labels.tolist() == sorted(group_dict)
+    assert len(groups) == len(group_dict)
+    for (stat, func) in (('count', len), ('sum', sum), ('min', min),
+                         ('max', max), ('mean', numpy.mean),
+                         ('median', numpy.median)):
+        args = () if stat == 'count' else (values, )
+        result = groups.to_dict(getattr(groups, stat)(*args))
+        assert result == dict((key, func(vals)) for (key, vals) in\
+                              group_dict.items())
+    # Mind the order of the values within each group must be preserved.
+    assert groups.sorted_values(values).tolist() ==\
+        sum([group_dict[key] for key in sorted(group_dict)], [])
+
+
+def test_nan_and_categories():
+    """NaNs must be ignored in the mean, and categories counted per group.
+    """
+    groups = GroupBy(['x', 'y', 'x', 'y', 'z'])
+    mean = groups.mean([1., numpy.nan, 3., numpy.nan, 2.])
+    assert mean[0] == 2. and numpy.isnan(mean[1]) and mean[2] == 2.
+    assert groups.to_dict(groups.count([True, False, True, True, False])) ==\
+        {'x': 2, 'y': 1, 'z': 0}
+    counts = groups.count_by(['u', 'v', 'v', 'v', 'u'])
+    assert counts['u'].tolist() == [1, 0, 1]
+    assert counts['v'].tolist() == [1, 2, 0]
+    assert len(GroupBy([]).sum([])) == 0
+
+
+def test_product_statistics(prods):
+    """The grouped product statistics must match the per-author ones.
+    """
+    stats = product_statistics(prods, collab_threshold=5)
+    group_dict = _group_dict([prod.author_full_name for prod in prods],
+                             [prod.num_authors for prod in prods])
+    for (full_name, num_authors) in group_dict.items():
+        assert stats['num_collab_products'][full_name] ==\
+            len([num for num in num_authors if num > 5])
+        assert stats['min_num_authors'][full_name] == min(num_authors)
+        assert stats['median_num_authors'][full_name] ==\
+            numpy.median(num_authors)
+        assert stats['max_num_authors'][full_name] == max(num_authors)
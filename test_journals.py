@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Unit tests for the normalized journal-name index.
+"""
+
+
+import pytest
+
+from journals import JournalIndex, normalize
+
+
+IMPACT_FACTOR_DICT = {
+    'PHYSICAL REVIEW D': 4.368,
+    'JOURNAL OF PHYSICS A': 2.110,
+    'JOURNAL OF PHYSICS B': 1.917,
+    'JOURNAL OF PHYSICS: CONDENSED MATTER': 2.707,
+    'JOURNAL OF INSTRUMENTATION': 1.366,
+    'MONTHLY NOTICES OF THE ROYAL ASTRONOMICAL SOCIETY. LETTERS': 4.905,
+    'NATURE': 43.070,
+    'NATURE PHYSICS': 19.684,
+    'THE ASTROPHYSICAL JOURNAL': 5.580
+}
+
+
+@pytest.fixture(scope='module')
+def index():
+    """Build the journal index.
+    """
+    return JournalIndex(IMPACT_FACTOR_DICT)
+
+
+def test_normalize():
+    """Check the normalization of the journal names.
+    """
+    assert normalize('Physical Review. D') == 'PHYSICAL REVIEW D'
+    assert normalize('The Astrophysical Journal') == 'ASTROPHYSICAL JOURNAL'
+    assert normalize('Astronomy & Astrophysics') ==\
+        'ASTRONOMY AND ASTROPHYSICS'
+    assert normalize('Annales Henri Poincaré') == 'ANNALES HENRI POINCARE'
+
+
+def test_exact(index):
+    """Exact matches, after the normalization.
+    """
+    assert index.match('PHYSICAL REVIEW. D') == ('PHYSICAL REVIEW D', 1.)
+    assert index.get('Astrophysical Journal') == 5.580
+    assert index.get('NATURE: PHYSICS') == 19.684
+    assert index.get(None) is None
+
+
+def test_near_miss(index):
+    """Misspelled names are matched, but never across sections or extra
+    words.
+    """
+    name, similarity = index.match('JOURNAL OF PHYSICS CONDENSED MATTERS')
+    assert name == 'JOURNAL OF PHYSICS: CONDENSED MATTER'
+    assert similarity < 1.
+    assert index.match('JOURNAL OF PHYSICS C') is None
+    assert index.match('MONTHLY NOTICES OF THE ROYAL ASTRONOMICAL SOCIETY')\
+        is None
+
+
+def test_shortened(index):
+    """Matches through the qualifiers and the subtitles.
+    """
+    assert index.get('JOURNAL OF INSTRUMENTATION (PRINT)') == 1.366
+    assert index.get('PHYSICAL REVIEW D, PARTICLES, FIELDS, GRAVITATION, '
+                     'AND COSMOLOGY') == 4.368
+    assert index.get('JOURNAL OF PHYSICS: CONFERENCE SERIES') is None
+    assert index.get('NATURE: COMMUNICATIONS') is None
+
+
+def test_ambiguous():
+    """Names with the same normalized form and different values are never
+    resolved.
+    """
+    index = JournalIndex({'PHYSICAL REVIEW D': 4.368,
+                          'Physical Review. D': 4.394})
+    assert index.get('PHYSICAL REVIEW D') is None
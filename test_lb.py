@@ -18,6 +18,7 @@
 
 
 from rating import *
+from ratingcache import RatingCache
 
 db = load_db_prod()
 
@@ -27,8 +28,10 @@ print('Done, %d prodouct(s) selected.' % len(prods))
 sub_area = 'a'
 
 print('Calulating rating points...')
-rating = sum(prod.rating_points(sub_area) for prod in prods)
+cache = RatingCache()
+rating = sum(cache.rating_points(prod, sub_area) for prod in prods)
 print('Rating: %.3f' % rating)
+print(cache)
 
     
 
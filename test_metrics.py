@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Unit tests for the run metrics.
+"""
+
+
+import json
+
+import pytest
+
+from metrics import RunMetrics
+
+
+def test_phases():
+    """Phases must be timed and counted, even when they fail.
+    """
+    metrics = RunMetrics('test')
+    with metrics.phase('load') as span:
+        span.count(10)
+        span.count(2, counter='duplicates')
+        span.count(5)
+    with pytest.raises(RuntimeError):
+        with metrics.phase('rate'):
+            raise RuntimeError('Boom')
+    assert [span.name for span in metrics.spans] == ['load', 'rate']
+    assert all(span.elapsed >= 0. for span in metrics.spans)
+    assert sum(span.elapsed for span in metrics.spans) <= metrics.total()
+    assert metrics.spans[0].record() == {'name': 'load',
+                                         'elapsed': metrics.spans[0].elapsed,
+                                         'num_items': 15, 'duplicates': 2}
+
+
+def test_write(tmp_path):
+    """Each run must be appended to the metrics file as a JSON record.
+    """
+    file_path = str(tmp_path / 'metrics.jsonl')
+    for i in range(2):
+        metrics = RunMetrics('test')
+        with metrics.phase('load') as span:
+            span.count(i)
+        metrics.summary()
+        metrics.write(file_path, num_docents=i)
+    with open(file_path) as input_file:
+        records = [json.loads(line) for line in input_file]
+    assert [record['num_docents'] for record in records] == [0, 1]
+    assert [record['phases'][0]['num_items'] for record in records] == [0, 1]
+    assert all(record['run'] == 'test' for record in records)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Unit tests for the data-quality pipeline.
+"""
+
+
+import pytest
+
+import qa
+import readers
+import synthetic
+from columnar import ColumnarProductDatabase
+from rating import ProductDatabase
+
+
+@pytest.fixture(scope='module')
+def prod_file_path(tmp_path_factory):
+    """Generate a small synthetic product database.
+    """
+    folder_path = tmp_path_factory.mktemp('qa')
+    prod_file_path = str(folder_path / 'db_prodotti.xlsx')
+    pers_file_path = str(folder_path / 'db_docenti.xlsx')
+    synthetic.generate(prod_file_path, pers_file_path, num_products=300,
+                       num_docents=10, num_duplicates=5)
+    return prod_file_path
+
+
+class CountingCheck(qa.Check):
+
+    """Check recording the number of products it gets to see.
+    """
+
+    NAME = 'Counting'
+    PUB_TYPES = frozenset([qa.JOURNAL_PUB_TYPE])
+    FIELDS = ('handle', )
+
+    def process(self, prod):
+        """Overloaded method.
+        """
+        self.add_row([prod.handle])
+
+
+
+def test_author_list_errors():
+    """Check the problems found in a few author strings.
+    """
+    assert qa.author_list_errors('Rossi M.; Bianchi A.', 2) == []
+    assert qa.author_list_errors('Rossi M.; Bianchi A.', 3) ==\
+        ['split mismatch (2)']
+    assert qa.author_list_errors('Rossi M.; Bianchi A.; ET AL.', 3) ==\
+        ['contains "et al"']
+    assert qa.author_list_errors('LAT Collaboration; Rossi M.', 2) ==\
+        ['collab']
+    assert qa.author_list_errors('LAT Collaboration; Rossi M.', 2,
+                                 collab_author_threshold=2) == []
+
+
+def test_register():
+    """Checks must be registered only once, and declare their fields.
+    """
+    pipeline = qa.QAPipeline([qa.ErrataCheck()])
+    with pytest.raises(ValueError):
+        pipeline.register(qa.ErrataCheck())
+    pipeline.register(CountingCheck())
+    assert pipeline.fields() == ['author_surname', 'handle', 'pub_type',
+                                 'row_index', 'title']
+    pipeline.register(qa.Check())
+    assert pipeline.fields() is None
+
+
+def test_single_pass(prod_file_path):
+    """The checks must see exactly the products of the types they accept,
+    and report the same rows as a plain filter.
+    """
+    db_prod = ProductDatabase(prod_file_path)
+    counting = CountingCheck()
+    pipeline = qa.QAPipeline()
+    pipeline.register(counting)
+    pipeline.run(db_prod)
+    assert counting.rows == [[prod.handle] for prod in db_prod if\
+                             prod.pub_type == qa.JOURNAL_PUB_TYPE]
+    (missing_doi, ) = [check for check in pipeline.checks if\
+                       isinstance(check, qa.MissingDoiCheck)]
+    assert len(missing_doi.rows) > 0
+    assert [row[0] for row in missing_doi.rows] ==\
+        [prod.handle for prod in db_prod if prod.doi is None and\
+         prod.pub_type == qa.JOURNAL_PUB_TYPE]
+
+
+def test_storage_engines(prod_file_path, tmp_path):
+    """The checks must yield the same results for both the storage engines.
+    """
+    rows = {}
+    for db in (ProductDatabase(prod_file_path),
+               ColumnarProductDatabase.from_file(prod_file_path)):
+        pipeline = qa.QAPipeline()
+        pipeline.run(db)
+        rows[db.__class__] = [check.rows for check in pipeline.checks]
+    assert rows[ColumnarProductDatabase] == rows[ProductDatabase]
+    file_path = str(tmp_path / 'qa.xlsx')
+    pipeline.write(file_path)
+    for (i, check) in enumerate(pipeline.checks):
+        reader = readers.open_reader(file_path, i)
+        assert len(list(reader.rows([0]))) == len(check.rows)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Unit tests for the predicate query engine.
+"""
+
+
+import pytest
+
+import query
+import synthetic
+from columnar import ColumnarProductDatabase
+from rating import ProductDatabase
+
+
+"""Queries to be tested, along with the equivalent plain Python filters.
+"""
+QUERIES = [
+    ({'year__ge': 2018, 'num_authors__lt': 10},
+     lambda prod: prod.year >= 2018 and prod.num_authors < 10),
+    ({'pub_type__in': ['4.1 Contributo in Atti di convegno',
+                       '3.1 Monografia o trattato scientifico']},
+     lambda prod: prod.pub_type in ('4.1 Contributo in Atti di convegno',
+                                    '3.1 Monografia o trattato scientifico')),
+    ({'title__icontains': 'the', 'journal__isnull': False},
+     lambda prod: 'the' in prod.title.lower() and prod.journal is not None),
+    ({'journal__startswith': 'JOURNAL OF', 'wos_jif__gt': 3.},
+     lambda prod: prod.journal is not None and\
+     prod.journal.startswith('JOURNAL OF') and prod.wos_jif is not None and\
+     prod.wos_jif > 3.),
+    ({'year__ne': 2019, 'valid': True},
+     lambda prod: prod.year != 2019 and prod.valid),
+    ({'doi__isnull': True}, lambda prod: prod.doi is None)
+]
+
+
+@pytest.fixture(scope='module')
+def prod_file_path(tmp_path_factory):
+    """Generate a small synthetic product database.
+    """
+    folder_path = tmp_path_factory.mktemp('query')
+    prod_file_path = str(folder_path / 'db_prodotti.xlsx')
+    pers_file_path = str(folder_path / 'db_docenti.xlsx')
+    synthetic.generate(prod_file_path, pers_file_path, num_products=300,
+                       num_docents=10, num_duplicates=5)
+    return prod_file_path
+
+
+def test_parse():
+    """Check the parsing of the keyword arguments.
+    """
+    pred = query.Predicate.from_keyword('title__icontains', 'Fermi')
+    assert (pred.attr, pred.op, pred.value) == ('title', 'icontains', 'fermi')
+    pred = query.Predicate.from_keyword('author_full_name', 'BALDINI LUCA')
+    assert (pred.attr, pred.op) == ('author_full_name', 'eq')
+    with pytest.raises(ValueError):
+        query.Predicate('year', 'between', (2016, 2019))
+
+
+def test_plan():
+    """Indexed predicates must come first, the others sorted by selectivity.
+    """
+    index = {2019: [0, 2], 2018: [1]}
+    predicates = query.parse_predicates(title__icontains='x', year=2019,
+                                        num_authors__gt=3)
+    indexed, residual = query.plan(predicates, lambda attr: index if\
+                                   attr == 'year' else None)
+    assert indexed == [[0, 2]]
+    assert [pred.op for pred in residual] == ['icontains', 'gt']
+
+
+def test_queries(prod_file_path):
+    """The queries must match the plain Python filters, for both the
+    storage engines.
+    """
+    prods = ProductDatabase(prod_file_path)
+    columnar = ColumnarProductDatabase.from_file(prod_file_path)
+    for (kwargs, accept) in QUERIES:
+        expected = [prod.row_index for prod in prods if accept(prod)]
+        assert len(expected) > 0
+        assert [prod.row_index for prod in prods.query(True, **kwargs)] ==\
+            expected
+        assert columnar.query(True, **kwargs).values('row_index') == expected
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Unit tests for the selection machinery of the rating module.
+"""
+
+
+import shutil
+
+import pytest
+
+import readers
+import synthetic
+from rating import Product, ProductDatabase, _parse_rows, _split_rows
+
+
+@pytest.fixture(scope='module')
+def prod_file_path(tmp_path_factory):
+    """Generate a small synthetic product database.
+    """
+    folder_path = tmp_path_factory.mktemp('rating')
+    prod_file_path = str(folder_path / 'db_prodotti.xlsx')
+    pers_file_path = str(folder_path / 'db_docenti.xlsx')
+    synthetic.generate(prod_file_path, pers_file_path, num_products=300,
+                       num_docents=10, num_duplicates=5)
+    return prod_file_path
+
+
+@pytest.fixture
+def db_prod(prod_file_path):
+    """Load a fresh copy of the product database.
+    """
+    return ProductDatabase(prod_file_path)
+
+
+def test_select_vs_scan(db_prod):
+    """The indexed selections must match a plain linear scan.
+    """
+    full_name = db_prod[0].author_full_name
+    for kwargs in ({'author_full_name': full_name}, {'year': 2017},
+                   {'author_full_name': full_name, 'year': 2017},
+                   {'journal': None}, {'year': 1900}):
+        assert db_prod.select_positions(**kwargs) == db_prod._scan(**kwargs)
+
+
+def test_select_positions_copy(db_prod):
+    """The positions returned must not be the internal index lists.
+    """
+    positions = db_prod.select_positions(year=2017)
+    positions.clear()
+    assert db_prod.select_positions(year=2017) == db_prod._scan(year=2017)
+
+
+def test_invalidation(db_prod):
+    """The indexes must follow the changes to the database.
+    """
+    num_valid = len(db_prod.select(True, valid=True))
+    assert num_valid == len(db_prod)
+    db_prod[0].valid = False
+    db_prod.invalidate_indexes()
+    assert len(db_prod.select(True, valid=True)) == num_valid - 1
+    db_prod.pop()
+    assert len(db_prod.select(True, valid=True)) == num_valid - 2
+    db_prod.append(db_prod[0])
+    assert len(db_prod.select(True, valid=False)) == 2
+
+
+def test_group_by_vs_select(db_prod):
+    """A single-pass group-by must yield the same partition as a selection
+    for each value of the attribute.
+    """
+    db_prod[1].valid = False
+    db_prod.invalidate_indexes()
+    groups = db_prod.group_by('author_full_name', valid=True)
+    full_names = set(prod.author_full_name for prod in db_prod)
+    assert set(groups) <= full_names
+    for full_name in full_names:
+        selection = db_prod.select(True, author_full_name=full_name,
+                                   valid=True)
+        group = groups.get(full_name, [])
+        assert [prod.row_index for prod in group] ==\
+            [prod.row_index for prod in selection]
+
+
+def test_parallel_parsing(prod_file_path, tmp_path):
+    """The parallel parsing must yield the same entries as the serial one.
+    """
+    entries = {}
+    for num_processes in (None, 2):
+        # Mind we need a fresh copy of the file, for the cache not to kick in.
+        file_path = str(tmp_path / ('db_prodotti_%s.xlsx' % num_processes))
+        shutil.copy(prod_file_path, file_path)
+        db_prod = ProductDatabase(file_path, num_processes=num_processes)
+        entries[num_processes] = [prod.__dict__ for prod in db_prod]
+    assert entries[2] == entries[None]
+
+
+def test_parse_chunks(prod_file_path):
+    """Rows parsed in chunks must match the rows parsed one at a time.
+    """
+    columns = Product.columns()
+    rows = list(readers.open_reader(prod_file_path).rows(columns))
+    chunks = list(_split_rows(Product, rows, 7))
+    assert len(chunks) == (len(rows) + 6) // 7
+    assert sum([chunk_rows for (_, _, chunk_rows) in chunks], []) == rows
+    values = []
+    for chunk in chunks:
+        attrs, chunk_values = _parse_rows(chunk)
+        values += [dict(zip(attrs, vals)) for vals in chunk_values]
+    expected = [Product(row, i).__dict__ for (i, row) in enumerate(rows, 2)]
+    for (vals, prod_dict) in zip(values, expected):
+        assert {attr: vals[attr] for attr in prod_dict} == prod_dict
+    assert len(values) == len(expected)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Unit tests for the rating cache.
+"""
+
+
+import pytest
+
+import synthetic
+from rating import Product, ProductDatabase
+from ratingcache import RatingCache
+
+
+@pytest.fixture(scope='module')
+def prods(tmp_path_factory):
+    """Generate and load a small synthetic product database, and return the
+    list of products that can be rated programmatically.
+    """
+    folder_path = tmp_path_factory.mktemp('ratingcache')
+    prod_file_path = str(folder_path / 'db_prodotti.xlsx')
+    pers_file_path = str(folder_path / 'db_docenti.xlsx')
+    department = synthetic.generate(prod_file_path, pers_file_path,
+                                    num_products=300, num_docents=10,
+                                    num_duplicates=5)
+    lookup_table = department.lookup_table()
+    return [prod for prod in ProductDatabase(prod_file_path) if\
+            prod.handle not in lookup_table]
+
+
+def test_cached_values(prods):
+    """The cached rating points must match the uncached ones.
+    """
+    cache = RatingCache()
+    for _ in range(2):
+        for prod in prods:
+            assert cache.rating_points(prod, 'b') == prod.rating_points('b')
+    assert cache.misses == len(set(cache.key(prod, 'b') for prod in prods))
+
+
+def test_eviction(prods):
+    """The cache must never grow beyond its maximum size.
+    """
+    cache = RatingCache(max_size=10)
+    for prod in prods:
+        cache.rating_points(prod, 'a')
+    assert len(cache) == 10
+
+
+def test_persistence(prods, tmp_path, monkeypatch):
+    """The cache must survive a save/load cycle, and be invalidated when the
+    rating logic changes.
+    """
+    file_path = str(tmp_path / 'rating_points.cache')
+    cache = RatingCache()
+    for prod in prods:
+        cache.rating_points(prod, 'c')
+    cache.save(file_path)
+    assert len(RatingCache(file_path=file_path)) == len(cache)
+    monkeypatch.setattr(Product, 'RATING_LOGIC_VERSION',
+                        Product.RATING_LOGIC_VERSION + 1)
+    assert len(RatingCache(file_path=file_path)) == 0
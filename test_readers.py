@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Unit tests for the reader backends.
+"""
+
+
+import pytest
+
+import readers
+import synthetic
+from rating import Product, ProductDatabase
+
+
+@pytest.fixture(scope='module')
+def file_paths(tmp_path_factory):
+    """Write the same synthetic product database in all the supported
+    formats, and return the dictionary backend -> file path.
+    """
+    folder_path = tmp_path_factory.mktemp('readers')
+    department = synthetic.SyntheticDepartment(num_products=200,
+                                               num_docents=8,
+                                               num_duplicates=3)
+    file_paths = {}
+    for (backend, ext) in (('xlrd', 'xls'), ('openpyxl', 'xlsx')):
+        file_paths[backend] = str(folder_path / ('db_prodotti.%s' % ext))
+        department.write_products(file_paths[backend])
+    # Mind the csv backend writes one file per worksheet.
+    department.write_products(str(folder_path / 'db_prodotti.csv'))
+    file_paths['csv'] = str(folder_path / 'db_prodotti_Prodotti.csv')
+    return file_paths
+
+
+def test_default_backend():
+    """Check the default backend for the different file types.
+    """
+    assert readers.default_backend('db_prodotti.xls') == 'xlrd'
+    assert readers.default_backend('db_prodotti.XLSX') == 'openpyxl'
+    assert readers.default_backend('db_prodotti.csv') == 'csv'
+
+
+def test_projection(file_paths):
+    """All the backends must honor the column projection, including the
+    columns beyond the last one in the file.
+    """
+    columns = [3, 0, 500]
+    for (backend, file_path) in file_paths.items():
+        reader = readers.open_reader(file_path, backend=backend)
+        rows = list(reader.rows(columns))
+        assert len(rows) == 200
+        assert all(len(row) == 3 and row[2] == '' for row in rows)
+
+
+def test_backends(file_paths):
+    """All the backends must yield the same products.
+    """
+    values = {}
+    for (backend, file_path) in file_paths.items():
+        values[backend] = [tuple(prod.__dict__[attr] for attr in\
+                                 Product.FIELD_DICT) for prod in\
+                           ProductDatabase(file_path, backend=backend)]
+    assert values['openpyxl'] == values['xlrd']
+    assert values['csv'] == values['xlrd']
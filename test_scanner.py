@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Unit tests for the multi-pattern scanner.
+"""
+
+
+import re
+
+import pytest
+
+from scanner import PatternScanner, split_count
+
+
+TEXTS = ['Baldini L.; Rossi M.; et al.', 'ATLAS Collaboration', '',
+         'Author: Bianchi G.', 'Fermi-LAT collab.; Verdi G.', 'et al et al']
+
+
+def test_literals():
+    """The literal patterns must be matched case-insensitively.
+    """
+    scanner = PatternScanner([('et al', 'et al'), ('collab', 'collab')])
+    for text in TEXTS:
+        expected = [name for name in ('et al', 'collab') if name in\
+                    text.lower()]
+        assert scanner.scan(text) == expected
+
+
+def test_shared_start():
+    """Regular expressions matching at the same position must all be
+    reported.
+    """
+    scanner = PatternScanner()
+    scanner.register('collab', r'collab\w*', regex=True)
+    scanner.register('collaboration', r'collaboration', regex=True)
+    scanner.register('atlas', r'\batlas\b', regex=True)
+    assert scanner.scan('ATLAS Collaboration') ==\
+        ['collab', 'collaboration', 'atlas']
+    assert scanner.scan('Fermi-LAT collab.') == ['collab']
+
+
+def test_regex_vs_search():
+    """Check the regular expressions against plain re.search() calls.
+    """
+    patterns = [('et al', r'et\.? al'), ('initials', r'\b[A-Z]\.\s*[A-Z]\.'),
+                ('colon', r':')]
+    scanner = PatternScanner()
+    for (name, pattern) in patterns:
+        scanner.register(name, pattern, regex=True)
+    for text in TEXTS:
+        expected = [name for (name, pattern) in patterns if\
+                    re.search(pattern, text, re.IGNORECASE)]
+        assert scanner.scan(text) == expected
+
+
+def test_duplicate_name():
+    """Pattern names must be unique.
+    """
+    scanner = PatternScanner([('et al', 'et al')])
+    with pytest.raises(ValueError):
+        scanner.register('et al', 'et al.', regex=True)
+
+
+def test_split_count():
+    """split_count() must match the length of the split list.
+    """
+    for text in TEXTS:
+        assert split_count(text) == len(text.split(';'))
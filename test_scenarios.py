@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Unit tests for the what-if scenario engine.
+"""
+
+
+import copy
+import types
+
+import numpy
+import pytest
+
+import synthetic
+from dump_rating import post_process
+from rating import DocentDatabase, ProductDatabase
+from scenarios import ScenarioEngine, rating_engine
+
+
+@pytest.fixture(scope='module')
+def department(tmp_path_factory):
+    """Generate a small synthetic department, and return a (department,
+    db_prod, db_pers) tuple.
+    """
+    folder_path = tmp_path_factory.mktemp('scenarios')
+    prod_file_path = str(folder_path / 'db_prodotti.xlsx')
+    pers_file_path = str(folder_path / 'db_docenti.xlsx')
+    department = synthetic.generate(prod_file_path, pers_file_path,
+                                    num_products=500, num_docents=15,
+                                    num_duplicates=5)
+    return department, ProductDatabase(prod_file_path),\
+        DocentDatabase(pers_file_path)
+
+
+def test_unknown_parameter():
+    """Misspelled scenario parameters must be rejected.
+    """
+    with pytest.raises(ValueError):
+        rating_engine({'name': 'typo', 'author_caps': 15.})
+
+
+def test_defaults(department):
+    """The default scenario must reproduce the plain rating logic.
+    """
+    department, db_prod, db_pers = department
+    lookup_table = department.lookup_table()
+    loa_scaling_dict = {db_pers[0].full_name: 0.5}
+    engine = ScenarioEngine(db_prod, db_pers, lookup_table, loa_scaling_dict,
+                            num_processes=1)
+    result = engine.run([{'name': 'default'}])
+    for (i, pers) in enumerate(db_pers):
+        prods = db_prod.select(True, author_full_name=pers.full_name)
+        rating = result.ratings[0][i]
+        if len(prods) < 2:
+            assert numpy.isnan(rating)
+            continue
+        expected = sum(prod.rating_points(pers.sub_area, lookup_table) for\
+                       prod in prods)
+        expected *= loa_scaling_dict.get(pers.full_name, 1.)
+        assert rating == expected
+
+
+def test_rankings(department):
+    """The rankings must follow the ratings within each sub-area.
+    """
+    department, db_prod, db_pers = department
+    engine = ScenarioEngine(db_prod, db_pers, department.lookup_table(),
+                            num_processes=1)
+    result = engine.run([{'name': 'default'}, {'name': 'author_cap_15',
+                                               'author_cap': 15.}])
+    for (ratings, rankings) in zip(result.ratings, result.rankings):
+        for sub_area in set(result.sub_areas):
+            mask = (numpy.array(result.sub_areas) == sub_area) &\
+                   ~numpy.isnan(ratings)
+            order = numpy.argsort(rankings[mask])
+            assert numpy.all(numpy.diff(ratings[mask][order]) <= 0.)
+
+
+def test_post_process_if_fields(department):
+    """The manual impact factors must be set for all the fields requested.
+    """
+    department, db_prod, db_pers = department
+    missing = [journal for (journal, jif, j5yif) in department.journals if\
+               jif is None]
+    if_dict = dict((journal, 1.5) for journal in missing)
+    rating_module = types.SimpleNamespace(INVALID=[], IMPACT_FACTOR_DICT=if_dict)
+    prods = ProductDatabase()
+    prods.extend(copy.copy(prod) for prod in db_prod if\
+                 prod.journal in missing and\
+                 prod.pub_type == '1.1 Articolo in rivista')
+    assert len(prods) > 0
+    post_process(prods, rating_module=rating_module,
+                 if_fields=('wos_j5yif', 'wos_jif'))
+    for prod in prods:
+        assert prod.wos_j5yif == 1.5 and prod.wos_jif == 1.5
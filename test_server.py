@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Unit tests for the rating server.
+
+Mind these tests exercise the server-side state directly, without going
+through HTTP.
+"""
+
+
+import pickle
+
+import pytest
+
+import server
+import synthetic
+from dump_rating import _rating
+from rating import ProductDatabase
+
+
+@pytest.fixture
+def department(tmp_path):
+    """Generate a small synthetic department, and return the (department,
+    product file path, docent file path) tuple.
+    """
+    prod_file_path = str(tmp_path / 'db_prodotti.xlsx')
+    pers_file_path = str(tmp_path / 'db_docenti.xlsx')
+    department = synthetic.generate(prod_file_path, pers_file_path,
+                                    num_products=300, num_docents=10,
+                                    num_duplicates=5)
+    return department, prod_file_path, pers_file_path
+
+
+def _handles(payload):
+    """Return the handles in a serialized set of products.
+    """
+    return pickle.loads(payload)['handle']
+
+
+def test_parse_address():
+    """Check the parsing of the server address.
+    """
+    assert server.parse_address(8000) == (server.DEFAULT_HOST, 8000)
+    assert server.parse_address(':8000') == (server.DEFAULT_HOST, 8000)
+    assert server.parse_address('localhost:8000') == ('localhost', 8000)
+
+
+def test_operations(department):
+    """The operations must match the corresponding local calls.
+    """
+    department, prod_file_path, pers_file_path = department
+    state = server.RatingServer(prod_file_path, pers_file_path)
+    db_prod = ProductDatabase(prod_file_path)
+    with pytest.raises(ValueError):
+        state.handle('shutdown', {})
+    assert state.handle('ping', {})['num_products'] == len(db_prod)
+    assert _handles(state.handle('load_db_prod', {})) ==\
+        [prod.handle for prod in db_prod]
+    assert _handles(state.handle('select', {'year': 2017})) ==\
+        [prod.handle for prod in db_prod.select(True, year=2017)]
+    assert _handles(state.handle('query', {'year__ge': 2018})) ==\
+        [prod.handle for prod in db_prod.query(True, year__ge=2018)]
+    assert dict(state.handle('unique_values', {'field': 'year'})) ==\
+        db_prod.unique_values('year')
+    assert state.num_requests == 5
+
+
+def test_rating(department):
+    """The ratings must match the scalar rating of the same products.
+    """
+    department, prod_file_path, pers_file_path = department
+    state = server.RatingServer(prod_file_path, pers_file_path)
+    ratings = state.handle('rating', {})
+    prods_dict = state.rating_products()
+    assert len(ratings) > 0
+    for (full_name, rating) in ratings.items():
+        prods = prods_dict.get(full_name, [])
+        assert rating['num_products'] == len(prods)
+        if len(rating['unrateable']) > 0:
+            continue
+        expected = sum(prod.rating_points(rating['sub_area'],
+                                          _rating.RATING_DICT) for\
+                       prod in prods)
+        expected *= _rating.LOA_SCALING_DICT.get(full_name, 1.)
+        assert rating['rating'] == expected
+
+
+def test_refresh(department):
+    """The server must pick up the changes to the product database.
+    """
+    department, prod_file_path, pers_file_path = department
+    state = server.RatingServer(prod_file_path, pers_file_path)
+    num_products = state.handle('ping', {})['num_products']
+    department.products.pop()
+    department.write_products(prod_file_path)
+    assert state.handle('ping', {})['num_products'] == num_products - 1
+    assert len(_handles(state.handle('load_db_prod', {}))) ==\
+        num_products - 1
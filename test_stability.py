@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Unit tests for the Monte Carlo ranking-stability analysis.
+"""
+
+
+import numpy
+import pytest
+
+import synthetic
+from rating import DocentDatabase, ProductDatabase
+from scenarios import ScenarioInputs
+from stability import RankingStability, band_points
+
+
+@pytest.fixture(scope='module')
+def department(tmp_path_factory):
+    """Generate a small synthetic department, and return a (department,
+    db_prod, db_pers) tuple.
+    """
+    folder_path = tmp_path_factory.mktemp('stability')
+    prod_file_path = str(folder_path / 'db_prodotti.xlsx')
+    pers_file_path = str(folder_path / 'db_docenti.xlsx')
+    department = synthetic.generate(prod_file_path, pers_file_path,
+                                    num_products=500, num_docents=15,
+                                    num_duplicates=5)
+    return department, ProductDatabase(prod_file_path),\
+        DocentDatabase(pers_file_path)
+
+
+def _loa_scaling_dict(department):
+    """Return a set of leave-of-absence factors, with one docent scaled up
+    enough to change its ranking, and one scaled down.
+    """
+    department, db_prod, db_pers = department
+    inputs = ScenarioInputs(db_prod, db_pers, department.lookup_table())
+    ratings = inputs.evaluate({})[0]
+    ranked = numpy.nonzero(~numpy.isnan(ratings))[0]
+    low = ranked[numpy.argmin(ratings[ranked])]
+    high = ranked[numpy.argmax(ratings[ranked])]
+    return {inputs.full_names[low]: 2. * ratings[high] / ratings[low],
+            inputs.full_names[high]: 0.9}
+
+
+def _inputs(department, loa_scaling_dict={}):
+    """Return the ScenarioInputs object for the synthetic department.
+    """
+    department, db_prod, db_pers = department
+    return ScenarioInputs(db_prod, db_pers, department.lookup_table(),
+                          loa_scaling_dict)
+
+
+def test_band_points():
+    """Check the band points against a simple example.
+    """
+    points = band_points(numpy.arange(10), 10)
+    assert points.tolist() == [4, 4, 4, 3, 3, 2, 2, 2, 1, 1]
+    assert band_points([-1, 0], 1).tolist() == [0, 4]
+
+
+def test_zero_noise(department):
+    """Replicas with no perturbation must reproduce the nominal ranking.
+    """
+    inputs = _inputs(department, _loa_scaling_dict(department))
+    analysis = RankingStability(inputs, if_sigma=0., drop_probability=0.,
+                                loa_sigma=0., seed=1)
+    result = analysis.run(20, batch_size=7)
+    ranked = result.nominal_rankings >= 0
+    assert numpy.array_equal(result.mean_ranks()[ranked],
+                             result.nominal_rankings[ranked])
+    assert (result.rank_counts.sum(axis=1)[ranked] == 20).all()
+    assert (result.band_counts.sum(axis=1) == 20).all()
+
+
+def test_small_loa_sigma(department):
+    """A tiny smearing of the leave-of-absence factors (including those
+    larger than 1) must not move the rankings.
+    """
+    loa_scaling_dict = _loa_scaling_dict(department)
+    inputs = _inputs(department, loa_scaling_dict)
+    nominal = inputs.evaluate({})[1]
+    assert not numpy.array_equal(nominal, _inputs(department).evaluate({})[1])
+    analysis = RankingStability(inputs, if_sigma=0., drop_probability=0.,
+                                loa_sigma=1.e-6, seed=1)
+    result = analysis.run(50)
+    ranked = nominal >= 0
+    assert numpy.array_equal(result.mean_ranks()[ranked], nominal[ranked])
+
+
+def test_no_loa_scaling(department):
+    """The leave-of-absence factors must be ignored altogether, smearing
+    included, when the scenario says so.
+    """
+    inputs = _inputs(department, _loa_scaling_dict(department))
+    scenario = {'loa_scaling': False}
+    nominal = inputs.evaluate(scenario)[1]
+    analysis = RankingStability(inputs, scenario, if_sigma=0.,
+                                drop_probability=0., loa_sigma=0.5, seed=1)
+    result = analysis.run(50)
+    ranked = nominal >= 0
+    assert numpy.array_equal(result.mean_ranks()[ranked], nominal[ranked])
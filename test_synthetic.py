@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Unit tests for the synthetic data generator.
+"""
+
+
+import synthetic
+from rating import DocentDatabase, ProductDatabase
+
+
+def test_determinism():
+    """The generation must be fully determined by the seed.
+    """
+    kwargs = dict(num_products=200, num_docents=8, num_duplicates=3)
+    department = synthetic.SyntheticDepartment(**kwargs)
+    assert synthetic.SyntheticDepartment(**kwargs).products ==\
+        department.products
+    assert synthetic.SyntheticDepartment(seed=2, **kwargs).products !=\
+        department.products
+
+
+def test_duplicates():
+    """Check the number of products, and the duplicates injected (i.e.,
+    identical products with different handles).
+    """
+    department = synthetic.SyntheticDepartment(num_products=200,
+                                               num_docents=8,
+                                               num_duplicates=3)
+    prods = department.products
+    assert len(prods) == 200
+    keys = [tuple(sorted((key, val) for (key, val) in prod.items() if\
+                         key != 'handle')) for prod in prods]
+    assert len(keys) - len(set(keys)) >= 3
+
+
+def test_write(tmp_path):
+    """The databases written to file must load back with all the products
+    and docents.
+    """
+    prod_file_path = str(tmp_path / 'db_prodotti.xlsx')
+    pers_file_path = str(tmp_path / 'db_docenti.xlsx')
+    department = synthetic.generate(prod_file_path, pers_file_path,
+                                    num_products=200, num_docents=8,
+                                    num_duplicates=3)
+    db_prod = ProductDatabase(prod_file_path)
+    assert [prod.handle for prod in db_prod] ==\
+        [prod['handle'] for prod in department.products]
+    assert len(DocentDatabase(pers_file_path)) == len(department.docents)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Unit tests for the writer backends.
+"""
+
+
+import csv
+import os
+
+import pytest
+
+import readers
+import writers
+from rating import ExcelTableDump
+
+
+ROWS = [['BALDINI LUCA', 2019, 1.5], ['ROSSI MARIO', None, 0.25]]
+COL_NAMES = ['Nome', 'Anno', 'Punti']
+
+
+def test_sheet_names():
+    """Invalid and duplicate worksheet names must be rejected.
+    """
+    writers.check_sheet_name('Sottoarea a')
+    for name in ('', 'x' * 32, 'a/b', 'a:b'):
+        with pytest.raises(ValueError):
+            writers.check_sheet_name(name)
+    with pytest.raises(ValueError):
+        writers.check_sheet_name('sottoarea A', ['Sottoarea a'])
+
+
+def test_xlsx_roundtrip(tmp_path):
+    """Write a table with the streaming xlsx backend and read it back.
+    """
+    file_path = str(tmp_path / 'table.xlsx')
+    table = ExcelTableDump()
+    table.add_worksheet('Sheet', COL_NAMES, ROWS)
+    table.write(file_path)
+    reader = readers.open_reader(file_path)
+    rows = [tuple('' if val is None else val for val in row) for row in ROWS]
+    assert list(reader.rows([0, 1, 2])) == rows
+
+
+def test_csv_collisions(tmp_path):
+    """Worksheet names colliding in the file names must not overwrite each
+    other.
+    """
+    file_path = str(tmp_path / 'table.csv')
+    writer = writers.open_writer(file_path)
+    writer.write_sheet('Sottoarea a', COL_NAMES, ROWS[:1])
+    writer.write_sheet('Sottoarea_a', COL_NAMES, ROWS[1:])
+    writer.close()
+    assert len(set(writer.file_paths)) == 2
+    for (path, row) in zip(writer.file_paths, ROWS):
+        with open(path, newline='', encoding='utf-8') as input_file:
+            content = list(csv.reader(input_file))
+        assert content[1][0] == row[0]
+
+
+def test_abort(tmp_path):
+    """A failure half-way must not leave partial output behind.
+    """
+    file_path = str(tmp_path / 'table.csv')
+
+    def rows():
+        yield ROWS[0]
+        raise RuntimeError('Boom')
+
+    table = ExcelTableDump()
+    table.add_worksheet('Sheet', COL_NAMES, rows())
+    with pytest.raises(RuntimeError):
+        table.write(file_path)
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_default_backend():
+    """Check the default backend for the different file types.
+    """
+    assert writers.default_backend('table.xls') == 'xlwt'
+    assert writers.default_backend('table.XLSX') == 'xlsx'
+    assert writers.default_backend('table.pq') == 'parquet'
+    assert writers.default_backend('table.feather') == 'arrow'
+
+
+@pytest.mark.parametrize('backend', ['parquet', 'arrow'])
+def test_arrow_roundtrip(tmp_path, backend):
+    """Write a table with the pyarrow-based backends and read it back,
+    including a column mixing numbers and strings, and a short row.
+    """
+    pyarrow = pytest.importorskip('pyarrow')
+    import pyarrow.ipc
+    import pyarrow.parquet
+    file_path = str(tmp_path / ('table.%s' % backend))
+    rows = ROWS + [['BIANCHI ANNA', 'n/a']]
+    table = ExcelTableDump()
+    table.add_worksheet('Sheet', COL_NAMES, rows)
+    table.write(file_path, backend=backend)
+    (sheet_file_path, ) = os.listdir(str(tmp_path))
+    sheet_file_path = str(tmp_path / sheet_file_path)
+    if backend == 'parquet':
+        content = pyarrow.parquet.read_table(sheet_file_path)
+    else:
+        content = pyarrow.ipc.open_file(sheet_file_path).read_all()
+    assert content.column_names == COL_NAMES
+    assert content.column('Nome').to_pylist() ==\
+        ['BALDINI LUCA', 'ROSSI MARIO', 'BIANCHI ANNA']
+    assert content.column('Anno').to_pylist() == ['2019', None, 'n/a']
+    assert content.column('Punti').to_pylist() == [1.5, 0.25, None]
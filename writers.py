@@ -0,0 +1,539 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019, Luca Baldini.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Pluggable table writer backends.
+
+This is the output counterpart of the readers module: all the writers
+implement the same, minimal interface, i.e., a write_sheet() method taking
+the name of a worksheet, the list of column names and an iterable of rows,
+and a close() method to be called when all the worksheets have been written.
+If anything goes wrong along the way, the abort() method closes all the open
+files and removes the partial output.
+
+Since the streaming backends do not rely on the spreadsheet libraries, the
+worksheet names are validated here (see check_sheet_name()) with the same
+rules enforced by excel: at most 31 characters, none of []:*?/\\, and no
+(case-insensitive) duplicates.
+Rows are consumed lazily, one at a time, so that the backends that can
+stream the output to disk never hold the whole table in memory.
+
+The actual spreadsheet libraries are only imported when the corresponding
+backend is used (and pyarrow, which is needed for the Parquet and Arrow
+backends, is entirely optional).
+"""
+
+
+import csv
+import numbers
+import os
+
+
+"""Maximum length of a worksheet name.
+"""
+MAX_SHEET_NAME_LENGTH = 31
+
+"""Characters not allowed in a worksheet name.
+"""
+FORBIDDEN_SHEET_NAME_CHARS = '[]:*?/\\'
+
+
+def check_sheet_name(name, sheet_names=()):
+    """Make sure that a worksheet name is valid (and not a case-insensitive
+    duplicate of any of a list of existing names), and raise a ValueError
+    otherwise.
+    """
+    if len(name) == 0 or len(name) > MAX_SHEET_NAME_LENGTH:
+        raise ValueError('Invalid worksheet name "%s" (must be 1 to %d '
+                         'characters long)' % (name, MAX_SHEET_NAME_LENGTH))
+    forbidden = [c for c in name if c in FORBIDDEN_SHEET_NAME_CHARS]
+    if forbidden:
+        raise ValueError('Invalid worksheet name "%s" (forbidden character '
+                         '%s)' % (name, ', '.join(forbidden)))
+    if name.lower() in [other.lower() for other in sheet_names]:
+        raise ValueError('Duplicate worksheet name "%s"' % name)
+
+
+def _remove(file_path):
+    """Remove a (partial) output file, if it exists.
+    """
+    try:
+        os.remove(file_path)
+    except OSError:
+        pass
+
+
+
+class TableWriter(object):
+
+    """Base class for all the writer backends.
+    """
+
+    NAME = None
+
+    def __init__(self, file_path):
+        """Constructor.
+        """
+        self.file_path = file_path
+
+    def write_sheet(self, name, col_names, rows):
+        """Do-nothing method to be reimplemented in derived classes.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Finalize the output file.
+        """
+        pass
+
+    def abort(self):
+        """Close all the open files and remove the partial output, after a
+        failure in write_sheet() or close().
+        """
+        pass
+
+    def __str__(self):
+        """String formatting.
+        """
+        return '%s writer for %s' % (self.NAME, self.file_path)
+
+
+
+class XlwtWriter(TableWriter):
+
+    """Writer backend for xls files, based on xlwt (the original one).
+
+    Mind that xlwt keeps the whole workbook in memory until the very end, and
+    that the xls format is limited to 65536 rows per worksheet.
+    """
+
+    NAME = 'xlwt'
+
+    def __init__(self, file_path):
+        """Constructor.
+        """
+        TableWriter.__init__(self, file_path)
+        import xlwt
+        self.workbook = xlwt.Workbook()
+        self._closing = False
+
+    def write_sheet(self, name, col_names, rows):
+        """Overloaded method.
+        """
+        worksheet = self.workbook.add_sheet(name)
+        for col, col_name in enumerate(col_names):
+            worksheet.write(0, col, col_name)
+        for i, row in enumerate(rows):
+            for j, val in enumerate(row):
+                worksheet.write(i + 1, j, val)
+
+    def close(self):
+        """Overloaded method.
+        """
+        self._closing = True
+        self.workbook.save(self.file_path)
+
+    def abort(self):
+        """Overloaded method.
+
+        Mind nothing is written to disk before close(), and we only remove
+        the output file if the latter has been called, so as not to remove an
+        existing file we never touched.
+        """
+        if self._closing:
+            _remove(self.file_path)
+
+
+
+"""Translation table stripping the characters that are not allowed in xml.
+"""
+_XML_ILLEGAL_CHARS = dict.fromkeys(list(range(0x00, 0x09)) + [0x0b, 0x0c] +\
+                                   list(range(0x0e, 0x20)) + [0xfffe, 0xffff])
+
+
+def _escape(text):
+    """Escape a string for use in xml text and (double-quoted) attributes.
+
+    Mind we don't use xml.sax.saxutils for this, since importing it pulls in
+    a good chunk of the urllib package, which is relatively slow.
+    """
+    return text.replace('&', '&amp;').replace('<', '&lt;').\
+        replace('>', '&gt;').replace('"', '&quot;')
+
+
+def _prepend(first, rows):
+    """Iterate over a given row, followed by all the rows in an iterable.
+    """
+    yield first
+    for row in rows:
+        yield row
+
+
+def _column_letters(col):
+    """Convert a (zero-based) column index into the excel column letters.
+    """
+    letters = ''
+    col += 1
+    while col > 0:
+        col, rem = divmod(col - 1, 26)
+        letters = chr(ord('A') + rem) + letters
+    return letters
+
+
+def _xml_cell(ref, val):
+    """Return the xml snippet for a single cell of an xlsx worksheet.
+
+    Strings are written inline, rather than in the shared-string table, so
+    that no state needs to be kept across rows. Empty cells (and NaNs, which
+    the format cannot represent) are not written at all.
+    """
+    if val is None:
+        return ''
+    if isinstance(val, bool):
+        return '<c r="%s" t="b"><v>%d</v></c>' % (ref, val)
+    if isinstance(val, numbers.Integral):
+        return '<c r="%s"><v>%d</v></c>' % (ref, val)
+    if isinstance(val, numbers.Real):
+        val = float(val)
+        if val != val or val in (float('inf'), float('-inf')):
+            return ''
+        return '<c r="%s"><v>%r</v></c>' % (ref, val)
+    val = str(val).translate(_XML_ILLEGAL_CHARS)
+    return '<c r="%s" t="inlineStr"><is><t xml:space="preserve">%s</t></is>'\
+        '</c>' % (ref, _escape(val))
+
+
+# Templates for the static parts of the xlsx package.
+
+_XLSX_CONTENT_TYPES = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>
+%s
+</Types>'''
+
+_XLSX_SHEET_CONTENT_TYPE = '<Override PartName="/xl/worksheets/sheet%d.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+
+_XLSX_RELS = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>'''
+
+_XLSX_WORKBOOK = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets>
+%s
+</sheets>
+</workbook>'''
+
+_XLSX_WORKBOOK_SHEET = '<sheet name="%s" sheetId="%d" r:id="rId%d"/>'
+
+_XLSX_WORKBOOK_RELS = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+%s
+</Relationships>'''
+
+_XLSX_WORKBOOK_REL = '<Relationship Id="rId%d" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/%s" Target="%s"/>'
+
+_XLSX_STYLES = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>
+<fills count="1"><fill><patternFill patternType="none"/></fill></fills>
+<borders count="1"><border/></borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>
+<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>
+</styleSheet>'''
+
+_XLSX_SHEET_HEADER = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<sheetData>
+'''
+
+_XLSX_SHEET_FOOTER = '''</sheetData>
+</worksheet>'''
+
+
+
+class XlsxStreamWriter(TableWriter):
+
+    """Streaming writer backend for xlsx files.
+
+    This does not depend on any external library: each worksheet is written
+    directly as a compressed xml stream into the output zip archive, one row
+    at a time, so that the memory footprint does not depend on the size of
+    the table. The xlsx format allows for up to 1048576 rows per worksheet.
+    """
+
+    NAME = 'xlsx'
+    MAX_NUM_ROWS = 1048576
+
+    def __init__(self, file_path):
+        """Constructor.
+        """
+        TableWriter.__init__(self, file_path)
+        import zipfile
+        self.archive = zipfile.ZipFile(file_path, 'w', zipfile.ZIP_DEFLATED)
+        self.sheet_names = []
+
+    def write_sheet(self, name, col_names, rows):
+        """Overloaded method.
+        """
+        check_sheet_name(name, self.sheet_names)
+        self.sheet_names.append(name)
+        sheet_path = 'xl/worksheets/sheet%d.xml' % len(self.sheet_names)
+        letters = []
+        with self.archive.open(sheet_path, 'w', force_zip64=True) as stream:
+            stream.write(_XLSX_SHEET_HEADER.encode('utf-8'))
+            for (i, row) in enumerate(_prepend(col_names, rows), 1):
+                if i > self.MAX_NUM_ROWS:
+                    raise RuntimeError('Too many rows for worksheet "%s"' %\
+                                       name)
+                row = list(row)
+                while len(letters) < len(row):
+                    letters.append(_column_letters(len(letters)))
+                cells = ''.join(_xml_cell('%s%d' % (letters[j], i), val) for\
+                                (j, val) in enumerate(row))
+                stream.write(('<row r="%d">%s</row>\n' % (i, cells)).\
+                             encode('utf-8'))
+            stream.write(_XLSX_SHEET_FOOTER.encode('utf-8'))
+
+    def close(self):
+        """Overloaded method.
+        """
+        num_sheets = len(self.sheet_names)
+        content_types = '\n'.join(_XLSX_SHEET_CONTENT_TYPE % (i + 1) for\
+                                  i in range(num_sheets))
+        sheets = '\n'.join(_XLSX_WORKBOOK_SHEET % (_escape(name), i + 1,
+                                                   i + 1) for\
+                           (i, name) in enumerate(self.sheet_names))
+        rels = [_XLSX_WORKBOOK_REL % (i + 1, 'worksheet',
+                                      'worksheets/sheet%d.xml' % (i + 1)) for\
+                i in range(num_sheets)]
+        rels.append(_XLSX_WORKBOOK_REL % (num_sheets + 1, 'styles',
+                                          'styles.xml'))
+        self.archive.writestr('[Content_Types].xml',
+                              _XLSX_CONTENT_TYPES % content_types)
+        self.archive.writestr('_rels/.rels', _XLSX_RELS)
+        self.archive.writestr('xl/workbook.xml', _XLSX_WORKBOOK % sheets)
+        self.archive.writestr('xl/_rels/workbook.xml.rels',
+                              _XLSX_WORKBOOK_RELS % '\n'.join(rels))
+        self.archive.writestr('xl/styles.xml', _XLSX_STYLES)
+        self.archive.close()
+
+    def abort(self):
+        """Overloaded method.
+        """
+        try:
+            self.archive.close()
+        finally:
+            _remove(self.file_path)
+
+
+
+class MultiFileWriter(TableWriter):
+
+    """Base class for the backends writing each worksheet in a separate file.
+
+    The path to each file is obtained by appending the name of the worksheet
+    (with all the non-alphanumeric characters replaced by underscores) to the
+    base name of the output file, e.g., rating.csv -> rating_Sottoarea_a.csv.
+    Worksheet names colliding after the substitution (e.g., "Sottoarea a" and
+    "Sottoarea_a") get a numeric suffix, e.g., rating_Sottoarea_a_2.csv.
+    """
+
+    def __init__(self, file_path):
+        """Constructor.
+        """
+        TableWriter.__init__(self, file_path)
+        self.file_paths = []
+
+    def sheet_file_path(self, name):
+        """Return the path to the output file for a given worksheet.
+        """
+        root, ext = os.path.splitext(self.file_path)
+        name = ''.join(c if c.isalnum() else '_' for c in name)
+        file_path = '%s_%s%s' % (root, name, ext)
+        # Mind the comparison is case-insensitive, since so are (by default)
+        # the file systems on some platforms.
+        taken = [path.lower() for path in self.file_paths]
+        suffix = 2
+        while file_path.lower() in taken:
+            file_path = '%s_%s_%d%s' % (root, name, suffix, ext)
+            suffix += 1
+        self.file_paths.append(file_path)
+        return file_path
+
+    def abort(self):
+        """Overloaded method.
+        """
+        for file_path in self.file_paths:
+            _remove(file_path)
+
+    def __str__(self):
+        """Overloaded method.
+        """
+        root, ext = os.path.splitext(self.file_path)
+        return '%s writer for %s_*%s' % (self.NAME, root, ext)
+
+
+
+class CsvWriter(MultiFileWriter):
+
+    """Writer backend for csv files (comma-separated, utf-8 encoded, with
+    a header row), with one file per worksheet.
+
+    Rows are streamed to disk one at a time, and None values are written as
+    empty fields.
+    """
+
+    NAME = 'csv'
+
+    def write_sheet(self, name, col_names, rows):
+        """Overloaded method.
+        """
+        file_path = self.sheet_file_path(name)
+        with open(file_path, 'w', newline='', encoding='utf-8') as output_file:
+            writer = csv.writer(output_file)
+            writer.writerow(col_names)
+            writer.writerows(rows)
+
+
+
+class ArrowWriter(MultiFileWriter):
+
+    """Base class for the writer backends based on pyarrow.
+
+    The rows of each worksheet are transposed into columns, which are then
+    converted in bulk into arrow arrays. The column types are inferred by
+    pyarrow, and the columns mixing incompatible types (e.g., numbers and
+    strings) are converted to strings, with None values preserved.
+    """
+
+    def __init__(self, file_path):
+        """Constructor.
+        """
+        MultiFileWriter.__init__(self, file_path)
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError('The %s backend requires pyarrow' % self.NAME)
+        self.pyarrow = pyarrow
+
+    def table(self, col_names, rows):
+        """Convert the content of a worksheet into a pyarrow table.
+        """
+        pyarrow = self.pyarrow
+        num_cols = len(col_names)
+        columns = [[] for i in range(num_cols)]
+        for row in rows:
+            row = list(row)
+            for (col, val) in zip(columns, row[:num_cols]):
+                col.append(val)
+            for col in columns[len(row):]:
+                col.append(None)
+        arrays = []
+        for values in columns:
+            try:
+                array = pyarrow.array(values)
+            except (pyarrow.ArrowException, TypeError, ValueError):
+                values = [None if val is None else str(val) for val in values]
+                array = pyarrow.array(values, type=pyarrow.string())
+            arrays.append(array)
+        return pyarrow.Table.from_arrays(arrays, names=[str(name) for\
+                                                        name in col_names])
+
+
+
+class ParquetWriter(ArrowWriter):
+
+    """Writer backend for Parquet files, with one file per worksheet.
+    """
+
+    NAME = 'parquet'
+
+    def write_sheet(self, name, col_names, rows):
+        """Overloaded method.
+        """
+        import pyarrow.parquet
+        table = self.table(col_names, rows)
+        pyarrow.parquet.write_table(table, self.sheet_file_path(name))
+
+
+
+class ArrowIpcWriter(ArrowWriter):
+
+    """Writer backend for Arrow IPC (aka Feather v2) files, with one file per
+    worksheet.
+    """
+
+    NAME = 'arrow'
+
+    def write_sheet(self, name, col_names, rows):
+        """Overloaded method.
+        """
+        import pyarrow.ipc
+        table = self.table(col_names, rows)
+        with pyarrow.ipc.new_file(self.sheet_file_path(name),
+                                  table.schema) as writer:
+            writer.write_table(table)
+
+
+
+WRITER_DICT = {
+    'xlwt'   : XlwtWriter,
+    'xlsx'   : XlsxStreamWriter,
+    'csv'    : CsvWriter,
+    'parquet': ParquetWriter,
+    'arrow'  : ArrowIpcWriter
+}
+
+
+"""Default backends, indexed by file extension.
+"""
+EXTENSION_DICT = {
+    '.xlsx'   : 'xlsx',
+    '.csv'    : 'csv',
+    '.parquet': 'parquet',
+    '.pq'     : 'parquet',
+    '.arrow'  : 'arrow',
+    '.feather': 'arrow',
+    '.ipc'    : 'arrow'
+}
+
+
+def default_backend(file_path):
+    """Return the name of the default backend for a given file.
+
+    The backend is looked up in the EXTENSION_DICT, and all the extensions
+    not in there (most notably xls) are written with xlwt.
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    return EXTENSION_DICT.get(ext, 'xlwt')
+
+
+def open_writer(file_path, backend=None):
+    """Open a writer for a given file.
+
+    If backend is None, the default backend for the file type is used.
+    """
+    if backend is None:
+        backend = default_backend(file_path)
+    return WRITER_DICT[backend](file_path)